@@ -0,0 +1,6 @@
+"""Benchmarks for the live football scores service.
+
+Each module can be run as a script from the root of the repository e.g.
+
+  python -m benchmarks.bench_fanout
+"""
@@ -0,0 +1,65 @@
+"""Benchmark of push server fan-out.
+
+Measures the time taken by the Broadcaster to deliver events to a large
+number of subscribers, with a mix of unfiltered, team and competition
+filters. No network connections are made: this measures the cost of the
+fan-out itself.
+"""
+import random
+from timeit import default_timer as timer
+
+from service.pushserver import Broadcaster, Subscriber
+import service.constants as CONST
+
+TEAMS = ["Team {}".format(i) for i in range(40)]
+LEAGUES = ["league-{}".format(i) for i in range(5)]
+
+
+def makeEvent(i):
+    home, away = random.sample(TEAMS, 2)
+    return {"type": CONST.EVENT_GOAL,
+            "matchid": str(i),
+            "leagueid": random.choice(LEAGUES),
+            "competition": None,
+            "hometeam": home,
+            "awayteam": away,
+            "homescore": 1,
+            "awayscore": 0,
+            "status": "L",
+            "matchtime": "23'",
+            "incidents": []}
+
+
+def run(clients=1000, events=200):
+    random.seed(0)
+    broadcaster = Broadcaster()
+
+    for i in range(clients):
+        kind = i % 3
+        if kind == 0:
+            sub = Subscriber(maxqueue=events)
+        elif kind == 1:
+            sub = Subscriber(teams=[random.choice(TEAMS)], maxqueue=events)
+        else:
+            sub = Subscriber(competitions=[random.choice(LEAGUES)],
+                             maxqueue=events)
+        broadcaster.subscribe(sub)
+
+    eventlist = [makeEvent(i) for i in range(events)]
+
+    delivered = 0
+    start = timer()
+    for event in eventlist:
+        delivered += broadcaster.publish(event)
+    elapsed = timer() - start
+
+    print "Clients:            {}".format(clients)
+    print "Events:             {}".format(events)
+    print "Messages delivered: {}".format(delivered)
+    print "Total time:         {:.3f}s".format(elapsed)
+    print "Per event:          {:.3f}ms".format(elapsed * 1000 / events)
+    print "Per message:        {:.2f}us".format(elapsed * 1e6 / delivered)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,43 @@
+"""Benchmark of detailed League updates: serial vs. concurrent detail fetch.
+
+Creates two detailed League objects for the same competition, one fetching
+match details one at a time and one fetching them concurrently, and reports
+the average cycle time of League.Update for each.
+
+This makes live http requests. Pass the league id as the first argument e.g.
+
+  python -m benchmarks.bench_league_details premier-league
+"""
+import sys
+
+from service.footballscores import League
+
+
+def timeUpdates(league, cycles):
+    times = []
+    for _ in range(cycles):
+        league.Update()
+        times.append(league.UpdateTime)
+    return sum(times) / len(times)
+
+
+def run(leagueid, cycles=5, workers=8, parsers=None):
+    serial = League(leagueid, detailed=True, workers=1)
+    parallel = League(leagueid, detailed=True, workers=workers,
+                      parsers=parsers)
+
+    try:
+        serialtime = timeUpdates(serial, cycles)
+        paralleltime = timeUpdates(parallel, cycles)
+    finally:
+        parallel.close()
+
+    print "League:             {}".format(leagueid)
+    print "Matches:            {}".format(len(serial.LeagueMatches))
+    print "Serial:             {:.3f}s per cycle".format(serialtime)
+    print "Concurrent ({} workers, {} parsers): {:.3f}s per cycle".format(
+                                        workers, parsers or 0, paralleltime)
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else "premier-league")
@@ -0,0 +1,83 @@
+"""Benchmark of vectorised change detection with MatchStateTable.
+
+Simulates polls of several thousand concurrent matches where a small
+fraction of matches change between polls and compares the time taken by
+MatchStateTable with a plain Python comparison of dicts.
+"""
+import random
+from timeit import default_timer as timer
+
+from service.matchtable import MatchStateTable
+
+
+def makePoll(matches, previous=None, changerate=0.02):
+    """Returns columns for a poll, changing a fraction of the matches."""
+    if previous is None:
+        ids = ["EFBO{:06d}".format(i) for i in range(matches)]
+        return (ids, [0] * matches, [0] * matches, [1] * matches,
+                [1] * matches)
+
+    ids, home, away, status, minute = [list(c) for c in previous]
+    for i in random.sample(range(matches), int(matches * changerate)):
+        r = random.random()
+        if r < 0.4:
+            home[i] += 1
+        elif r < 0.8:
+            away[i] += 1
+        else:
+            status[i] = 2 if status[i] == 1 else 1
+        minute[i] += 1
+    return ids, home, away, status, minute
+
+
+def pythonDiff(old, ids, home, away, status):
+    """Reference implementation comparing one match at a time."""
+    goals = []
+    changes = []
+    new = {}
+    for matchid, h, a, s in zip(ids, home, away, status):
+        new[matchid] = (h, a, s)
+        prev = old.get(matchid)
+        if prev is not None:
+            if prev[0] != h or prev[1] != a:
+                goals.append((matchid, h - prev[0], a - prev[1]))
+            if prev[2] != s:
+                changes.append((matchid, prev[2], s))
+    return new, goals, changes
+
+
+def run(matches=5000, polls=50):
+    random.seed(0)
+
+    pollsdata = [makePoll(matches)]
+    for _ in range(polls):
+        pollsdata.append(makePoll(matches, pollsdata[-1]))
+
+    table = MatchStateTable()
+    table.updateArrays(*pollsdata[0])
+    start = timer()
+    events = 0
+    for poll in pollsdata[1:]:
+        changes = table.updateArrays(*poll)
+        events += len(changes)
+    vectorised = timer() - start
+
+    state, _, _ = pythonDiff({}, *pollsdata[0][:4])
+    start = timer()
+    pyevents = 0
+    for poll in pollsdata[1:]:
+        state, goals, statuses = pythonDiff(state, *poll[:4])
+        pyevents += len(goals) + len(statuses)
+    python = timer() - start
+
+    print "Matches:            {}".format(matches)
+    print "Polls:              {}".format(polls)
+    print "Events detected:    {} (python: {})".format(events, pyevents)
+    print "MatchStateTable:    {:.3f}ms per poll".format(
+                                                vectorised * 1000 / polls)
+    print "Python comparison:  {:.3f}ms per poll".format(
+                                                python * 1000 / polls)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,41 @@
+"""Benchmark of per-poll CPU time for each data provider.
+
+Parses a saved BBC live scores page with HTMLProvider and a saved JSON
+matches file with JSONProvider and reports the CPU time taken per poll.
+
+  python -m benchmarks.bench_providers livescores.html matches.json
+"""
+import sys
+import codecs
+from time import clock
+
+from service.providers import HTMLProvider, JSONProvider
+
+
+def cpuTime(parse, text, polls):
+    """Returns (average CPU seconds per poll, number of matches)."""
+    start = clock()
+    for _ in range(polls):
+        matches = parse(text)
+    return (clock() - start) / polls, len(matches)
+
+
+def run(htmlfile, jsonfile, polls=20):
+    with codecs.open(htmlfile, "r", "utf-8") as f:
+        html = f.read()
+    with codecs.open(jsonfile, "r", "utf-8") as f:
+        feed = f.read()
+
+    htmltime, htmlmatches = cpuTime(HTMLProvider().parseMatches, html, polls)
+    jsontime, jsonmatches = cpuTime(JSONProvider("").parseMatches, feed,
+                                    polls)
+
+    print "Polls:              {}".format(polls)
+    print "HTMLProvider:       {:.2f}ms CPU per poll ({} matches)".format(
+                                                htmltime * 1000, htmlmatches)
+    print "JSONProvider:       {:.2f}ms CPU per poll ({} matches)".format(
+                                                jsontime * 1000, jsonmatches)
+
+
+if __name__ == "__main__":
+    run(sys.argv[1], sys.argv[2])
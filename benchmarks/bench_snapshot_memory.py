@@ -0,0 +1,91 @@
+"""Benchmark of the memory used by MatchSnapshot and FootballMatch objects.
+
+Creates 10,000 of each (with identical match data) and reports the total
+memory used, following references to instance dicts, strings, lists and
+tuples. Shared objects (e.g. interned team names) are only counted once.
+"""
+import sys
+import random
+
+from service.footballscores import FootballMatch
+from service.snapshot import MatchSnapshot
+
+TEAMS = [u"Team {}".format(i) for i in range(92)]
+LEAGUES = [(u"league-{}".format(i), u"League {}".format(i))
+           for i in range(10)]
+PLAYERS = [u"Player {}".format(i) for i in range(500)]
+
+
+def deepSize(objects):
+    """Returns the total size in bytes of the objects and everything they
+    refer to, counting each object once.
+    """
+    seen = set()
+    stack = list(objects)
+    total = 0
+
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.append(obj.__dict__)
+        elif hasattr(obj, "__slots__"):
+            stack.extend(getattr(obj, s) for s in obj.__slots__
+                         if hasattr(obj, s))
+
+    return total
+
+
+def makeSnapshot(i):
+    home, away = random.sample(TEAMS, 2)
+    leagueid, leaguename = random.choice(LEAGUES)
+    incidents = []
+    for _ in range(random.randint(0, 6)):
+        incidents.append((random.choice([u"home", u"away"]),
+                          random.choice([u"goal", u"yellow", u"red"]),
+                          random.choice(PLAYERS),
+                          u"{}'".format(random.randint(1, 90))))
+    # Team names parsed from a page are new strings for each match so we
+    # copy them here rather than sharing the strings in TEAMS.
+    return MatchSnapshot(u"EFBO{:06d}".format(i),
+                         u"".join(home), u"".join(away),
+                         homescore=random.randint(0, 4),
+                         awayscore=random.randint(0, 4),
+                         status=u"L",
+                         matchtime=u"{}'".format(random.randint(1, 90)),
+                         incidents=incidents,
+                         leagueid=leagueid,
+                         competition=leaguename)
+
+
+def run(count=10000):
+    random.seed(0)
+
+    snapshots = [makeSnapshot(i) for i in range(count)]
+    matches = [FootballMatch.fromSnapshot(s, detailed=True)
+               for s in snapshots]
+
+    # NB the FootballMatch objects share strings with the snapshots they were
+    # created from so each set is measured separately.
+    snapsize = deepSize(snapshots)
+    matchsize = deepSize(matches)
+
+    print "Objects:             {}".format(count)
+    print "MatchSnapshot:       {:.1f} KiB ({:.0f} bytes each)".format(
+                                snapsize / 1024.0, float(snapsize) / count)
+    print "FootballMatch:       {:.1f} KiB ({:.0f} bytes each)".format(
+                                matchsize / 1024.0, float(matchsize) / count)
+    print "Ratio:               {:.2f}x".format(float(matchsize) / snapsize)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,186 @@
+"""Load test against the simulated BBC server.
+
+Starts a benchmarks.simserver.SimServer in the background, points the match
+classes at it and measures:
+
+  - Teams.getTeams: time and requests to scan every competition
+  - League: time per update of every competition
+  - ScoreNotifierService: throughput of a number of services following
+    different teams, and the delay between each scripted goal and the
+    service's goal notification
+
+  python -m benchmarks.loadtest --competitions 50 --matches 500 \\
+      --services 50 --duration 120 --latency 0.05 --errors 0.01
+
+Services only follow teams whose matches have already kicked off when the
+test starts (working out the time to kick off needs a request to an external
+time server which isn't simulated).
+"""
+import sys
+import argparse
+import threading
+from time import time, sleep
+from timeit import default_timer as timer
+
+from service.footballscores import matchcommon, League, Teams
+from service.scoresservice import ScoreNotifierService
+import service.constants as CONST
+from benchmarks.simserver import Simulation, SimServer
+from benchmarks.suite import percentile
+
+
+class LatencyNotifier(object):
+    """Notifier recording the delay between each goal and its notification.
+
+    The notifier is only given the match (with its latest score) so each
+    goal is timed from the service's goal event, which holds the score at
+    that goal. goalNotified is subscribed to the service's event bus after
+    the service's own notifier subscription, so it is called once the
+    notification has been sent.
+    """
+
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.latencies = []
+        self.notifications = 0
+        self.__lock = threading.Lock()
+
+    def Notify(self, event, matchobject, **kwargs):
+        with self.__lock:
+            self.notifications += 1
+        return True
+
+    def goalNotified(self, event):
+        """Event bus callback for goal events."""
+        now = time()
+        goals = event.data["homescore"] + event.data["awayscore"]
+        scored = self.simulation.goalTime(event.matchid, goals)
+        if scored is not None:
+            with self.__lock:
+                self.latencies.append(now - scored)
+
+
+def timeTeams():
+    """Returns (seconds, number of teams) for Teams.getTeams."""
+    start = timer()
+    teams = Teams().getTeams()
+    return timer() - start, len(teams)
+
+
+def timeLeagues(leagueids, rounds):
+    """Returns list of seconds taken to update every league (per round)."""
+    leagues = [League(l, detailed=True) for l in leagueids]
+    times = []
+    for _ in range(rounds):
+        start = timer()
+        for league in leagues:
+            league.Update()
+        times.append(timer() - start)
+    return times
+
+
+def runServices(sim, server, count, interval, duration):
+    """Runs "count" services following teams in live matches for "duration"
+    seconds. Returns (notifier, requests per second).
+    """
+    notifier = LatencyNotifier(sim)
+
+    now = sim.Now
+    live = [m for m in sim.matches.values() if m.state(now)[0] != "Fixture"]
+    live.sort(key=lambda m: m.matchid)
+
+    for match in live[:count]:
+        service = ScoreNotifierService(match.hometeam, notifier=notifier,
+                                       livetime=interval,
+                                       nonlivetime=interval)
+        service.bus.subscribe(notifier.goalNotified,
+                              types=[CONST.EVENT_GOAL])
+        t = threading.Thread(target=service.run)
+        t.daemon = True
+        t.start()
+
+    before = server.Requests
+    sleep(duration)
+    return notifier, (server.Requests - before) / float(duration)
+
+
+def run(competitions=50, matches=500, speed=60, services=50, interval=5,
+        duration=120, rounds=3, latency=0, jitter=0, errorrate=0, seed=1,
+        port=8082):
+    sim = Simulation(competitions, matches, speed=speed, seed=seed)
+    server = SimServer(("127.0.0.1", port), sim, latency=latency,
+                       jitter=jitter, errorrate=errorrate)
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+
+    matchcommon.proxybase = server.BaseURL
+
+    print "{} matches in {} competitions, {}x real time".format(
+            matches, competitions, speed)
+
+    before = server.Requests
+    seconds, teams = timeTeams()
+    print "Teams.getTeams: {:.2f}s, {} teams, {} requests".format(
+            seconds, teams, server.Requests - before)
+
+    before = server.Requests
+    times = timeLeagues([l["id"] for l in sim.leagues], rounds)
+    print ("League updates: p50 {:.2f}s, p95 {:.2f}s per round of {} "
+           "leagues, {} requests").format(percentile(times, 50),
+                                         percentile(times, 95),
+                                         competitions,
+                                         server.Requests - before)
+
+    notifier, throughput = runServices(sim, server, services, interval,
+                                       duration)
+    print "Services: {}, {:.1f} requests/s, {} notifications".format(
+            services, throughput, notifier.notifications)
+
+    if notifier.latencies:
+        print ("Goal detection latency: p50 {:.2f}s, p95 {:.2f}s, "
+               "max {:.2f}s ({} goals)").format(
+                    percentile(notifier.latencies, 50),
+                    percentile(notifier.latencies, 95),
+                    max(notifier.latencies), len(notifier.latencies))
+    else:
+        print "No goals detected."
+
+    print "Server requests: {}".format(server.stats)
+
+    server.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--competitions", type=int, default=50)
+    parser.add_argument("--matches", type=int, default=500)
+    parser.add_argument("--speed", type=float, default=60,
+                        help="simulated seconds per real second")
+    parser.add_argument("--services", type=int, default=50,
+                        help="number of services following a team")
+    parser.add_argument("--interval", type=float, default=5,
+                        help="seconds between service updates")
+    parser.add_argument("--duration", type=float, default=120,
+                        help="seconds to run the services for")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="number of rounds of league updates")
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--errors", type=float, default=0,
+                        help="proportion of requests which fail")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8082)
+    args = parser.parse_args(argv)
+
+    run(args.competitions, args.matches, speed=args.speed,
+        services=args.services, interval=args.interval,
+        duration=args.duration, rounds=args.rounds, latency=args.latency,
+        jitter=args.jitter, errorrate=args.errors, seed=args.seed,
+        port=args.port)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,542 @@
+"""Simulated BBC football server for load testing.
+
+Serves live scores, match detail, badge, league table, results and fixtures
+pages in the markup expected by service.footballscores for any number of
+generated competitions and matches. Goals, cards and status changes are
+scripted in advance (from a seed) and played out over simulated time, so the
+time of every event is known and the delay before a client detects it can be
+measured.
+
+Clients are pointed at the server through the proxy setting:
+
+  from service.footballscores import matchcommon
+  matchcommon.proxybase = "http://127.0.0.1:8082"
+
+Latency (with optional jitter) and errors can be injected into responses.
+
+  python -m benchmarks.simserver --competitions 50 --matches 500 --speed 60
+"""
+import re
+import sys
+import random
+import argparse
+import threading
+from time import time, sleep
+from datetime import datetime, timedelta
+from urlparse import urlparse, parse_qs
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from service.cacheproxy import pageFamily
+
+# Simulated seconds for each part of a match
+FIRST_HALF = 45 * 60
+HALF_TIME = 15 * 60
+SECOND_HALF = 45 * 60
+
+# Value of the competition options is "competition-<id>" (the match classes
+# strip the first 12 characters)
+OPTION_PREFIX = "competition-"
+
+LIVE_SCORES = re.compile(r"^/sport/shared/football/live-scores/matches/"
+                         r"([^/]*)/today$")
+DETAIL = re.compile(r"^/sport/football/live/partial/([^/]+)$")
+MATCH_PAGE = re.compile(r"^/sport/football/(\d+)$")
+FILTER_PAGES = {"/sport/football/tables": "tables",
+                "/sport/football/results": "results",
+                "/sport/football/fixtures": "fixtures"}
+
+INCIDENT_CLASSES = {"goal": "goal",
+                    "yellow": "yellow-card",
+                    "red": "red-card"}
+
+
+class SimMatch(object):
+    """Class object representing one scripted match.
+
+    kickoff is in simulated seconds from the start of the simulation.
+    incidents is a list of (minute, side, type, player) tuples.
+    """
+
+    def __init__(self, matchid, leagueid, hometeam, awayteam, kickoff,
+                 incidents):
+        self.matchid = matchid
+        self.leagueid = leagueid
+        self.hometeam = hometeam
+        self.awayteam = awayteam
+        self.kickoff = kickoff
+        self.incidents = sorted(incidents)
+
+    @staticmethod
+    def elapsedAt(minute):
+        """Returns the simulated seconds after kick off at which an incident
+        in the given match minute happens.
+        """
+        if minute <= 45:
+            return (minute - 1) * 60
+        return (minute - 1) * 60 + HALF_TIME
+
+    def incidentTime(self, incident):
+        """Returns the simulated time of the incident."""
+        return self.kickoff + self.elapsedAt(incident[0])
+
+    def state(self, now):
+        """Returns (status, minute) at simulated time now. status is one of
+        "Fixture", "L", "HT" or "FT".
+        """
+        elapsed = now - self.kickoff
+        if elapsed < 0:
+            return "Fixture", None
+        if elapsed < FIRST_HALF:
+            return "L", int(elapsed // 60) + 1
+        if elapsed < FIRST_HALF + HALF_TIME:
+            return "HT", 45
+        if elapsed < FIRST_HALF + HALF_TIME + SECOND_HALF:
+            return "L", int((elapsed - HALF_TIME) // 60) + 1
+        return "FT", 90
+
+    def incidentsAt(self, now):
+        """Returns the incidents which have happened by simulated time now."""
+        return [i for i in self.incidents if self.incidentTime(i) <= now]
+
+    def scoreAt(self, now):
+        """Returns (homescore, awayscore) at simulated time now."""
+        goals = [i for i in self.incidentsAt(now) if i[2] == "goal"]
+        home = sum(1 for i in goals if i[1] == "home")
+        return home, len(goals) - home
+
+
+class Simulation(object):
+    """Class object holding the scripted matches for all competitions.
+
+    Simulated time starts at 0 when the object is created and runs "speed"
+    times faster than real time.
+    """
+
+    def __init__(self, competitions=50, matches=500, speed=60,
+                 kickoffspread=3600, goalrate=2.7, cardrate=3.5, seed=None):
+        """Method to create an instance of the simulation.
+
+        competitions:  number of competitions
+        matches:       total number of matches (spread across competitions)
+        speed:         simulated seconds per real second
+        kickoffspread: kick off times are spread between this many simulated
+                       seconds before and after the start of the simulation
+        goalrate:      average number of goals per match
+        cardrate:      average number of yellow cards per match
+        seed:          (optional) random seed so the script can be repeated
+        """
+        self.speed = float(speed)
+        self.start = time()
+        self.random = random.Random(seed)
+        self.leagues = []
+        self.matches = {}
+        self.leaguematches = {}
+        self.records = {}
+        self.results = {}
+        self.fixtures = {}
+
+        for c in range(competitions):
+            leagueid = "league-{:03d}".format(c + 1)
+            self.leagues.append({"id": leagueid,
+                                 "name": "Competition {}".format(c + 1)})
+            self.leaguematches[leagueid] = []
+
+        for m in range(matches):
+            leagueid = self.leagues[m % competitions]["id"]
+            self.__addMatch(m, leagueid, kickoffspread, goalrate, cardrate)
+
+        for league in self.leagues:
+            self.__addHistory(league["id"])
+
+    def __addMatch(self, m, leagueid, kickoffspread, goalrate, cardrate):
+        rnd = self.random
+        home = "Team {:04d}".format(2 * m + 1)
+        away = "Team {:04d}".format(2 * m + 2)
+        kickoff = rnd.randint(-kickoffspread, kickoffspread)
+
+        incidents = []
+        for minute in range(1, 91):
+            for side in ("home", "away"):
+                player = "Player {}".format(rnd.randint(2, 11))
+                if rnd.random() < goalrate / 180.0:
+                    incidents.append((minute, side, "goal", player))
+                if rnd.random() < cardrate / 180.0:
+                    incidents.append((minute, side, "yellow", player))
+                if rnd.random() < 0.1 / 180.0:
+                    incidents.append((minute, side, "red", player))
+
+        match = SimMatch(str(100000 + m), leagueid, home, away, kickoff,
+                         incidents)
+        self.matches[match.matchid] = match
+        self.leaguematches[leagueid].append(match)
+
+        for team in (home, away):
+            played = rnd.randint(5, 30)
+            won = rnd.randint(0, played)
+            drawn = rnd.randint(0, played - won)
+            goalsfor = rnd.randint(won, 3 * played)
+            goalsagainst = rnd.randint(played - won - drawn, 3 * played)
+            self.records[team] = [played, won, drawn, played - won - drawn,
+                                  goalsfor, goalsagainst]
+
+    def __addHistory(self, leagueid):
+        rnd = self.random
+        teams = []
+        for match in self.leaguematches[leagueid]:
+            teams += [match.hometeam, match.awayteam]
+
+        results = []
+        fixtures = []
+        for day in range(1, 4):
+            rnd.shuffle(teams)
+            pairs = zip(teams[::2], teams[1::2])
+            results.append((datetime.now() - timedelta(days=7 * day),
+                            [(h, a, "{}-{}".format(rnd.randint(0, 4),
+                                                   rnd.randint(0, 4)))
+                             for h, a in pairs]))
+            rnd.shuffle(teams)
+            pairs = zip(teams[::2], teams[1::2])
+            fixtures.append((datetime.now() + timedelta(days=7 * day),
+                             pairs))
+
+        self.results[leagueid] = results
+        self.fixtures[leagueid] = fixtures
+
+    @property
+    def Now(self):
+        """Returns the current simulated time."""
+        return (time() - self.start) * self.speed
+
+    def realTime(self, simtime):
+        """Returns the real timestamp of the simulated time."""
+        return self.start + simtime / self.speed
+
+    def goalTime(self, matchid, goals):
+        """Returns the real timestamp at which the match's score reached the
+        given total number of goals (or None).
+        """
+        match = self.matches.get(matchid)
+        if match is None or goals < 1:
+            return None
+        scored = [i for i in match.incidents if i[2] == "goal"]
+        if goals > len(scored):
+            return None
+        return self.realTime(match.incidentTime(scored[goals - 1]))
+
+    def teamMatch(self, team):
+        """Returns the SimMatch in which the team plays (or None)."""
+        for match in self.matches.itervalues():
+            if team in (match.hometeam, match.awayteam):
+                return match
+        return None
+
+    def standings(self, leagueid, now):
+        """Returns sorted list of (team, record) for the league including
+        today's finished matches.
+        """
+        records = {}
+        for match in self.leaguematches[leagueid]:
+            home = list(self.records[match.hometeam])
+            away = list(self.records[match.awayteam])
+            status, _ = match.state(now)
+            if status == "FT":
+                hs, aws = match.scoreAt(now)
+                for rec, gf, ga in ((home, hs, aws), (away, aws, hs)):
+                    rec[0] += 1
+                    rec[1 if gf > ga else 2 if gf == ga else 3] += 1
+                    rec[4] += gf
+                    rec[5] += ga
+            records[match.hometeam] = home
+            records[match.awayteam] = away
+
+        def points(rec):
+            return 3 * rec[1] + rec[2]
+
+        return sorted(records.items(),
+                      key=lambda t: (-points(t[1]), t[1][5] - t[1][4],
+                                     -t[1][4], t[0]))
+
+
+def renderLeagueOptions(sim, selected=None):
+    options = ['<option value="">All competitions</option>']
+    for league in sim.leagues:
+        sel = ' selected="selected"' if league["id"] == selected else ""
+        options.append('<option value="{}{}"{}>{} ({})</option>'.format(
+                       OPTION_PREFIX, league["id"], sel, league["name"],
+                       len(sim.leaguematches[league["id"]])))
+    return ('<div class="drop-down-filter live-scores-fixtures">'
+            '<select name="filter">{}</select></div>'.format(
+                "".join(options)))
+
+
+def renderMatchRow(sim, match, now):
+    status, minute = match.state(now)
+    home, away = match.scoreAt(now)
+
+    if status == "Fixture":
+        rowclass = "fixture"
+        kickoff = datetime.fromtimestamp(sim.realTime(match.kickoff))
+        elapsed = kickoff.strftime("%H:%M")
+        score = "v"
+    elif status == "FT":
+        rowclass = "report"
+        elapsed = "Full time"
+        score = "{} - {}".format(home, away)
+    else:
+        rowclass = "live"
+        elapsed = "Half Time" if status == "HT" else "{} mins".format(minute)
+        score = "{} - {}".format(home, away)
+
+    return ('<tr id="match-row-{id}" class="{rowclass}">'
+            '<td class="match-details"><p>'
+            '<span class="team-home">{home}</span> '
+            '<span class="score"> {score} </span> '
+            '<span class="team-away">{away}</span></p></td>'
+            '<td class="time"><span class="elapsed-time">{elapsed}</span>'
+            '</td><td class="match-link">'
+            '<a href="/sport/football/{id}">Match details</a></td>'
+            '</tr>').format(id=match.matchid, rowclass=rowclass,
+                            home=match.hometeam, away=match.awayteam,
+                            score=score, elapsed=elapsed)
+
+
+def renderLiveScores(sim, leagueid):
+    if leagueid and leagueid not in sim.leaguematches:
+        return None
+    now = sim.Now
+    rows = [renderMatchRow(sim, m, now)
+            for m in sim.leaguematches.get(leagueid, [])]
+    return ('<html><body>{}<div id="matches-wrapper">'
+            '<table class="table-stats"><tbody>{}</tbody></table></div>'
+            '</body></html>'.format(renderLeagueOptions(sim, leagueid),
+                                    "".join(rows)))
+
+
+def renderDetail(sim, matchid):
+    match = sim.matches.get(matchid)
+    if match is None:
+        return None
+    rows = []
+    for minute, side, itype, player in match.incidentsAt(sim.Now):
+        rows.append('<tr><td class="incident-player-home">{}</td>'
+                    '<td class="incident-type {}"></td>'
+                    '<td class="incident-time">{}\'</td>'
+                    '<td class="incident-player-away">{}</td></tr>'.format(
+                        player if side == "home" else "",
+                        INCIDENT_CLASSES[itype], minute,
+                        player if side == "away" else ""))
+    return ('<div><table class="incidents-table"><tbody>{}</tbody></table>'
+            '</div>'.format("".join(rows)))
+
+
+def renderMatchPage(sim, matchid):
+    match = sim.matches.get(matchid)
+    if match is None:
+        return None
+    badges = "".join('<div class="team-badge"><img src="/badges/{}.png"/>'
+                     '</div>'.format(t.replace(" ", "-").lower())
+                     for t in (match.hometeam, match.awayteam))
+    return "<html><body>{}</body></html>".format(badges)
+
+
+def renderFilterPage(sim):
+    options = ['<option value="">Choose a competition</option>']
+    for league in sim.leagues:
+        options.append('<option value="{}{}">{}</option>'.format(
+                       OPTION_PREFIX, league["id"], league["name"]))
+    return ('<html><body><div class="drop-down-filter" '
+            'id="filter-fixtures-no-js"><select name="filter">{}</select>'
+            '</div></body></html>'.format("".join(options)))
+
+
+def renderTable(sim, leagueid):
+    now = sim.Now
+    rows = []
+    for position, (team, rec) in enumerate(sim.standings(leagueid, now)):
+        played, won, drawn, lost, gf, ga = rec
+        rows.append('<tr id="team-{pos}"><td class="position">'
+                    '<span class="no-movement">No movement</span>'
+                    '<span class="position-number">{pos}</span></td>'
+                    '<td class="team-name">{team}</td>'
+                    '<td class="played">{played}</td>'
+                    '<td class="won">{won}</td>'
+                    '<td class="drawn">{drawn}</td>'
+                    '<td class="lost">{lost}</td>'
+                    '<td class="for">{gf}</td>'
+                    '<td class="against">{ga}</td>'
+                    '<td class="goal-difference">{gd}</td>'
+                    '<td class="points">{points}</td>'
+                    '<td class="last-10-games"><ol></ol></td></tr>'.format(
+                        pos=position + 1, team=team, played=played, won=won,
+                        drawn=drawn, lost=lost, gf=gf, ga=ga, gd=gf - ga,
+                        points=3 * won + drawn))
+    name = [l["name"] for l in sim.leagues if l["id"] == leagueid][0]
+    return ('<html><body><div class="league-table full-table-wide">'
+            '<h2 class="table-header">{}</h2><table><tbody>{}</tbody>'
+            '</table></div></body></html>'.format(name, "".join(rows)))
+
+
+def renderDays(days):
+    """Returns the html of a results/fixtures page. days is a list of
+    (date, [(hometeam, awayteam, score), ...]).
+    """
+    html = []
+    n = 0
+    for date, matches in days:
+        rows = []
+        for home, away, score in matches:
+            n += 1
+            rows.append('<tr id="match-row-{}"><td class="match-details">'
+                        '<p><span class="team-home teams">{}</span> '
+                        '<span class="score"><abbr>{}</abbr></span> '
+                        '<span class="team-away teams">{}</span></p></td>'
+                        '</tr>'.format(n, home, score, away))
+        html.append('<h2 class="table-header">{}</h2>'
+                    '<table class="table-stats"><tbody>{}</tbody>'
+                    '</table>'.format(date.strftime("%A %d %B %Y"),
+                                      "".join(rows)))
+    return ('<html><body><div class="fixtures-table full-table-medium">{}'
+            '</div></body></html>'.format("".join(html)))
+
+
+def renderPage(sim, path):
+    """Returns the html for the path (or None if there's no such page)."""
+    parsed = urlparse(path)
+
+    match = LIVE_SCORES.match(parsed.path)
+    if match:
+        return renderLiveScores(sim, match.group(1))
+
+    match = DETAIL.match(parsed.path)
+    if match:
+        return renderDetail(sim, match.group(1))
+
+    match = MATCH_PAGE.match(parsed.path)
+    if match:
+        return renderMatchPage(sim, match.group(1))
+
+    kind = FILTER_PAGES.get(parsed.path)
+    if kind is None:
+        return None
+
+    comp = parse_qs(parsed.query).get("filter", [""])[0]
+    leagueid = comp[len(OPTION_PREFIX):]
+    if leagueid not in sim.leaguematches:
+        return renderFilterPage(sim)
+
+    if kind == "tables":
+        return renderTable(sim, leagueid)
+    elif kind == "results":
+        return renderDays(sim.results[leagueid])
+    else:
+        return renderDays([(d, [(h, a, "v") for h, a in pairs])
+                           for d, pairs in sim.fixtures[leagueid]])
+
+
+class SimRequestHandler(BaseHTTPRequestHandler):
+    """Request handler for the simulated server."""
+
+    def do_GET(self):
+        server = self.server
+        server.count(pageFamily(self.path) or "other")
+
+        if server.latency or server.jitter:
+            sleep(server.latency + random.uniform(0, server.jitter))
+
+        if server.errorrate and random.random() < server.errorrate:
+            server.count("errors")
+            self.send_error(503)
+            return
+
+        page = renderPage(server.simulation, self.path)
+        if page is None:
+            self.send_error(404)
+            return
+
+        body = page.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SimServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server serving the simulated pages.
+
+    e.g. server = SimServer(("127.0.0.1", 8082), Simulation(seed=1))
+         server.serve_forever()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, simulation, latency=0, jitter=0,
+                 errorrate=0):
+        """Method to create an instance of the server.
+
+        address:    (host, port) tuple to listen on
+        simulation: Simulation object
+        latency:    seconds added to every response
+        jitter:     maximum random seconds added on top of the latency
+        errorrate:  proportion of requests answered with an error (0-1)
+        """
+        HTTPServer.__init__(self, address, SimRequestHandler)
+        self.simulation = simulation
+        self.latency = latency
+        self.jitter = jitter
+        self.errorrate = errorrate
+        self.stats = {}
+        self.__lock = threading.Lock()
+
+    def count(self, stat):
+        with self.__lock:
+            self.stats[stat] = self.stats.get(stat, 0) + 1
+
+    @property
+    def Requests(self):
+        """Returns the total number of requests received."""
+        with self.__lock:
+            return sum(v for k, v in self.stats.items() if k != "errors")
+
+    @property
+    def BaseURL(self):
+        host, port = self.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--competitions", type=int, default=50)
+    parser.add_argument("--matches", type=int, default=500)
+    parser.add_argument("--speed", type=float, default=60,
+                        help="simulated seconds per real second")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--errors", type=float, default=0,
+                        help="proportion of requests which fail")
+    args = parser.parse_args(argv)
+
+    sim = Simulation(args.competitions, args.matches, speed=args.speed,
+                     seed=args.seed)
+    server = SimServer((args.host, args.port), sim, latency=args.latency,
+                       jitter=args.jitter, errorrate=args.errors)
+
+    print "Serving {} matches in {} competitions at {}".format(
+            args.matches, args.competitions, server.BaseURL)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""Benchmark suite for parsing, match discovery and the service cycle.
+
+Uses pages recorded with service.recorder.PageRecorder so no network access
+is needed and results are repeatable. Each benchmark is run a number of times
+and the p50/p95 latency, allocations and peak memory are reported.
+
+Results can be saved as a baseline and later runs compared against it. The
+suite exits with status 1 if any benchmark fails or its p50 latency is more
+than "threshold" slower than the baseline. Benchmarks which can't be run
+(e.g. no league table id was given) are skipped.
+
+  python -m benchmarks.suite matchday.jsonl.gz --team Chelsea \\
+      --league premier-league --table 118996114 --comp 118996114 \\
+      --baseline baseline.json --save
+
+  python -m benchmarks.suite matchday.jsonl.gz --team Chelsea \\
+      --league premier-league --table 118996114 --comp 118996114 \\
+      --baseline baseline.json --threshold 0.2
+
+Allocations and peak memory use tracemalloc where it is available. Otherwise
+allocations are the growth in the number of objects tracked by the garbage
+collector and peak memory isn't reported (the process's maximum resident set
+size never goes down, so it would depend on the order of the benchmarks).
+"""
+import gc
+import sys
+import json
+import argparse
+from timeit import default_timer as timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from service.footballscores import (matchcommon, FootballMatch, League,
+                                    LeagueTable, Results, Fixtures)
+from service.recorder import PageReplayer
+from service.scoresservice import ScoreNotifierService
+
+
+class Unavailable(Exception):
+    """Raised by a benchmark which can't be run (rather than has failed).
+    """
+
+
+class NullNotifier(object):
+    """Notifier which doesn't send anything."""
+
+    def Notify(self, event, matchobject, **kwargs):
+        return True
+
+
+def percentile(values, pct):
+    """Returns the pct percentile of the values (nearest rank)."""
+    values = sorted(values)
+    if not values:
+        return None
+    k = int(round((pct / 100.0) * (len(values) - 1)))
+    return values[k]
+
+
+def measureMemory(func):
+    """Runs func once and returns (allocations, peak memory in bytes).
+    Peak memory is None if tracemalloc isn't available.
+    """
+    if tracemalloc is not None:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        func()
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        stats = after.compare_to(before, "filename")
+        allocations = sum(max(s.count_diff, 0) for s in stats)
+        return allocations, peak
+
+    gc.collect()
+    before = len(gc.get_objects())
+    func()
+    allocations = len(gc.get_objects()) - before
+    return allocations, None
+
+
+class Context(object):
+    """Objects shared by the benchmarks."""
+
+    def __init__(self, team, league, table, comp):
+        self.team = team
+        self.league = league
+        self.table = table
+        self.comp = comp
+        self.match = FootballMatch(team, detailed=True)
+
+
+# Each benchmark is a function which takes the Context and returns the
+# function to be timed.
+
+def benchFindMatch(ctx):
+    return ctx.match._FootballMatch__findMatch
+
+
+def benchGetScores(ctx):
+    data = ctx.match._FootballMatch__loadData()
+    return lambda: ctx.match._FootballMatch__getScores(data, update=True)
+
+
+def benchGetDetails(ctx):
+    return ctx.match._FootballMatch__getDetails
+
+
+def benchLeagueUpdate(ctx):
+    return League(ctx.league, detailed=True).Update
+
+
+def benchLeagueTable(ctx):
+    if ctx.table is None:
+        raise Unavailable("no --table given")
+    return lambda: LeagueTable().getLeagueTable(ctx.table)
+
+
+def benchResults(ctx):
+    if ctx.comp is None:
+        raise Unavailable("no --comp given")
+    return lambda: Results().getResults(ctx.comp)
+
+
+def benchFixtures(ctx):
+    if ctx.comp is None:
+        raise Unavailable("no --comp given")
+    return lambda: Fixtures().getFixtures(ctx.comp)
+
+
+def benchServiceCycle(ctx):
+    service = ScoreNotifierService(ctx.team, notifier=NullNotifier(),
+                                   detailed=True)
+    service.match = FootballMatch(ctx.team, detailed=True)
+
+    def cycle():
+        if service.match.MatchFound:
+            service._ScoreNotifierService__checkStatus()
+        service._ScoreNotifierService__update()
+
+    return cycle
+
+
+BENCHMARKS = [("FootballMatch.__findMatch", benchFindMatch),
+              ("FootballMatch.__getScores", benchGetScores),
+              ("FootballMatch.__getDetails", benchGetDetails),
+              ("League.Update", benchLeagueUpdate),
+              ("LeagueTable.getLeagueTable", benchLeagueTable),
+              ("Results.getResults", benchResults),
+              ("Fixtures.getFixtures", benchFixtures),
+              ("ScoreNotifierService cycle", benchServiceCycle)]
+
+
+def runBenchmark(setup, ctx, repeat):
+    """Returns dict of results for one benchmark."""
+    func = setup(ctx)
+
+    # Warm up (and make sure the benchmark works with this archive)
+    func()
+
+    times = []
+    for _ in range(repeat):
+        start = timer()
+        func()
+        times.append(timer() - start)
+
+    allocations, peak = measureMemory(func)
+
+    return {"p50": percentile(times, 50),
+            "p95": percentile(times, 95),
+            "allocations": allocations,
+            "peak": peak}
+
+
+def run(archive, team, league, table, comp, repeat=20, offset=0,
+        names=None):
+    """Runs the benchmarks against the archive and returns dict of
+    name: results. Results are None if the benchmark couldn't be run and
+    {"error": message} if it failed.
+    """
+    matchcommon.replayer = PageReplayer(archive, speed=None, offset=offset)
+    ctx = Context(team, league, table, comp)
+
+    results = {}
+    for name, setup in BENCHMARKS:
+        if names and name not in names:
+            continue
+        try:
+            results[name] = runBenchmark(setup, ctx, repeat)
+        except (Unavailable, ImportError) as e:
+            print "{}: skipped ({})".format(name, e)
+            results[name] = None
+        except Exception as e:
+            print "{}: FAILED ({}: {})".format(name, type(e).__name__, e)
+            results[name] = {"error": "{}: {}".format(type(e).__name__, e)}
+
+    return results
+
+
+def failures(results):
+    """Returns list of names of benchmarks which failed."""
+    return [name for name, result in sorted(results.items())
+            if result and "error" in result]
+
+
+def compare(results, baseline, threshold):
+    """Returns list of names of benchmarks whose p50 has regressed by more
+    than the threshold (e.g. 0.2 = 20% slower) compared with the baseline.
+    Benchmarks which failed are also included if the baseline has a result
+    for them.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if result is None or not base or not base.get("p50"):
+            continue
+        if "error" in result:
+            regressions.append(name)
+        else:
+            change = (result["p50"] - base["p50"]) / base["p50"]
+            if change > threshold:
+                regressions.append(name)
+    return regressions
+
+
+def report(results, baseline=None):
+    print "{:<30} {:>10} {:>10} {:>12} {:>12} {:>8}".format(
+                "Benchmark", "p50 (ms)", "p95 (ms)", "Allocations",
+                "Peak (KiB)", "Change")
+    for name, _ in BENCHMARKS:
+        result = results.get(name)
+        if not result:
+            continue
+        if "error" in result:
+            print "{:<30} {}".format(name, result["error"])
+            continue
+        change = ""
+        if baseline and baseline.get(name) and baseline[name].get("p50"):
+            base = baseline[name]["p50"]
+            change = "{:+.0%}".format((result["p50"] - base) / base)
+        if result["peak"] is None:
+            peak = "n/a"
+        else:
+            peak = "{:.0f}".format(result["peak"] / 1024.0)
+        print "{:<30} {:>10.2f} {:>10.2f} {:>12} {:>12} {:>8}".format(
+                name, result["p50"] * 1000, result["p95"] * 1000,
+                result["allocations"], peak, change)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("archive", help="archive of recorded pages")
+    parser.add_argument("--team", required=True, help="team to follow")
+    parser.add_argument("--league", required=True, help="live league id")
+    parser.add_argument("--table", help="league table id")
+    parser.add_argument("--comp", help="results/fixtures competition id")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--offset", type=float, default=0,
+                        help="seconds into the recording to replay from")
+    parser.add_argument("--baseline", help="baseline results file")
+    parser.add_argument("--save", action="store_true",
+                        help="save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed p50 slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = run(args.archive, args.team, args.league, args.table,
+                  args.comp, repeat=args.repeat, offset=args.offset)
+
+    baseline = None
+    if args.baseline and not args.save:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except IOError:
+            print "No baseline found at {}".format(args.baseline)
+
+    report(results, baseline)
+
+    failed = failures(results)
+    if failed:
+        print "Failed: {}".format(", ".join(failed))
+
+    if args.save and args.baseline:
+        if failed:
+            print "Baseline not saved as some benchmarks failed"
+        else:
+            with open(args.baseline, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            print "Baseline saved to {}".format(args.baseline)
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print "Regressions: {}".format(", ".join(regressions))
+            return 1
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
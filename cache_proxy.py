@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""Live Football Scores Caching Proxy
+
+by elParaguayo
+
+Serves cached copies of the BBC pages used by service.footballscores so that
+any number of clients on the local network cost one request to the BBC.
+
+Clients should set the PROXY_BASE setting in main.py (or, if importing
+service.footballscores directly, set matchcommon.proxybase) to
+"http://<host>:<port>".
+"""
+
+import logging
+
+from service.cacheproxy import CacheProxyServer
+
+##############################################################################
+# USER SETTINGS - CHANGE AS APPROPRIATE                                      #
+##############################################################################
+
+# HOST, PORT: address on which the proxy listens
+HOST = ""
+PORT = 8081
+
+# TTLS: Time in seconds for which each type of page is cached.
+TTLS = {"livescores": 15,
+        "detail": 15,
+        "tables": 600,
+        "results": 600,
+        "fixtures": 3600}
+
+# LOGFILE:
+LOGFILE = "/home/pi/cache_proxy.log"
+
+# DEBUG_LEVEL: set the log level here
+DEBUG_LEVEL = logging.ERROR
+
+##############################################################################
+# DO NOT CHANGE ANYTHING BELOW THIS LINE                                     #
+##############################################################################
+
+logger = logging.getLogger("CacheProxy")
+logger.setLevel(DEBUG_LEVEL)
+fh = logging.FileHandler(LOGFILE)
+formatter = logging.Formatter('%(asctime)s: '
+                              '%(levelname)s: %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+if __name__ == "__main__":
+
+    server = CacheProxyServer((HOST, PORT), ttls=TTLS, logger=logger)
+
+    try:
+        logger.debug("Starting caching proxy...")
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        logger.error("User exited with ctrl+C.")
+
+    except:
+        logger.exception("Exception encountered. See traceback message.")
+        raise
@@ -18,6 +18,16 @@ Version: 0.1
 import logging
 
 from service.scoresservice import ScoreNotifierService
+from service.ratelimit import RateLimiter
+from service.footballscores import matchcommon
+from service.detailpolicy import DetailPolicy
+from service.providers import JSONProvider
+from service.recorder import PageRecorder, PageReplayer
+from service.metrics import Metrics, MetricsServer, MetricsDumper
+from service.tracing import Tracer
+from service.profiling import CycleProfiler
+from service.timeline import TimelineArchive
+from service.eventlog import BatchedFileHandler, RingBufferHandler
 from notifiers.notifier_autoremote import AutoRemoteNotifier
 from notifiers.notifier_email import EmailNotifier
 
@@ -34,13 +44,28 @@ myTeam = "Chelsea"
 #                       when there is no match on the day
 # NB. Once a match is found, the script will try to sleep until 5 minutes
 # before kick-off
+# All goals, cards and status changes since the last update are reported, so
+# LIVE_UPDATE_TIME can be increased to reduce the number of requests without
+# missing notifications (they will just arrive a little later).
 LIVE_UPDATE_TIME = 30
 NON_LIVE_UPDATE_TIME = 60 * 60
 
+# PROBE_UPDATE_TIME: Time in seconds between quick checks of the match while
+# it is live. A check only reads the match's row from the live scores page and
+# the match is only refreshed fully if the row has changed (or after
+# LIVE_UPDATE_TIME seconds). Set to None to disable.
+PROBE_UPDATE_TIME = None
+
 # DETAILED - Request additional information on match (e.g. goalscorers)
 # Should be updated to reflect the needs of the specific notifier
 DETAILED = True
 
+# DETAIL_REFRESH_TIME - When DETAILED is True, match details are only
+# requested when the score or status changes. Bookings don't change the score
+# so details are also refreshed every DETAIL_REFRESH_TIME seconds while the
+# match is in play. Set to None to disable.
+DETAIL_REFRESH_TIME = 300
+
 # LOGFILE:
 LOGFILE = "/home/pi/service.log"
 
@@ -52,6 +77,85 @@ LOGFILE = "/home/pi/service.log"
 # logging.ERROR: Just provide log info when an error is encountered.
 DEBUG_LEVEL = logging.ERROR
 
+# LOG_WRITE_TIME: Log messages are written to LOGFILE in batches (to reduce
+# writes to the SD card) at most this number of seconds apart. Errors are
+# written straight away.
+# LOG_BUFFER_SIZE: Number of recent debug messages kept in memory, whatever
+# DEBUG_LEVEL is set to. They are written to LOGFILE if an error occurs so that
+# the events leading up to it can be seen. Set to None to disable.
+LOG_WRITE_TIME = 60
+LOG_BUFFER_SIZE = 1000
+
+# RATE LIMITS: Limit the number of requests sent to the BBC (and other
+# hosts) and the number of notifications sent by the notifier.
+# HOST_RATE:     maximum requests per second to any single host
+# HOST_BURST:    number of requests that can be made in a burst
+# NOTIFIER_RATE: maximum notifications per second (e.g. Gmail will throttle
+#                accounts sending too many emails)
+# NOTIFIER_BURST: number of notifications that can be sent in a burst
+# REQUEST_BUDGET: maximum number of requests per minute across all hosts and
+#                 notifiers (None for no limit)
+HOST_RATE = 2
+HOST_BURST = 5
+NOTIFIER_RATE = 0.2
+NOTIFIER_BURST = 3
+REQUEST_BUDGET = None
+
+# PROXY_BASE: If you are running cache_proxy.py on your network, set this to
+# the address of the proxy (e.g. "http://192.168.1.10:8081") so that BBC pages
+# are requested from the proxy. Set to None to request pages directly.
+PROXY_BASE = None
+
+# DATA_FEED: By default, scores are scraped from the BBC website. If you have
+# a structured JSON feed (see service/providers.py for the layout), set this
+# to the base url of the feed or the path of a local directory containing it.
+DATA_FEED = None
+
+# RECORD_ARCHIVE: Set to a file path (e.g. "/home/pi/matchday.jsonl.gz") to
+# save every page requested to a compressed archive.
+# REPLAY_ARCHIVE: Set to the path of a recorded archive to replay it instead
+# of using the network (e.g. for testing). REPLAY_SPEED sets how many times
+# faster than real time the recording is replayed.
+RECORD_ARCHIVE = None
+REPLAY_ARCHIVE = None
+REPLAY_SPEED = 100
+
+# TIMELINE_DIR: Set to a directory (e.g. "/home/pi/timelines") to keep a
+# record of every change to the score, status, match time and incidents of
+# the team's matches (see service.timeline).
+TIMELINE_DIR = None
+
+# METRICS_PORT: Set to a port number (e.g. 9100) to collect metrics (requests,
+# parse times, events, notification times) and serve them at
+# http://<host>:<port>/metrics in the Prometheus format.
+# METRICS_DUMP_TIME: Set to a number of seconds to write the metrics to the
+# log file (at INFO level) at that interval.
+# Metrics aren't collected if both are None.
+METRICS_PORT = None
+METRICS_DUMP_TIME = None
+
+# TRACE_GOALS: Set to True to record how long each goal takes to reach the
+# notifier, split into stages (time since the last refresh, fetching the
+# scores, parsing, fetching details, processing and notifying). Each goal is
+# logged at INFO level and the stage times are added to the metrics.
+TRACE_GOALS = False
+
+# PROFILE_DIR: Set to a directory (e.g. "/home/pi/profiles") to allow the
+# service to be profiled while it is running. Send the process SIGUSR1
+# (kill -USR1 <pid>) to profile the next PROFILE_CYCLES refresh cycles and
+# SIGUSR2 to save a snapshot of memory use.
+# PROFILE_MODE: "cprofile" (detailed) or "sampling" (low overhead)
+# PROFILE_AT_START: Set to True to profile the first PROFILE_CYCLES cycles
+# MEMORY_SNAPSHOT_CYCLES: Set to a number of cycles to save a memory snapshot
+# every that many cycles (e.g. to look for slow leaks). None to disable.
+# PROFILE_KEEP: number of profiles (and snapshots) to keep
+PROFILE_DIR = None
+PROFILE_MODE = "sampling"
+PROFILE_CYCLES = 10
+PROFILE_AT_START = False
+MEMORY_SNAPSHOT_CYCLES = None
+PROFILE_KEEP = 5
+
 ##############################################################################
 # NOTIFIERS - You should only initialise one notifier and comment out the    #
 # other. Future versions may allow for multiple notifiers                    #
@@ -94,16 +198,70 @@ prefix = "scores"
 logger = logging.getLogger("ScoresService")
 logger.setLevel(DEBUG_LEVEL)
 
-# Tell the logger to use our filepath
-fh = logging.FileHandler(LOGFILE)
+# Tell the logger to use our filepath (written in batches)
+fh = BatchedFileHandler(LOGFILE, interval=LOG_WRITE_TIME)
+fh.setLevel(DEBUG_LEVEL)
 
 # Set the format for our output
 formatter = logging.Formatter('%(asctime)s: '
                               '%(levelname)s: %(message)s')
 fh.setFormatter(formatter)
+
+# Keep recent debug messages in memory in case of errors
+if LOG_BUFFER_SIZE:
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(RingBufferHandler(fh, capacity=LOG_BUFFER_SIZE))
+
 logger.addHandler(fh)
 logger.debug("Logger initialised.")
 
+# Send BBC page requests via the caching proxy (if set)
+matchcommon.proxybase = PROXY_BASE
+
+# Use the JSON feed (if set) rather than scraping the BBC
+if DATA_FEED:
+    matchcommon.provider = JSONProvider(DATA_FEED)
+
+# Record or replay pages
+if RECORD_ARCHIVE:
+    matchcommon.recorder = PageRecorder(RECORD_ARCHIVE)
+if REPLAY_ARCHIVE:
+    matchcommon.replayer = PageReplayer(REPLAY_ARCHIVE, speed=REPLAY_SPEED)
+
+# Create the rate limiter shared by the scraper and the notifier. Unknown
+# hosts get the default host limit.
+ratelimiter = RateLimiter(
+    limits={RateLimiter.notifierKey(notifier): (NOTIFIER_RATE,
+                                                NOTIFIER_BURST)},
+    default=(HOST_RATE, HOST_BURST),
+    budget=REQUEST_BUDGET)
+
+# Collect metrics (if required)
+metrics = None
+if METRICS_PORT or METRICS_DUMP_TIME:
+    metrics = Metrics()
+if METRICS_PORT:
+    MetricsServer(("", METRICS_PORT), metrics).start()
+if METRICS_DUMP_TIME:
+    MetricsDumper(metrics, logger, interval=METRICS_DUMP_TIME).start()
+
+# Trace goal notifications (if required)
+tracer = Tracer(metrics=metrics, logger=logger) if TRACE_GOALS else None
+
+# Profile on request (if required)
+profiler = None
+if PROFILE_DIR:
+    profiler = CycleProfiler(PROFILE_DIR, mode=PROFILE_MODE,
+                             cycles=PROFILE_CYCLES, keep=PROFILE_KEEP,
+                             memoryevery=MEMORY_SNAPSHOT_CYCLES,
+                             logger=logger)
+    profiler.installSignals()
+    if PROFILE_AT_START:
+        profiler.request()
+
+# Keep the timelines of matches (if required)
+timeline = TimelineArchive(TIMELINE_DIR) if TIMELINE_DIR else None
+
 if __name__ == "__main__":
 
     try:
@@ -113,7 +271,15 @@ if __name__ == "__main__":
                                        livetime=LIVE_UPDATE_TIME,
                                        nonlivetime=NON_LIVE_UPDATE_TIME,
                                        logger=logger,
-                                       detailed=DETAILED)
+                                       detailed=DETAILED,
+                                       ratelimiter=ratelimiter,
+                                       detailpolicy=DetailPolicy(
+                                           refresh=DETAIL_REFRESH_TIME),
+                                       probetime=PROBE_UPDATE_TIME,
+                                       metrics=metrics,
+                                       tracer=tracer,
+                                       profiler=profiler,
+                                       timeline=timeline)
         logger.debug("Starting service...")
         service.run()
 
@@ -11,6 +11,8 @@ import service.constants as CONST
 # Constants are as follows:
 # CONST.GOAL_MYTEAM - Called when the selected team scores
 # CONST.GOAL_OPPOSITION - called when the opposition team scores
+# CONST.GOAL_DISALLOWED - called when a goal is removed from the score (e.g.
+#                         disallowed after a VAR review or a correction)
 # CONST.STATUS_MATCH_FOUND - called when the service find a new match. Only
 #                            called once per match.
 # CONST.STATUS_KICK_OFF - called when play starts (either half)
@@ -17,6 +17,7 @@ PRE_HALF_TIME = "HALF TIME!"
 PRE_FULL_TIME = "FULL TIME!"
 PRE_TEAM_GOAL = "GOOOOOOAAAAALLL!!!"
 PRE_OPPOSITION_GOAL = "Uh oh..."
+PRE_GOAL_DISALLOWED = "Goal disallowed."
 
 # This shouldn't be needed, but let's have it just in case.
 PRE_OTHER = "Unknown status"
@@ -24,6 +25,7 @@ PRE_OTHER = "Unknown status"
 # Lookup to match events to the desred prefix.
 PREFIXES = {CONST.GOAL_MYTEAM: PRE_TEAM_GOAL,
             CONST.GOAL_OPPOSITION: PRE_OPPOSITION_GOAL,
+            CONST.GOAL_DISALLOWED: PRE_GOAL_DISALLOWED,
             CONST.STATUS_MATCH_FOUND: PRE_NEW_MATHCH,
             CONST.STATUS_KICK_OFF: PRE_KICK_OFF,
             CONST.STATUS_HALF_TIME: PRE_HALF_TIME,
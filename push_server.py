@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Live Football Scores Push Server
+
+by elParaguayo
+
+Scrapes the live scores once and pushes changes (new matches, goals, status
+changes and incidents) to any number of local clients via Server-Sent Events.
+
+Clients should connect to http://<host>:<port>/events and can filter events
+by adding team and/or competition parameters e.g.
+
+  /events?team=Chelsea&team=Arsenal
+  /events?competition=premier-league
+"""
+
+import logging
+
+from service.pushserver import PushServer
+from service.timeline import TimelineArchive
+
+##############################################################################
+# USER SETTINGS - CHANGE AS APPROPRIATE                                      #
+##############################################################################
+
+# HOST, PORT: address on which the server listens
+HOST = ""
+PORT = 8080
+
+# UPDATE_TIME: Time in seconds between refreshes of the live scores
+UPDATE_TIME = 30
+
+# DETAILED - Request additional information on matches (e.g. goalscorers)
+DETAILED = False
+
+# LEAGUES - list of league ids to follow. Set to None to follow all active
+# leagues.
+LEAGUES = None
+
+# TIMELINE_DIR: Set to a directory (e.g. "/home/pi/timelines") to keep a
+# record of every change to the score, status, match time and incidents of
+# every match (see service.timeline).
+TIMELINE_DIR = None
+
+# LOGFILE:
+LOGFILE = "/home/pi/push_server.log"
+
+# DEBUG_LEVEL: set the log level here
+DEBUG_LEVEL = logging.ERROR
+
+##############################################################################
+# DO NOT CHANGE ANYTHING BELOW THIS LINE                                     #
+##############################################################################
+
+logger = logging.getLogger("PushServer")
+logger.setLevel(DEBUG_LEVEL)
+fh = logging.FileHandler(LOGFILE)
+formatter = logging.Formatter('%(asctime)s: '
+                              '%(levelname)s: %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+if __name__ == "__main__":
+
+    server = PushServer((HOST, PORT),
+                        interval=UPDATE_TIME,
+                        detailed=DETAILED,
+                        leagues=LEAGUES,
+                        logger=logger,
+                        timeline=(TimelineArchive(TIMELINE_DIR)
+                                  if TIMELINE_DIR else None))
+
+    try:
+        logger.debug("Starting push server...")
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        logger.error("User exited with ctrl+C.")
+
+    except:
+        logger.exception("Exception encountered. See traceback message.")
+        raise
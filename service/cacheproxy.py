@@ -0,0 +1,221 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides a small caching HTTP proxy for the BBC pages used by
+service.footballscores. Any number of clients on the local network can be
+pointed at the proxy by setting:
+
+  matchcommon.proxybase = "http://<host>:<port>"
+
+Each page is fetched from the BBC at most once per time-to-live, however many
+clients request it. Expired pages are revalidated with a conditional request
+(ETag/Last-Modified) and a stale copy is served if the BBC can't be reached.
+"""
+import threading
+import socket
+from time import time
+from urlparse import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import requests
+
+from service.footballscores import (matchcommon, FootballMatch, LeagueTable,
+                                    Results, Fixtures)
+
+
+def _pathPrefix(url):
+    """Returns the path of the url up to the first format placeholder."""
+    return urlparse(url).path.split("{")[0]
+
+
+# Map of page families to the path prefixes of the urls used by the scraper.
+FAMILIES = [("livescores", _pathPrefix(matchcommon.livescoreslink)),
+            ("detail", _pathPrefix(FootballMatch.detailprefix)),
+            ("tables", _pathPrefix(LeagueTable.leaguebase)),
+            ("results", _pathPrefix(Results.resultbase)),
+            ("fixtures", _pathPrefix(Fixtures.fixturebase))]
+
+# Default time to live (seconds) for each page family. Live pages change
+# quickly, tables/results/fixtures don't.
+DEFAULT_TTLS = {"livescores": 15,
+                "detail": 15,
+                "tables": 600,
+                "results": 600,
+                "fixtures": 3600,
+                None: 60}
+
+
+def pageFamily(path):
+    """Returns the family of the requested path (or None if unknown)."""
+    for family, prefix in FAMILIES:
+        if path.startswith(prefix):
+            return family
+    return None
+
+
+class CachedPage(object):
+    """Class object holding one cached page."""
+
+    __slots__ = ("body", "contenttype", "etag", "modified", "expires")
+
+    def __init__(self, body, contenttype, etag, modified, expires):
+        self.body = body
+        self.contenttype = contenttype
+        self.etag = etag
+        self.modified = modified
+        self.expires = expires
+
+    @property
+    def Fresh(self):
+        return time() < self.expires
+
+
+class PageCache(object):
+    """Class object to fetch and cache pages from the upstream server.
+
+    Concurrent requests for the same page wait for a single upstream fetch.
+    """
+
+    def __init__(self, upstream=matchcommon.bbcbase, ttls=None, timeout=5,
+                 ratelimiter=None):
+        """Method to create an instance of the cache.
+
+        upstream:    base url of the upstream server
+        ttls:        (optional) dict of family: seconds to override defaults
+        timeout:     timeout in seconds for upstream requests
+        ratelimiter: (optional) service.ratelimit.RateLimiter
+        """
+        self.upstream = upstream.rstrip("/")
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.timeout = timeout
+        self.ratelimiter = ratelimiter
+        self.__pages = {}
+        self.__locks = {}
+        self.__lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stale": 0}
+
+    def __pageLock(self, path):
+        with self.__lock:
+            return self.__locks.setdefault(path, threading.Lock())
+
+    def __count(self, stat):
+        with self.__lock:
+            self.stats[stat] += 1
+
+    def get(self, path):
+        """Returns a tuple of (CachedPage, cache status) for the path.
+
+        Cache status is one of "HIT", "MISS", "REVALIDATED" or "STALE".
+        CachedPage is None if the page couldn't be retrieved.
+        """
+        with self.__pageLock(path):
+            page = self.__pages.get(path)
+
+            if page is not None and page.Fresh:
+                self.__count("hits")
+                return page, "HIT"
+
+            newpage, status = self.__fetch(path, page)
+
+            if newpage is None:
+                if page is not None:
+                    self.__count("stale")
+                    return page, "STALE"
+                return None, status
+
+            self.__pages[path] = newpage
+            self.__count("revalidated" if status == "REVALIDATED"
+                         else "misses")
+            return newpage, status
+
+    def __fetch(self, path, old=None):
+        """Fetches the page from upstream, revalidating the old copy if
+        there is one.
+        """
+        url = self.upstream + path
+        headers = {}
+
+        if old is not None:
+            if old.etag:
+                headers["If-None-Match"] = old.etag
+            if old.modified:
+                headers["If-Modified-Since"] = old.modified
+
+        if self.ratelimiter is not None:
+            self.ratelimiter.acquireURL(url)
+
+        try:
+            r = requests.get(url, headers=headers, timeout=self.timeout)
+        except (socket.timeout, requests.RequestException):
+            return None, "ERROR"
+
+        expires = time() + self.ttls.get(pageFamily(urlparse(url).path),
+                                         self.ttls[None])
+
+        if r.status_code == 304 and old is not None:
+            old.expires = expires
+            return old, "REVALIDATED"
+
+        if r.status_code != 200:
+            return None, "ERROR"
+
+        page = CachedPage(r.content,
+                          r.headers.get("Content-Type", "text/html"),
+                          r.headers.get("ETag"),
+                          r.headers.get("Last-Modified"),
+                          expires)
+        return page, "MISS"
+
+    def clear(self):
+        with self.__lock:
+            self.__pages = {}
+
+
+class CacheProxyRequestHandler(BaseHTTPRequestHandler):
+    """Request handler for the caching proxy."""
+
+    def do_GET(self):
+        page, status = self.server.cache.get(self.path)
+
+        if page is None:
+            self.send_error(502)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", page.contenttype)
+        self.send_header("Content-Length", str(len(page.body)))
+        self.send_header("X-Cache", status)
+        self.end_headers()
+        self.wfile.write(page.body)
+
+    def log_message(self, format, *args):
+        if self.server.logger is not None:
+            self.server.logger.debug(format % args)
+
+
+class CacheProxyServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server serving cached copies of the BBC pages.
+
+    e.g. server = CacheProxyServer(("", 8081))
+         server.serve_forever()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, upstream=matchcommon.bbcbase, ttls=None,
+                 ratelimiter=None, logger=None):
+        """Method to create an instance of the proxy.
+
+        address:     (host, port) tuple to listen on
+        upstream:    base url of the upstream server
+        ttls:        (optional) dict of family: seconds. Families are
+                     "livescores", "detail", "tables", "results", "fixtures"
+        ratelimiter: (optional) service.ratelimit.RateLimiter
+        logger:      (optional) logger object for debug logs
+        """
+        HTTPServer.__init__(self, address, CacheProxyRequestHandler)
+        self.logger = logger
+        self.cache = PageCache(upstream, ttls=ttls, ratelimiter=ratelimiter)
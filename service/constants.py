@@ -4,7 +4,16 @@ to process updates.
 
 GOAL_MYTEAM = "goodgoal"
 GOAL_OPPOSITION = "badgoal"
+GOAL_DISALLOWED = "disallowed"
 STATUS_MATCH_FOUND = "found"
 STATUS_KICK_OFF = "L"
 STATUS_HALF_TIME = "HT"
 STATUS_FULL_TIME = "FT"
+
+# Event types used for match change events (e.g. by the push server).
+EVENT_NEW_MATCH = "newmatch"
+EVENT_GOAL = "goal"
+EVENT_STATUS = "status"
+EVENT_INCIDENT = "incident"
+EVENT_CARD = "card"
+EVENT_SCORE_CORRECTION = "correction"
@@ -0,0 +1,77 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides DetailPolicy which decides when a detailed FootballMatch
+needs to fetch its match detail page (goalscorers, cards).
+
+Fetching the detail page means an extra http request and a full parse of the
+page. Goals can only appear on the detail page when the score changes, so
+the page is fetched when the summary row of the match (score, status) has
+changed. Bookings don't change the score, so a background refresh can be set
+to pick these up at a lower frequency while the match is in play.
+"""
+from time import time
+
+
+class DetailPolicy(object):
+    """Class object to decide when match details should be fetched.
+
+    A single policy can be shared by many matches. The number of detail
+    requests made and saved is recorded for each match.
+    """
+
+    def __init__(self, refresh=300):
+        """Method to create an instance of the policy.
+
+        refresh: number of seconds between background refreshes of the
+                 details of a live match (e.g. to pick up bookings). Set to
+                 None to only fetch details when the score or status changes.
+        """
+        self.refresh = refresh
+        self.__stats = {}
+
+    def shouldFetch(self, match, changed):
+        """Boolean. Returns True if the match details should be fetched.
+
+        match:   FootballMatch object
+        changed: True if the match's summary row changed at this update
+        """
+        stats = self.__stats.setdefault(match.matchid, {"fetched": 0,
+                                                        "saved": 0,
+                                                        "last": None})
+        now = time()
+
+        if changed or stats["last"] is None:
+            fetch = True
+
+        # Nothing happens before kick off or after full time
+        elif not match.IsLive:
+            fetch = False
+
+        else:
+            fetch = (self.refresh is not None and
+                     now - stats["last"] >= self.refresh)
+
+        if fetch:
+            stats["fetched"] += 1
+            stats["last"] = now
+        else:
+            stats["saved"] += 1
+
+        return fetch
+
+    def forget(self, matchid):
+        """Removes the record for the match (e.g. once it has finished)."""
+        self.__stats.pop(matchid, None)
+
+    @property
+    def Report(self):
+        """Returns dict of matchid: {"fetched": n, "saved": n}"""
+        return {k: {"fetched": v["fetched"], "saved": v["saved"]}
+                for k, v in self.__stats.items()}
+
+    @property
+    def Saved(self):
+        """Returns the total number of detail requests saved."""
+        return sum(v["saved"] for v in self.__stats.values())
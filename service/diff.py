@@ -0,0 +1,132 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module compares two MatchSnapshots of the same match and returns the
+full, ordered list of events which happened in between. Unlike the flags on
+FootballMatch (which can only report one goal per update), this reports
+every goal, card, score correction and status change, so nothing is missed
+when the match is polled less often.
+
+Events are ordered as follows:
+
+  1. kick-off (if the match has just started or restarted)
+  2. score corrections (e.g. goals disallowed after a VAR review)
+  3. goals and cards, in order of match time where known
+  4. any other status change (half time, full time)
+"""
+import service.constants as CONST
+from service.eventbus import Event
+from service.matchtable import parseMinute
+
+
+def _newIncidents(old, new):
+    """Returns list of incidents in new snapshot which aren't in the old."""
+    seen = set(old.incidents)
+    return [i for i in new.incidents if i not in seen]
+
+
+def _goalCode(side, snapshot, myteam):
+    """Returns the notifier code for a goal scored by the given side."""
+    if myteam is None:
+        return None
+    team = snapshot.hometeam if side == "home" else snapshot.awayteam
+    return CONST.GOAL_MYTEAM if team == myteam else CONST.GOAL_OPPOSITION
+
+
+def diffSnapshots(old, new, myteam=None):
+    """Returns ordered list of Event objects describing the changes between
+    two snapshots.
+
+    old:    previous MatchSnapshot (or None if there wasn't one)
+    new:    current MatchSnapshot
+    myteam: (optional) name of the followed team. If set, goal events are
+            given the CONST.GOAL_MYTEAM/CONST.GOAL_OPPOSITION notifier codes.
+
+    If there is no previous snapshot (or it relates to a different match)
+    then a single new match event is returned.
+    """
+    if old is None or old.matchid != new.matchid:
+        return [Event.fromSnapshot(CONST.EVENT_NEW_MATCH, new,
+                                   CONST.STATUS_MATCH_FOUND)]
+
+    events = []
+
+    statuschange = old.status != new.status
+    kickoff = statuschange and new.status == CONST.STATUS_KICK_OFF
+
+    if kickoff:
+        events.append(Event.fromSnapshot(CONST.EVENT_STATUS, new, new.status,
+                                         oldstatus=old.status))
+
+    homescore = old.homescore or 0
+    awayscore = old.awayscore or 0
+    dhome = (new.homescore or 0) - homescore
+    daway = (new.awayscore or 0) - awayscore
+
+    # Goals which have been taken away from the score
+    for side, delta in (("home", dhome), ("away", daway)):
+        for _ in range(-delta):
+            if side == "home":
+                homescore -= 1
+            else:
+                awayscore -= 1
+            events.append(Event.fromSnapshot(CONST.EVENT_SCORE_CORRECTION,
+                                             new, CONST.GOAL_DISALLOWED,
+                                             side=side,
+                                             homescore=homescore,
+                                             awayscore=awayscore))
+
+    # Build a list of (minute, order, type, side, incident) for each new goal
+    # and card. Goals are matched with the most recent goal incidents for the
+    # same side where incident details are available.
+    incidents = _newIncidents(old, new)
+    timeline = []
+
+    for side, delta in (("home", dhome), ("away", daway)):
+        if delta <= 0:
+            continue
+        goals = [i for i in incidents if i[0] == side and i[1] == "goal"]
+        goals = goals[-delta:]
+        goals = [None] * (delta - len(goals)) + goals
+        for goal in goals:
+            timeline.append((CONST.EVENT_GOAL, side, goal))
+
+    for incident in incidents:
+        if incident[1] in ("yellow", "red"):
+            timeline.append((CONST.EVENT_CARD, incident[0], incident))
+
+    def _order(item):
+        incident = item[2]
+        minute = parseMinute(incident[3]) if incident else -1
+        # Goals without details (minute -1) are reported after those with
+        return minute if minute >= 0 else 999
+
+    timeline.sort(key=_order)
+
+    for eventtype, side, incident in timeline:
+        if eventtype == CONST.EVENT_GOAL:
+            if side == "home":
+                homescore += 1
+            else:
+                awayscore += 1
+            data = {"side": side,
+                    "homescore": homescore,
+                    "awayscore": awayscore}
+            if incident:
+                data.update(player=incident[2], time=incident[3])
+            events.append(Event.fromSnapshot(eventtype, new,
+                                             _goalCode(side, new, myteam),
+                                             **data))
+        else:
+            events.append(Event.fromSnapshot(eventtype, new,
+                                             side=side,
+                                             red=incident[1] == "red",
+                                             player=incident[2],
+                                             time=incident[3]))
+
+    if statuschange and not kickoff:
+        events.append(Event.fromSnapshot(CONST.EVENT_STATUS, new, new.status,
+                                         oldstatus=old.status))
+
+    return events
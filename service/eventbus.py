@@ -0,0 +1,161 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides an in-process event bus. Subscribers register a
+callback with optional filters on team, competition, match id and event
+type and are called for every matching event.
+
+Subscriptions are indexed by their filters so that publishing an event only
+touches the subscriptions that match it, rather than checking every
+subscriber in turn.
+"""
+import threading
+from itertools import product
+
+import service.constants as CONST
+
+
+class Event(object):
+    """Class object representing a single match event.
+
+    type:        one of the CONST.EVENT_* types
+    code:        notifier code (CONST.GOAL_MYTEAM, CONST.STATUS_HALF_TIME
+                 etc.) to be passed to notifiers. May be None.
+    match:       object the event relates to (e.g. FootballMatch)
+    matchid:     id of the match
+    hometeam:    name of home team
+    awayteam:    name of away team
+    competition: name or id of the competition
+    data:        dict of any additional information
+    trace:       (optional) service.tracing.Trace recording how long the
+                 event took to reach the notifier
+    """
+
+    __slots__ = ("type", "code", "match", "matchid", "hometeam", "awayteam",
+                 "competition", "data", "trace")
+
+    def __init__(self, type, code=None, match=None, matchid=None,
+                 hometeam=None, awayteam=None, competition=None, data=None,
+                 trace=None):
+        self.type = type
+        self.code = code
+        self.match = match
+        self.matchid = matchid
+        self.hometeam = hometeam
+        self.awayteam = awayteam
+        self.competition = competition
+        self.data = data or {}
+        self.trace = trace
+
+    @classmethod
+    def fromMatch(cls, type, match, code=None, **data):
+        """Creates an event for a FootballMatch object."""
+        return cls(type, code=code, match=match, matchid=match.matchid,
+                   hometeam=match.hometeam, awayteam=match.awayteam,
+                   competition=match.competition, data=data)
+
+    @classmethod
+    def fromSnapshot(cls, type, snapshot, code=None, **data):
+        """Creates an event for a MatchSnapshot object."""
+        return cls(type, code=code, matchid=snapshot.matchid,
+                   hometeam=snapshot.hometeam, awayteam=snapshot.awayteam,
+                   competition=snapshot.competition, data=data)
+
+    def __repr__(self):
+        return "Event(\'%s\', matchid=%s, code=%s)" % (self.type,
+                                                      self.matchid,
+                                                      self.code)
+
+
+class EventBus(object):
+    """Class object to route events to subscribers.
+
+    Each subscription is stored under a key of (team, competition, matchid,
+    type) where None means "any". When an event is published, only the keys
+    which could match the event are looked up (at most 24 lookups), so the
+    cost of publishing depends on the number of matching subscribers and not
+    on the total number of subscriptions.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__index = {}
+        self.__subscriptions = {}
+        self.__nextid = 0
+
+    def subscribe(self, callback, teams=None, competitions=None,
+                  matchids=None, types=None):
+        """Registers a callback for events matching the filters.
+
+        callback:     function accepting one parameter (the Event)
+        teams:        (optional) list of team names
+        competitions: (optional) list of competitions
+        matchids:     (optional) list of match ids
+        types:        (optional) list of CONST.EVENT_* types
+
+        A filter which is not set matches all events. Returns a subscription
+        id which can be passed to unsubscribe.
+        """
+        keys = list(product(teams or [None],
+                            competitions or [None],
+                            matchids or [None],
+                            types or [None]))
+
+        with self.__lock:
+            subid = self.__nextid
+            self.__nextid += 1
+            self.__subscriptions[subid] = (callback, keys)
+
+            for key in keys:
+                self.__index.setdefault(key, {})[subid] = callback
+
+        return subid
+
+    def unsubscribe(self, subid):
+        """Removes the subscription with the given id."""
+        with self.__lock:
+            callback, keys = self.__subscriptions.pop(subid, (None, []))
+
+            for key in keys:
+                subs = self.__index.get(key)
+                if subs is not None:
+                    subs.pop(subid, None)
+                    if not subs:
+                        del self.__index[key]
+
+    def matching(self, event):
+        """Returns dict of subscription id: callback for the event."""
+        teams = set([event.hometeam, event.awayteam, None])
+        keys = product(teams,
+                       set([event.competition, None]),
+                       set([event.matchid, None]),
+                       set([event.type, None]))
+
+        matches = {}
+        with self.__lock:
+            index = self.__index
+            for key in keys:
+                subs = index.get(key)
+                if subs:
+                    matches.update(subs)
+
+        return matches
+
+    def publish(self, event):
+        """Sends the event to each matching subscriber (once per subscriber,
+        in order of subscription).
+
+        Returns the number of subscribers called.
+        """
+        matches = self.matching(event)
+
+        for subid in sorted(matches):
+            matches[subid](event)
+
+        return len(matches)
+
+    @property
+    def Subscriptions(self):
+        with self.__lock:
+            return len(self.__subscriptions)
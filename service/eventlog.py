@@ -0,0 +1,257 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides low-overhead structured logging for the service.
+
+LogMessage holds a message, its arguments and any key/value fields. It is
+passed to a standard logger in place of a string and is only formatted if
+(and when) a handler writes it out:
+
+  logger.debug(LogMessage("Sleeping for {} seconds", (delay,),
+                          {"status": "live"}))
+
+  -> Sleeping for 30 seconds status=live
+
+Two handlers keep the cost of debug logging down while a match is on:
+
+  RingBufferHandler  keeps the most recent records in memory (unformatted)
+                     and only writes them out, to another handler, when an
+                     error is logged.
+  BatchedFileHandler collects records and writes them to the log file in
+                     batches from a background thread, so the SD card is
+                     written to once per batch rather than once per line.
+
+As the ring buffer makes the logger accept debug records whatever the log
+level, writesAt should be used (rather than logger.isEnabledFor) to decide
+whether expensive debug information is worth gathering.
+"""
+import threading
+import logging
+from collections import deque
+
+
+class LogMessage(object):
+    """Class object for a log message which is formatted lazily.
+
+    message: message with str.format style placeholders
+    args:    tuple of arguments for the placeholders
+    fields:  dict of key/value pairs added to the end of the message
+    """
+
+    __slots__ = ("message", "args", "fields")
+
+    def __init__(self, message, args=(), fields=None):
+        self.message = message
+        self.args = args
+        self.fields = fields or {}
+
+    def __unicode__(self):
+        text = unicode(self.message)
+        if self.args:
+            text = text.format(*self.args)
+        if self.fields:
+            text = u"{} {}".format(text, u" ".join(
+                u"{}={}".format(k, self.formatValue(v))
+                for k, v in sorted(self.fields.items())))
+        return text
+
+    def __str__(self):
+        return unicode(self).encode("utf-8")
+
+    @staticmethod
+    def formatValue(value):
+        if isinstance(value, float):
+            return u"{:.3f}".format(value)
+        value = u"{}".format(value)
+        if u" " in value or not value:
+            return u'"{}"'.format(value.replace(u'"', u'\\"'))
+        return value
+
+
+def writesAt(logger, level):
+    """Returns True if a record at the level would be written out straight
+    away by one of the logger's handlers. Buffering handlers (i.e.
+    RingBufferHandler) aren't counted.
+    """
+    if not logger.isEnabledFor(level):
+        return False
+
+    while logger is not None:
+        for handler in logger.handlers:
+            if (not isinstance(handler, RingBufferHandler) and
+                    level >= handler.level):
+                return True
+        if not logger.propagate:
+            break
+        logger = logger.parent
+
+    return False
+
+
+class RingBufferHandler(logging.Handler):
+    """Handler which keeps the last "capacity" records in memory.
+
+    When a record at or above "flushlevel" is handled, the buffered records
+    below the target's level are passed to the target handler, so the events
+    leading up to an error can be seen without writing every debug message.
+    Records at or above the target's level are expected to be sent to the
+    target directly (i.e. both handlers are added to the logger).
+
+    The buffer is only written out after an error. flush (e.g. from
+    logging.shutdown at exit) doesn't write it.
+    """
+
+    def __init__(self, target, capacity=1000, flushlevel=logging.ERROR):
+        """Method to create an instance of the handler.
+
+        target:     handler to which the buffer is written on an error
+        capacity:   number of records kept
+        flushlevel: level of record which causes the buffer to be written
+        """
+        logging.Handler.__init__(self)
+        self.target = target
+        self.flushlevel = flushlevel
+        self.buffer = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.buffer.append(record)
+        if record.levelno >= self.flushlevel:
+            try:
+                self.writeBuffer()
+            except Exception:
+                self.handleError(record)
+
+    def flush(self):
+        pass
+
+    def writeBuffer(self):
+        """Passes the buffered records below the target's level to the
+        target and empties the buffer.
+        """
+        self.acquire()
+        try:
+            records = list(self.buffer)
+            self.buffer.clear()
+        finally:
+            self.release()
+        for record in records:
+            if record.levelno < self.target.level:
+                self.target.handle(record)
+        self.target.flush()
+
+    def dump(self):
+        """Returns list of the buffered messages (formatted)."""
+        return [self.format(r) for r in list(self.buffer)]
+
+
+class BatchedFileHandler(logging.Handler):
+    """Handler which writes records to a file in batches.
+
+    Records are formatted and written by a background thread every
+    "interval" seconds, or sooner if "batchsize" records are waiting or a
+    record at or above "flushlevel" is handled.
+
+    If the file can't be written (e.g. the SD card is full), the error is
+    reported with handleError and the records are kept to be tried again,
+    up to "maxpending" records. After that the oldest records are dropped
+    (and counted in "dropped").
+    """
+
+    def __init__(self, filename, interval=30, batchsize=200,
+                 flushlevel=logging.ERROR, maxpending=10000):
+        """Method to create an instance of the handler.
+
+        filename:   path of the log file (appended to)
+        interval:   maximum number of seconds between writes
+        batchsize:  number of records which triggers a write
+        flushlevel: level of record which is written immediately
+        maxpending: maximum number of records waiting to be written
+        """
+        logging.Handler.__init__(self)
+        self.filename = filename
+        self.interval = interval
+        self.batchsize = batchsize
+        self.flushlevel = flushlevel
+        self.maxpending = maxpending
+        self.writes = 0
+        self.dropped = 0
+        self.__pending = []
+        self.__wake = threading.Event()
+        self.__closed = False
+        self.__writelock = threading.Lock()
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def emit(self, record):
+        self.acquire()
+        try:
+            self.__pending.append(record)
+            self.__trim()
+            due = len(self.__pending) >= self.batchsize
+        finally:
+            self.release()
+        if due or record.levelno >= self.flushlevel:
+            self.__wake.set()
+
+    def __trim(self):
+        """Drops the oldest waiting records if there are too many. Called
+        with the handler's lock held.
+        """
+        excess = len(self.__pending) - self.maxpending
+        if excess > 0:
+            del self.__pending[:excess]
+            self.dropped += excess
+
+    def __run(self):
+        while not self.__closed:
+            self.__wake.wait(self.interval)
+            self.__wake.clear()
+            # The writer must keep running whatever happens to a write
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def flush(self):
+        """Writes out any waiting records."""
+        self.acquire()
+        try:
+            records, self.__pending = self.__pending, []
+        finally:
+            self.release()
+
+        if not records:
+            return
+
+        lines = []
+        for record in records:
+            try:
+                line = self.format(record)
+                if isinstance(line, unicode):
+                    line = line.encode("utf-8")
+                lines.append(line)
+            except Exception:
+                self.handleError(record)
+
+        try:
+            with self.__writelock:
+                with open(self.filename, "a") as f:
+                    f.write("\n".join(lines) + "\n")
+                self.writes += 1
+        except (IOError, OSError):
+            # Keep the records to try again next time
+            self.acquire()
+            try:
+                self.__pending[:0] = records
+                self.__trim()
+            finally:
+                self.release()
+            self.handleError(records[-1])
+
+    def close(self):
+        self.__closed = True
+        self.__wake.set()
+        self.flush()
+        logging.Handler.close(self)
@@ -23,9 +23,49 @@ import json
 import codecs
 import requests
 import socket
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer as timer
+from array import array
+
+from service.snapshot import MatchSnapshot
 
 __version__ = "0.3.0"
 
+# Classes used to identify incidents on the match detail page and the name
+# used for each type of incident in FootballMatch.rawincidents
+INCIDENT_TYPE_CLASS = re.compile(r"\bincident-type \b")
+INCIDENT_TYPES = (("goal", "goal"),
+                  ("yellow-card", "yellow"),
+                  ("red-card", "red"))
+
+# Suffix of the FootballMatch attribute holding each type of incident e.g.
+# homescorers, awayyellowcards
+INCIDENT_LISTS = {"goal": "scorers",
+                  "yellow": "yellowcards",
+                  "red": "redcards"}
+
+# Marker for the div containing the matches on the live scores pages. Only
+# this part of the page is downloaded when reading a league's matches.
+MATCHES_WRAPPER = 'id="matches-wrapper"'
+
+# Number of characters before a marker kept to find the start of its tag
+TAG_LOOKBACK = 512
+
+# Markup of the results and fixtures pages. Each match day is a
+# "table-header" heading followed by a table of its matches, all inside the
+# "fixtures-table" div.
+FIXTURES_TABLE = re.compile(r'<div\b[^>]*\bclass="[^"]*\bfixtures-table\b'
+                            r'[^>]*>')
+MATCH_DAY_TOKEN = re.compile(r'<(/?)div\b|<h2\b[^>]*\bclass="table-header"')
+DAY_TABLE_END = "</table>"
+DIV_OPEN = re.compile(r"<div\b")
+DIV_CLOSE = re.compile(r"</div\b")
+
+
+class PageError(IOError):
+    '''Raised when a page can't be read (or can't be read completely).'''
+
 
 class matchcommon(object):
     '''class for common functions for match classes.'''
@@ -33,6 +73,55 @@ class matchcommon(object):
     livescoreslink = ("http://www.bbc.co.uk/sport/shared/football/"
                       "live-scores/matches/{comp}/today")
 
+    # Optional service.ratelimit.RateLimiter shared by all match classes.
+    # Requests are limited per upstream host.
+    ratelimiter = None
+
+    # Optional base url of a caching proxy (see service.cacheproxy) e.g.
+    # "http://192.168.1.10:8081". If set, requests for BBC pages are sent to
+    # the proxy instead.
+    bbcbase = "http://www.bbc.co.uk"
+    proxybase = None
+
+    # Optional data provider (see service.providers). If set (and not the
+    # built-in html provider) match, league, table, results and fixtures
+    # data are requested from the provider rather than scraped.
+    provider = None
+
+    def externalProvider(self):
+        """Returns the data provider to be used instead of scraping the BBC
+        html pages (or None).
+        """
+        provider = self.provider
+        if provider is not None and not provider.native:
+            return provider
+        return None
+
+    # Optional service.recorder.PageRecorder/PageReplayer. If a recorder is
+    # set, responses are saved to its archive. If a replayer is set, pages
+    # are served from its archive instead of the network.
+    recorder = None
+    replayer = None
+
+    # Statistics for streamed page reads (shared by all match classes).
+    # When a read stops early, "bytessaved" is estimated from the response's
+    # Content-Length (or the size of a previous complete read of the url).
+    # Reads stopped early whose full size isn't known are counted as
+    # "unmeasured".
+    streamstats = {"requests": 0, "bytesread": 0, "bytessaved": 0,
+                   "stopped": 0, "unmeasured": 0}
+    pagesizes = {}
+
+    # Optional service.metrics.Metrics shared by all match classes. Nothing
+    # is measured unless this is set.
+    metrics = None
+
+    def proxyURL(self, url):
+        """Returns the url to be requested, taking account of any proxy."""
+        if self.proxybase and url.startswith(self.bbcbase):
+            return self.proxybase.rstrip("/") + url[len(self.bbcbase):]
+        return url
+
     def getPage(self, url, sendresponse=False):
         # page = None
         # try:
@@ -50,18 +139,438 @@ class matchcommon(object):
         # else:
         #     # Fixed this line to handle accented team namess
         #     return codecs.decode(page, "utf-8") if page else None
+        if self.replayer is not None:
+            return self.replayer.getPage(url)
+
+        requested = url
+        url = self.proxyURL(url)
+
+        if self.ratelimiter is not None:
+            self.ratelimiter.acquireURL(url)
+
+        start = timer()
         try:
             r = requests.get(url, timeout=2)
         # requests timeout doesn'r catch socket.timeout so we need to catch
         # both explicitly
         except (socket.timeout, requests.Timeout):
+            if self.metrics is not None:
+                self.metrics.observeFetch(requested, timer() - start, 0,
+                                          "timeout")
             return None
 
+        if self.metrics is not None:
+            self.metrics.observeFetch(requested, timer() - start,
+                                      len(r.content), r.status_code,
+                                      r.headers.get("X-Cache"))
+
+        if self.recorder is not None:
+            self.recorder.record(requested, r.content, r.headers,
+                                 r.status_code)
+
         if r.status_code == 200:
+            self.pagesizes[url] = len(r.content)
             return codecs.decode(r.content, "utf-8")
         else:
             return None
 
+    def streamPage(self, url, chunksize=8192, decode=True, timeout=2,
+                   strict=False):
+        '''Generator which yields the page in chunks as it is downloaded.
+
+        decode - if True, chunks are decoded (utf-8) as they arrive.
+        Otherwise the raw bytes are returned.
+
+        strict - if True, PageError is raised if the page can't be
+        retrieved or the download fails part way through. Otherwise the
+        page just ends early (or nothing is yielded).
+
+        The download stops as soon as the caller stops iterating (e.g.
+        breaks out of the loop or closes the generator), so callers which
+        only need part of a page don't need to wait for the rest of it.
+        If the page is being recorded, the rest of it is still read so
+        that it can be replayed.
+        '''
+        if self.replayer is not None:
+            page = self.replayer.getPage(url)
+            if not page and strict:
+                raise PageError("No recording of {}".format(url))
+            if page:
+                if not decode:
+                    page = page.encode("utf-8")
+                for i in xrange(0, len(page), chunksize):
+                    yield page[i:i + chunksize]
+            return
+
+        requested = url
+        url = self.proxyURL(url)
+
+        if self.ratelimiter is not None:
+            self.ratelimiter.acquireURL(url)
+
+        start = timer()
+        try:
+            r = requests.get(url, timeout=timeout, stream=True)
+        except (socket.timeout, requests.RequestException):
+            if self.metrics is not None:
+                self.metrics.observeFetch(requested, timer() - start, 0,
+                                          "error")
+            if strict:
+                raise PageError("Unable to request {}".format(requested))
+            return
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        read = 0
+        complete = False
+
+        # Only keep the chunks if we need to record the page
+        recorded = [] if self.recorder is not None else None
+
+        try:
+            if r.status_code != 200:
+                if strict:
+                    raise PageError("{} returned status {}".format(
+                        requested, r.status_code))
+                return
+
+            for chunk in r.iter_content(chunksize):
+                read += len(chunk)
+                if recorded is not None:
+                    recorded.append(chunk)
+                yield decoder.decode(chunk) if decode else chunk
+
+            complete = True
+            if decode:
+                tail = decoder.decode("", final=True)
+                if tail:
+                    yield tail
+
+        except GeneratorExit:
+            # Stopped early by the caller
+            if recorded is not None:
+                try:
+                    for chunk in r.iter_content(chunksize):
+                        read += len(chunk)
+                        recorded.append(chunk)
+                    complete = True
+                except (socket.timeout, requests.RequestException):
+                    pass
+            raise
+
+        except (socket.timeout, requests.RequestException):
+            if strict:
+                raise PageError("Download of {} failed after {} "
+                                "bytes".format(requested, read))
+
+        finally:
+            r.close()
+            stats = self.streamstats
+            stats["requests"] += 1
+            stats["bytesread"] += read
+            if complete:
+                self.pagesizes[url] = read
+                if recorded is not None:
+                    self.recorder.record(requested, "".join(recorded),
+                                         r.headers, r.status_code)
+            elif r.status_code == 200:
+                stats["stopped"] += 1
+                size = self.fullSize(url, r)
+                if size is None:
+                    stats["unmeasured"] += 1
+                else:
+                    stats["bytessaved"] += max(0, size - read)
+            if self.metrics is not None:
+                self.metrics.observeFetch(requested, timer() - start, read,
+                                          r.status_code,
+                                          r.headers.get("X-Cache"))
+
+    def fullSize(self, url, response):
+        '''Returns the full size (in bytes) of the page from the response's
+        Content-Length, or from a previous complete read of the url. Returns
+        None if it isn't known.
+
+        Content-Length is ignored for compressed responses as it isn't the
+        size of the decompressed page.'''
+        length = response.headers.get("Content-Length")
+        encoding = response.headers.get("Content-Encoding", "identity")
+        if length and encoding == "identity":
+            try:
+                return int(length)
+            except ValueError:
+                pass
+        return self.pagesizes.get(url)
+
+    def timeParse(self, name, parse, page):
+        '''Returns parse(page), recording the time taken against the name
+        (e.g. "livescores") if metrics are enabled.'''
+        if self.metrics is None:
+            return parse(page)
+        start = timer()
+        result = parse(page)
+        self.metrics.observe("parse_seconds", timer() - start, page=name)
+        return result
+
+    def getFragment(self, url, marker, tag="div"):
+        '''Returns the html of the element containing the marker (e.g.
+        'id="matches-wrapper"') without downloading the rest of the page.
+
+        Returns None if the marker isn't found.
+        '''
+        tagre = re.compile(r"<(/?){}\b".format(tag))
+        chunks = self.streamPage(url)
+        buf = u""
+        started = False
+        depth = 0
+        pos = 0
+
+        try:
+            for chunk in chunks:
+                buf += chunk
+
+                if not started:
+                    i = buf.find(marker)
+                    if i < 0:
+                        buf = buf[-(len(marker) + TAG_LOOKBACK):]
+                        continue
+                    j = buf.rfind("<" + tag, 0, i)
+                    buf = buf[j if j >= 0 else i:]
+                    started = True
+
+                for m in tagre.finditer(buf, pos):
+                    depth += -1 if m.group(1) else 1
+                    pos = m.end()
+                    if depth == 0:
+                        return buf[:pos] + ">"
+
+                # Allow for a tag split across chunks
+                pos = max(pos, len(buf) - len(tag) - 2)
+
+        finally:
+            chunks.close()
+
+        return buf if started else None
+
+    def iterMatchDays(self, url, name, parseday):
+        '''Generator which yields the match days on a results or fixtures
+        page in a single forward pass as the page is downloaded.
+
+        Each day (a "table-header" heading and the table which follows it)
+        is cut out of the html and passed to parseday as soon as it has
+        arrived, so only one day is held in memory at a time and the page
+        is never searched from the top again. Only days inside the
+        "fixtures-table" div are read, but the rest of the page is still
+        downloaded so that it can be recorded.
+
+        name - page name used when recording parse times (e.g. "results")
+
+        Raises PageError if the page can't be read completely or has no
+        "fixtures-table" div, rather than returning some of the days.
+        '''
+        chunks = self.streamPage(url, strict=True)
+        buf = u""
+        started = False
+        finished = False
+        depth = 0
+        pos = 0
+
+        try:
+            for chunk in chunks:
+                if finished:
+                    continue
+
+                buf += chunk
+
+                if not started:
+                    m = FIXTURES_TABLE.search(buf)
+                    if m is None:
+                        buf = buf[-TAG_LOOKBACK:]
+                        continue
+                    buf = buf[m.end():]
+                    started = True
+                    depth = 1
+
+                while True:
+                    m = MATCH_DAY_TOKEN.search(buf, pos)
+                    if m is None:
+                        # Allow for a tag split across chunks
+                        buf = buf[max(pos, len(buf) - TAG_LOOKBACK):]
+                        pos = 0
+                        break
+
+                    if m.group(1) is not None:
+                        depth += -1 if m.group(1) else 1
+                        pos = m.end()
+                        if depth == 0:
+                            finished = True
+                            buf = u""
+                            break
+                        continue
+
+                    end = buf.find(DAY_TABLE_END, m.end())
+                    if end < 0:
+                        # Wait for the rest of the day
+                        buf = buf[m.start():]
+                        pos = 0
+                        break
+
+                    end += len(DAY_TABLE_END)
+                    day = buf[m.start():end]
+                    depth += (len(DIV_OPEN.findall(day)) -
+                              len(DIV_CLOSE.findall(day)))
+                    buf = buf[end:]
+                    pos = 0
+
+                    day = self.timeParse(name, parseday, day)
+                    if day is not None:
+                        yield day
+
+            if not started:
+                raise PageError("No fixtures table on {}".format(url))
+
+        finally:
+            chunks.close()
+
+    @classmethod
+    def StreamReport(cls):
+        '''Returns dict of streamed read statistics including the average
+        number of bytes read and saved per request.
+
+        "unmeasured" is the number of reads which stopped early but whose
+        full size couldn't be found, so the bytes saved are a lower bound if
+        it isn't zero. If none of the reads which stopped early could be
+        measured, "savedperrequest" is None.'''
+        stats = dict(cls.streamstats)
+        count = stats["requests"] or 1
+        stats["bytesperrequest"] = stats["bytesread"] / count
+        if stats["stopped"] and stats["unmeasured"] == stats["stopped"]:
+            stats["savedperrequest"] = None
+        else:
+            stats["savedperrequest"] = stats["bytessaved"] / count
+        return stats
+
+
+def parseMatchRow(match):
+    '''Returns dict of the details of a match from its row ("tr" tag) on the
+    live scores page.
+
+    Keys are hometeam, awayteam, matchlink, status, matchtime, matchid,
+    homescore and awayscore.
+    '''
+    ht = {"class": "team-home"}
+    at = {"class": "team-away"}
+
+    hometeam = match.find("span", ht).text
+
+    awayteam = match.find("span", at).text
+
+    linkrow = match.find("td", {"class": "match-link"})
+    try:
+        link = linkrow.find("a").get("href")
+        matchlink = "http://www.bbc.co.uk%s" % (link)
+    except AttributeError:
+        matchlink = None
+
+    mclass = {"class": "elapsed-time"}
+
+    if match.get("class") == "fixture":
+        status = "Fixture"
+        matchtime = match.find("span", mclass).text.strip()[:5]
+
+    elif match.get("class") == "report":
+        status = "FT"
+        matchtime = None
+
+    elif ("%s" %
+          (match.find("span",
+           mclass).text.strip()) == "Half Time"):
+        status = "HT"
+        matchtime = None
+
+    else:
+        status = "L"
+        matchtime = match.find("span", mclass).text.strip()
+
+    matchid = match.get("id")[10:]
+
+    sclass = {"class": "score"}
+    score = match.find("span", sclass).text.strip().split(" - ")
+
+    try:
+        homescore = int(score[0].strip())
+        awayscore = int(score[1].strip())
+
+    except:
+        homescore = 0
+        awayscore = 0
+
+    return {"hometeam": hometeam,
+            "awayteam": awayteam,
+            "matchlink": matchlink,
+            "status": status,
+            "matchtime": matchtime,
+            "matchid": matchid,
+            "homescore": homescore,
+            "awayscore": awayscore}
+
+
+def parseIncident(row):
+    '''Returns (side, type, player, time) tuple for an incident row (as
+    returned by incidentRows) or None if the row isn't a goal or card.'''
+    itype = home = away = itime = None
+
+    for cls, text in row:
+        cls = cls or ""
+        if INCIDENT_TYPE_CLASS.search(cls):
+            itype = cls
+        elif cls == "incident-player-home":
+            home = text.strip()
+        elif cls == "incident-player-away":
+            away = text.strip()
+        elif cls == "incident-time":
+            itime = text.strip()
+
+    if itype is None:
+        return None
+
+    for typeclass, incidenttype in INCIDENT_TYPES:
+        if typeclass in itype:
+            if home:
+                return ("home", incidenttype, home, itime)
+            else:
+                return ("away", incidenttype, away, itime)
+
+    return None
+
+
+def incidentRows(page):
+    '''Returns list of incident rows from a match detail page.
+
+    Each row is a tuple of (class, text) for each cell in the row. Duplicate
+    rows are removed. Returns None if the page doesn't contain the incidents
+    table.
+
+    This is a module level function (with picklable results) so that detail
+    pages can be parsed in separate processes.
+    '''
+    try:
+        bs = BeautifulSoup(page)
+        iclass = {"class": "incidents-table"}
+        incidents = bs.find("table", iclass).findAll("tr")
+    except:
+        return None
+
+    rows = []
+    seen = set()
+    for incident in incidents:
+        cells = incident.findAll("td")
+        if cells:
+            row = tuple((c.get("class"), c.text) for c in cells)
+            if row not in seen:
+                seen.add(row)
+                rows.append(row)
+
+    return rows
+
 
 class FootballMatch(matchcommon):
     '''Class for getting details of individual football matches.
@@ -73,7 +582,7 @@ class FootballMatch(matchcommon):
     detailprefix = ("http://www.bbc.co.uk/sport/football/live/"
                     "partial/{id}")
 
-    def __init__(self, team, detailed=False, data=None):
+    def __init__(self, team, detailed=False, data=None, detailpolicy=None):
         '''Creates an instance of the Match object.
         Must be created by passing the name of one team.
 
@@ -82,8 +591,18 @@ class FootballMatch(matchcommon):
         can handle request on its own.
 
         detailed - Do we want additional data (e.g. goal scorers, bookings)?
+
+        detailpolicy - Optional service.detailpolicy.DetailPolicy to decide
+        when details should be refreshed. If not set, details are fetched at
+        every update.
         '''
         self.detailed = detailed
+        self.detailpolicy = detailpolicy
+        self.__detailsdue = False
+
+        # Time taken by each stage of the last update (see Timings)
+        self.__timings = {}
+        self.__fetchedat = None
 
         # Set the relevant urls
         self.detailedmatchpage = None
@@ -111,6 +630,12 @@ class FootballMatch(matchcommon):
             self.newmatch = True
 
     def __getUKTime(self):
+        # When replaying recorded pages, "now" is the replay clock (the
+        # recording's time) rather than the time of the replay
+        if self.replayer is not None:
+            return datetime.fromtimestamp(self.replayer.Now).replace(
+                second=0, microsecond=0)
+
         rawbbctime = self.getPage("http://api.geonames.org/timezoneJSON"
                                   "?formatted=true&lat=51.51&lng=0.13&"
                                   "username=elParaguayo&style=full")
@@ -133,12 +658,7 @@ class FootballMatch(matchcommon):
         self.homescore = None
         self.awayscore = None
         self.scorelink = None
-        self.homescorers = None
-        self.awayscorers = None
-        self.homeyellowcards = []
-        self.awayyellowcards = []
-        self.homeredcards = []
-        self.awayredcards = []
+        self.__resetIncidents()
         self.competition = None
         self.matchtime = None
         self.status = None
@@ -149,20 +669,44 @@ class FootballMatch(matchcommon):
         self.awaybadge = None
         self.matchid = None
         self.matchlink = None
-        self.rawincidents = []
         self.booking = False
         self.redcard = False
         self.leagueid = None
 
+    def __resetIncidents(self):
+        '''Clear all incident details'''
+        self.homescorers = None
+        self.awayscorers = None
+        self.homeyellowcards = []
+        self.awayyellowcards = []
+        self.homeredcards = []
+        self.awayredcards = []
+        self.rawincidents = []
+        self.__goalscorers = []
+        self.__yellowcards = []
+        self.__redcards = []
+
+        # Incidents are also held in a set (for fast lookup) and indexed by
+        # (side, type) and player so that new incidents can be added without
+        # searching the lists above.
+        self.__rawincidentset = set()
+        self.__incidentindex = {}
+
+        # Signatures of the incident rows which have already been processed
+        # and the match to which they relate.
+        self.__incidentrows = set()
+        self.__incidentsmatchid = None
+
     def __findMatch(self):
         leaguepage = self.getPage(self.livescoreslink.format(comp=""))
         data = None
         teamfound = False
+        scanned = 0
 
         if leaguepage:
 
             # Start with the default page so we can get list of active leagues
-            raw = BeautifulSoup(leaguepage)
+            raw = self.timeParse("index", BeautifulSoup, leaguepage)
 
             # Find the list of active leagues
             active = {"class": "drop-down-filter live-scores-fixtures"}
@@ -177,11 +721,13 @@ class FootballMatch(matchcommon):
                 if league:
                     scorelink = self.livescoreslink.format(comp=league)
 
-                    scorepage = self.getPage(scorelink)
+                    scorepage = self.getFragment(scorelink, MATCHES_WRAPPER)
+                    scanned += 1
 
                     if scorepage:
                         # Prepare to process page
-                        optionhtml = BeautifulSoup(scorepage)
+                        optionhtml = self.timeParse("livescores",
+                                                    BeautifulSoup, scorepage)
 
                         # We just want the live games...
                         liveid = {"id": "matches-wrapper"}
@@ -199,90 +745,70 @@ class FootballMatch(matchcommon):
 
         self.matchfound = teamfound
 
+        if self.metrics is not None:
+            self.metrics.observe("findmatch_leagues", scanned)
+
         return data
 
     def __getScores(self, data, update=False):
 
+        # Data supplied by a data provider
+        if isinstance(data, MatchSnapshot):
+            self.hometeam = data.hometeam
+            self.awayteam = data.awayteam
+            self.matchlink = None
+            self.__setScores(data.status, data.matchtime, data.matchid,
+                             data.homescore, data.awayscore, update)
+            return
+
         for match in data.findAll("tr", {"id": re.compile(r'^match-row')}):
             if match.find(text=self.myteam):
 
-                ht = {"class": "team-home"}
-                at = {"class": "team-away"}
-
-                self.hometeam = match.find("span", ht).text
-
-                self.awayteam = match.find("span", at).text
-
-                linkrow = match.find("td", {"class": "match-link"})
-                try:
-                    link = linkrow.find("a").get("href")
-                    self.matchlink = "http://www.bbc.co.uk%s" % (link)
-                except AttributeError:
-                    self.matchlink = None
-
-                mclass = {"class": "elapsed-time"}
-
-                if match.get("class") == "fixture":
-                    status = "Fixture"
-                    matchtime = match.find("span", mclass).text.strip()[:5]
-
-                elif match.get("class") == "report":
-                    status = "FT"
-                    matchtime = None
-
-                elif ("%s" %
-                      (match.find("span",
-                       mclass).text.strip()) == "Half Time"):
-                    status = "HT"
-                    matchtime = None
+                row = parseMatchRow(match)
 
-                else:
-                    status = "L"
-                    matchtime = match.find("span", mclass).text.strip()
-
-                matchid = match.get("id")[10:]
+                self.hometeam = row["hometeam"]
+                self.awayteam = row["awayteam"]
+                self.matchlink = row["matchlink"]
 
-                sclass = {"class": "score"}
-                score = match.find("span", sclass).text.strip().split(" - ")
-
-                try:
-                    homescore = int(score[0].strip())
-                    awayscore = int(score[1].strip())
+                self.__setScores(row["status"], row["matchtime"],
+                                 row["matchid"], row["homescore"],
+                                 row["awayscore"], update)
 
-                except:
-                    homescore = 0
-                    awayscore = 0
+    def __setScores(self, status, matchtime, matchid, homescore, awayscore,
+                    update=False):
+        '''Sets the state of the match and, if this is an update, the flags
+        for any changes.'''
 
-                self.statuschange = False
-                self.newmatch = False
-                self.goal = self.homegoal = self.awaygoal = False
-                self.myteamgoal = None
+        self.statuschange = False
+        self.newmatch = False
+        self.goal = self.homegoal = self.awaygoal = False
+        self.myteamgoal = None
 
-                if update:
+        if update:
 
-                    if not status == self.status:
-                        self.statuschange = True
+            if not status == self.status:
+                self.statuschange = True
 
-                    if not matchid == self.matchid:
-                        self.newmatch = True
+            if not matchid == self.matchid:
+                self.newmatch = True
 
-                    # if not (homescore == self.homescore and
-                    #         awayscore == self.awayscore):
+            # if not (homescore == self.homescore and
+            #         awayscore == self.awayscore):
 
-                    if homescore > self.homescore:
-                        self.myteamgoal = self.hometeam == self.myteam
-                        self.homegoal = True
-                    elif awayscore > self.awayscore:
-                        self.myteamgoal = self.awayteam == self.myteam
-                        self.awaygoal = True
+            if homescore > self.homescore:
+                self.myteamgoal = self.hometeam == self.myteam
+                self.homegoal = True
+            elif awayscore > self.awayscore:
+                self.myteamgoal = self.awayteam == self.myteam
+                self.awaygoal = True
 
-                    self.goal = any([self.homegoal, self.awaygoal])
+            self.goal = any([self.homegoal, self.awaygoal])
 
-                self.status = status if status else None
-                self.matchtime = matchtime if matchtime else None
-                self.matchid = matchid if matchid else None
-                self.homescore = homescore
-                self.awayscore = awayscore
+        self.status = status if status else None
+        self.matchtime = matchtime if matchtime else None
+        self.matchid = matchid if matchid else None
+        self.homescore = homescore
+        self.awayscore = awayscore
 
     def __update(self, data=None):
 
@@ -293,6 +819,9 @@ class FootballMatch(matchcommon):
 
     def __loadData(self, data=None):
 
+        if self.externalProvider() is not None:
+            return self.__loadProviderData(data)
+
         self.matchfound = False
 
         if data:
@@ -302,9 +831,12 @@ class FootballMatch(matchcommon):
                 data = None
 
         if not data and self.scorelink:
-            scorepage = self.getPage(self.scorelink)
+            scorepage = self.getFragment(self.scorelink,
+                                         MATCHES_WRAPPER)
+            self.__fetchedat = timer()
             if scorepage:
-                scorehtml = BeautifulSoup(scorepage)
+                scorehtml = self.timeParse("livescores", BeautifulSoup,
+                                           scorepage)
                 data = scorehtml.find("div", {"id": "matches-wrapper"})
                 if data.find(text=self.myteam):
                     self.matchfound = True
@@ -315,133 +847,227 @@ class FootballMatch(matchcommon):
 
         if not data:
             data = self.__findMatch()
+            self.__fetchedat = timer()
 
         if not data:
             self.__resetMatch()
 
         return data
 
-    def Update(self, data=None):
+    def __findSnapshot(self, snapshots):
+        '''Returns the snapshot of the match involving our team (or None).'''
+        for snapshot in snapshots or []:
+            if self.myteam in (snapshot.hometeam, snapshot.awayteam):
+                return snapshot
+        return None
+
+    def __loadProviderData(self, data=None):
+        '''Finds our team's match using the data provider.
+
+        data - optional list of MatchSnapshots (e.g. for a whole league)
+
+        Returns the MatchSnapshot for the match (or None).
+        '''
+        provider = self.externalProvider()
+        self.matchfound = False
+
+        snapshot = self.__findSnapshot(data)
+
+        if snapshot is None and self.leagueid:
+            snapshot = self.__findSnapshot(
+                                provider.getMatches(self.leagueid))
+
+        if snapshot is None:
+            for league in provider.getLeagues():
+                snapshot = self.__findSnapshot(
+                                provider.getMatches(league["id"]))
+                if snapshot is not None:
+                    break
+
+        if snapshot is None:
+            self.__resetMatch()
+        else:
+            self.matchfound = True
+            self.leagueid = snapshot.leagueid or self.leagueid
+            self.competition = snapshot.competition or self.competition
+
+        return snapshot
+
+    def Update(self, data=None, details=True):
+        '''Refreshes the match.
+
+        details - if False, match details are not fetched even if they are
+        needed. DetailsDue is set instead so that the caller can fetch them
+        (see loadDetails).
+        '''
+
+        summary = (self.matchid, self.homescore, self.awayscore, self.status)
+
+        start = timer()
+        self.__fetchedat = None
 
         data = self.__loadData(data)
+        loaded = timer()
 
         if data:
             self.__getScores(data, update=True)
+        parsed = timer()
 
-        if self.detailed:
-            self.__getDetails()
+        if self.detailed and self.__needDetails(summary):
+            if details:
+                self.__getDetails()
+            else:
+                self.__detailsdue = True
+
+        fetched = self.__fetchedat or loaded
+        self.__timings = {"fetch": fetched - start,
+                          "parse": parsed - fetched,
+                          "details": timer() - parsed}
+
+    def __needDetails(self, summary):
+        '''Boolean. Returns True if match details should be fetched.
+
+        summary - tuple of (matchid, homescore, awayscore, status) before
+                  the update
+        '''
+        if self.detailpolicy is None or not self.matchid:
+            return True
+
+        changed = summary != (self.matchid, self.homescore, self.awayscore,
+                              self.status)
+
+        return self.detailpolicy.shouldFetch(self, changed)
 
     def __getDetails(self):
 
         if self.matchid:
-            # Prepare bautiful soup to scrape match page
+            provider = self.externalProvider()
+            if provider is not None:
+                self.loadIncidents(provider.getDetails(self.matchid))
+            else:
+                page = self.getPage(self.DetailURL)
+                self.loadDetails(self.timeParse("detail", incidentRows, page)
+                                 if page else None)
 
-                # Let's get the home and away team detail sections
-            try:
-                bs = BeautifulSoup(self.getPage(self.detailprefix.format(
-                                             id=self.matchid)))
-                iclass = {"class": "incidents-table"}
-                incidents = bs.find("table", iclass).findAll("tr")
-            except:
-                incidents = None
+    def loadDetails(self, rows):
+        '''Updates the match incidents (scorers, bookings) from the incident
+        rows of the match detail page (as returned by incidentRows).
+
+        This allows the detail page to be fetched and parsed elsewhere (e.g.
+        in parallel for all matches in a League).
+        '''
+        self.__loadIncidentRows(rows, parseIncident)
+
+    def loadIncidents(self, incidents):
+        '''Updates the match incidents (scorers, bookings) from a list of
+        (side, type, player, time) incidents e.g. from a data provider.
+        '''
+        if incidents is not None:
+            rows = []
+            seen = set()
+            for incident in incidents:
+                incident = tuple(incident)
+                if incident not in seen:
+                    seen.add(incident)
+                    rows.append(incident)
+        else:
+            rows = None
+
+        self.__loadIncidentRows(rows, tuple)
+
+    def __loadIncidentRows(self, rows, parse):
+        '''Updates the match incidents from a list of unique rows.
+
+        parse - function to convert a row into a (side, type, player, time)
+        tuple (or None if the row isn't an incident)
+        '''
+        self.__detailsdue = False
+
+        if self.matchid:
+
+            # Incidents are only kept for one match
+            if self.__incidentsmatchid != self.matchid:
+                self.__resetIncidents()
+                self.__incidentsmatchid = self.matchid
+
+            self.booking = self.redcard = False
+
+            # Keep the incidents we already have if the page can't be read
+            if rows is None:
+                return
+
+            if self.homescorers is None:
+                self.homescorers = []
+                self.awayscorers = []
 
             # Get incidents
             # This populates variables with details of scorers and bookings
             # Incidents are stored in a list of tuples: format is:
             # [(Player Name, [times of incidents])]
-            hsc = []
-            asc = []
-            hyc = []
-            ayc = []
-            hrc = []
-            arc = []
-
-            if incidents:
-
-                self.__goalscorers = []
-                self.__yellowcards = []
-                self.__redcards = []
-
-                itclass = {"class": re.compile(r"\bincident-type \b")}
-                ithclass = {"class": "incident-player-home"}
-                itaclass = {"class": "incident-player-away"}
-                ittclass = {"class": "incident-time"}
-                for incident in incidents:
-                    i = incident.find("td", itclass)
-                    if i:
-                        h = incident.find("td", ithclass).text.strip()
-
-                        a = incident.find("td", itaclass).text.strip()
-
-                        t = incident.find("td", ittclass).text.strip()
-
-                        if "goal" in i.get("class"):
-                            if h:
-                                hsc = self.__addIncident(hsc, h, t)
-                                self.__goalscorers.append((self.hometeam,
-                                                           h, t))
-                                self.__addRawIncident("home", "goal", h, t)
-                            else:
-                                asc = self.__addIncident(asc, a, t)
-                                self.__goalscorers.append((self.awayteam,
-                                                           a, t))
-                                self.__addRawIncident("away", "goal", a, t)
-
-                        elif "yellow-card" in i.get("class"):
-                            if h:
-                                hyc = self.__addIncident(hyc, h, t)
-                                self.__yellowcards.append((self.hometeam,
-                                                           h, t))
-                                self.__addRawIncident("home", "yellow", h, t)
-                            else:
-                                ayc = self.__addIncident(ayc, a, t)
-                                self.__yellowcards.append((self.awayteam,
-                                                           a, t))
-                                self.__addRawIncident("away", "yellow", a, t)
-
-                        elif "red-card" in i.get("class"):
-                            if h:
-                                hrc = self.__addIncident(hrc, h, t)
-                                self.__redcards.append((self.hometeam, h, t))
-                                self.__addRawIncident("home", "red", h, t)
-                            else:
-                                arc = self.__addIncident(arc, a, t)
-                                self.__redcards.append((self.awayteam, a, t))
-                                self.__addRawIncident("away", "red", a, t)
-
-            self.booking = not (self.homeyellowcards == hyc and
-                                self.awayyellowcards == ayc)
-
-            self.redcard = not (self.homeredcards == hrc and
-                                self.awayredcards == arc)
-
-            self.homescorers = hsc
-            self.awayscorers = asc
-            self.homeyellowcards = hyc
-            self.awayyellowcards = ayc
-            self.homeredcards = hrc
-            self.awayredcards = arc
-
-    def __addIncident(self, incidentlist, player, incidenttime):
-        '''method to add incident to list variable'''
-        found = False
-        for incident in incidentlist:
-            if incident[0] == player:
-                incident[1].append(incidenttime)
-                found = True
-                break
-
-        if not found:
-            incidentlist.append((player, [incidenttime]))
+            # Rows which have been seen before are skipped so the work done
+            # here depends on the number of new incidents.
+            newrows = [r for r in rows if r not in self.__incidentrows]
+
+            # If an incident has been removed from the page (e.g. a goal
+            # has been disallowed) then we need to start again.
+            rebuilt = len(self.__incidentrows) + len(newrows) != len(rows)
+            if rebuilt:
+                oldcards = self.__cardIncidents()
+                self.__resetIncidents()
+                self.__incidentsmatchid = self.matchid
+                self.homescorers = []
+                self.awayscorers = []
+                newrows = rows
+
+            for row in newrows:
+                self.__incidentrows.add(row)
+                incident = parse(row)
+                if incident and self.__addIncident(*incident):
+                    if incident[1] == "yellow":
+                        self.booking = True
+                    elif incident[1] == "red":
+                        self.redcard = True
+
+            if rebuilt:
+                newcards = self.__cardIncidents()
+                self.booking = oldcards[0] != newcards[0]
+                self.redcard = oldcards[1] != newcards[1]
+
+    def __cardIncidents(self):
+        '''Returns tuple of sets of (yellow card, red card) incidents.'''
+        return (set(i for i in self.rawincidents if i[1] == "yellow"),
+                set(i for i in self.rawincidents if i[1] == "red"))
+
+    def __addIncident(self, side, incidenttype, player, incidenttime):
+        '''method to add incident to the incident lists.
+
+        Returns True if the incident is new.'''
+        incident = (side, incidenttype, player, incidenttime)
+
+        if incident in self.__rawincidentset:
+            return False
 
-        return incidentlist
+        self.__rawincidentset.add(incident)
+        self.rawincidents.append(incident)
 
-    def __addRawIncident(self, team, incidenttype, player, incidenttime):
+        # Add the time to the player's entry in the relevant list
+        # e.g. self.homescorers
+        players = self.__incidentindex.setdefault((side, incidenttype), {})
+        times = players.get(player)
+        if times is None:
+            times = []
+            players[player] = times
+            incidentlist = getattr(self, side + INCIDENT_LISTS[incidenttype])
+            incidentlist.append((player, times))
+        times.append(incidenttime)
 
-        incident = (team, incidenttype, player, incidenttime)
+        team = self.hometeam if side == "home" else self.awayteam
+        last = {"goal": self.__goalscorers,
+                "yellow": self.__yellowcards,
+                "red": self.__redcards}[incidenttype]
+        last.append((team, player, incidenttime))
 
-        if incident not in self.rawincidents:
-            self.rawincidents.append(incident)
+        return True
 
     def formatIncidents(self, incidentlist, newline=False):
         '''Incidents are in the following format:
@@ -460,6 +1086,63 @@ class FootballMatch(matchcommon):
 
         return incidentjoin.join(temp)
 
+    def snapshot(self):
+        """Returns a MatchSnapshot of the current state of the match."""
+        return MatchSnapshot(self.matchid,
+                             self.hometeam,
+                             self.awayteam,
+                             homescore=self.homescore,
+                             awayscore=self.awayscore,
+                             status=self.status,
+                             matchtime=self.matchtime,
+                             incidents=self.rawincidents,
+                             leagueid=self.leagueid,
+                             competition=self.competition)
+
+    def loadSnapshot(self, snapshot):
+        """Sets the state of the match from a MatchSnapshot.
+
+        Scorer and card lists are rebuilt from the snapshot's incidents.
+        No http requests are made.
+        """
+        self.__resetMatch()
+        self.matchid = snapshot.matchid
+        self.leagueid = snapshot.leagueid
+        self.competition = snapshot.competition
+        self.hometeam = snapshot.hometeam
+        self.awayteam = snapshot.awayteam
+        self.homescore = snapshot.homescore
+        self.awayscore = snapshot.awayscore
+        self.status = snapshot.status
+        self.matchtime = snapshot.matchtime
+        self.myteamgoal = None
+        self.matchfound = True
+
+        if snapshot.incidents:
+            self.__incidentsmatchid = snapshot.matchid
+            self.homescorers = []
+            self.awayscorers = []
+            for incident in snapshot.incidents:
+                self.__addIncident(*incident)
+
+    @classmethod
+    def fromSnapshot(cls, snapshot, team=None, detailed=False):
+        """Creates a FootballMatch from a MatchSnapshot without making any
+        http requests.
+
+        team - team to follow (defaults to the home team)
+        """
+        match = cls.__new__(cls)
+        match.detailed = detailed
+        match.detailpolicy = None
+        match.__detailsdue = False
+        match.__timings = {}
+        match.__fetchedat = None
+        match.detailedmatchpage = None
+        match.myteam = team if team else snapshot.hometeam
+        match.loadSnapshot(snapshot)
+        return match
+
     def getTeamBadges(self):
         found = False
 
@@ -495,6 +1178,32 @@ class FootballMatch(matchcommon):
 
     # Neater functions to return data:
 
+    @property
+    def DetailURL(self):
+        """Returns url of the match detail page (or None)
+
+        """
+        if self.matchid:
+            return self.detailprefix.format(id=self.matchid)
+        return None
+
+    @property
+    def DetailsDue(self):
+        """Boolean. Returns True if the last update needed match details but
+        they weren't fetched (i.e. Update was called with details=False)
+
+        """
+        return self.__detailsdue
+
+    @property
+    def Timings(self):
+        """Returns dict of the time (in seconds) taken by each stage of the
+        last update: "fetch" (requesting the live scores), "parse" (reading
+        the scores) and "details" (fetching and reading the match details)
+
+        """
+        return dict(self.__timings)
+
     @property
     def HomeTeam(self):
         """Returns string of the home team's name
@@ -827,10 +1536,9 @@ class FootballMatch(matchcommon):
             try:
                 koh = int(self.matchtime[:2])
                 kom = int(self.matchtime[3:5])
-                kickoff = datetime.combine(
-                            datetime.now().date(),
-                            time(koh, kom, 0))
-                timetokickoff = kickoff - self.__getUKTime()
+                now = self.__getUKTime()
+                kickoff = datetime.combine(now.date(), time(koh, kom, 0))
+                timetokickoff = kickoff - now
             except Exception, e:
                 timetokickoff = None
             finally:
@@ -867,21 +1575,50 @@ class League(matchcommon):
     accordionlink = ("http://polling.bbc.co.uk/sport/shared/football/"
                      "accordion/partial/collated")
 
-    def __init__(self, league, detailed=False):
+    def __init__(self, league, detailed=False, detailpolicy=None, workers=4,
+                 parsers=None):
+        '''Creates an instance of the League object.
+
+        detailed - Do we want additional data (e.g. goal scorers, bookings)?
+
+        detailpolicy - Optional service.detailpolicy.DetailPolicy to decide
+        when match details should be refreshed.
 
+        workers - number of match detail pages to fetch at the same time.
+        Set to 1 to fetch details one match at a time.
+
+        parsers - number of processes used to parse the detail pages. If None
+        the pages are parsed in this process.
+        '''
+        self.__detailpolicy = detailpolicy
+        self.__workers = max(1, workers)
+        self.__parsers = parsers
+        self.__parserpool = None
+        self.__updatetime = None
         self.__leaguematches = self.__getMatches(league, detailed=detailed)
         self.__leagueid = league
         self.__leaguename = self.__getLeagueName(league)
         self.__detailed = detailed
 
+        if detailed:
+            policy = self.__detailpolicy
+            self.__fetchDetails([m for m in self.__leaguematches
+                                 if policy is None or
+                                 policy.shouldFetch(m, True)])
+
     def __getData(self, league):
 
+        provider = self.externalProvider()
+        if provider is not None:
+            return provider.getMatches(league)
+
         scorelink = self.livescoreslink.format(comp=league)
         data = None
         # Prepare to process page
-        optionpage = self.getPage(scorelink)
+        optionpage = self.getFragment(scorelink, MATCHES_WRAPPER)
         if optionpage:
-            optionhtml = BeautifulSoup(optionpage)
+            optionhtml = self.timeParse("livescores", BeautifulSoup,
+                                        optionpage)
 
             # We just want the live games...
             data = optionhtml.find("div", {"id": "matches-wrapper"})
@@ -891,6 +1628,13 @@ class League(matchcommon):
     def __getLeagueName(self, league):
 
         leaguename = None
+
+        provider = self.externalProvider()
+        if provider is not None:
+            for l in provider.getLeagues():
+                if l["id"] == league:
+                    leaguename = l["name"]
+            return leaguename
         rawpage = self.getPage(self.livescoreslink.format(comp=league))
 
         if rawpage:
@@ -923,6 +1667,10 @@ class League(matchcommon):
         #     leagues.append(league)
 
         # return leagues
+        provider = matchcommon().externalProvider()
+        if provider is not None:
+            return provider.getLeagues()
+
         livescoreslink = matchcommon().livescoreslink
 
         # Start with the default page so we can get list of active leagues
@@ -954,16 +1702,26 @@ class League(matchcommon):
             data = self.__getData(league)
 
         matches = []
-        if data:
-            rawmatches = data.findAll("tr", {"id": re.compile(r'^match-row')})
-        else:
+        if not data:
             rawmatches = None
+        elif self.externalProvider() is not None:
+            # Provider data is a list of MatchSnapshots
+            rawmatches = data
+        else:
+            rawmatches = data.findAll("tr", {"id": re.compile(r'^match-row')})
 
         if rawmatches:
 
             for match in rawmatches:
-                team = match.find("span", {"class": "team-home"}).text
-                m = FootballMatch(team, detailed=detailed, data=data)
+                if isinstance(match, MatchSnapshot):
+                    team = match.hometeam
+                else:
+                    team = match.find("span", {"class": "team-home"}).text
+                # Details are fetched for all matches at once so aren't
+                # requested when the match is created.
+                m = FootballMatch(team, detailed=False, data=data,
+                                  detailpolicy=self.__detailpolicy)
+                m.detailed = detailed
                 matches.append(m)
 
         return matches
@@ -985,6 +1743,51 @@ class League(matchcommon):
     def __nonzero__(self):
         return bool(self.__leaguematches)
 
+    def __fetchDetails(self, matches):
+        '''Fetches and parses the detail pages for the given matches.
+
+        Pages are fetched concurrently (up to "workers" at a time) and, if
+        "parsers" is set, parsed in a pool of processes.
+        '''
+        matches = [m for m in matches if m.DetailURL]
+        if not matches:
+            return
+
+        # Providers supply the incidents directly so there's nothing to parse
+        provider = self.externalProvider()
+        if provider is not None:
+            for match in matches:
+                match.loadIncidents(provider.getDetails(match.matchid))
+            return
+
+        urls = [m.DetailURL for m in matches]
+
+        if self.__workers > 1 and len(urls) > 1:
+            pool = ThreadPool(min(self.__workers, len(urls)))
+            try:
+                pages = pool.map(self.getPage, urls)
+            finally:
+                pool.close()
+        else:
+            pages = [self.getPage(url) for url in urls]
+
+        if self.__parsers:
+            if self.__parserpool is None:
+                self.__parserpool = Pool(self.__parsers)
+            rows = self.__parserpool.map(incidentRows, pages)
+        else:
+            rows = [self.timeParse("detail", incidentRows, page)
+                    if page else None for page in pages]
+
+        for match, matchrows in zip(matches, rows):
+            match.loadDetails(matchrows)
+
+    def close(self):
+        '''Stops the parser processes (if any).'''
+        if self.__parserpool is not None:
+            self.__parserpool.close()
+            self.__parserpool = None
+
     def Update(self):
         '''Updates all matches in the league.
 
@@ -994,6 +1797,8 @@ class League(matchcommon):
         If there are new games, these are added.
         '''
 
+        start = timer()
+
         # Get the data for league
         data = self.__getData(self.__leagueid)
 
@@ -1034,7 +1839,11 @@ class League(matchcommon):
                     # NB we need to update each match to ensure the "Goal"
                     # flag is updated appropriately, rather than just adding a
                     # new match object.
-                    match.Update(data=data)
+                    # Details are fetched afterwards for all matches at once.
+                    match.Update(data=data, details=False)
+
+                self.__fetchDetails([m for m in self.__leaguematches
+                                     if m.DetailsDue])
 
         else:
             # If there's no data, there are no matches...
@@ -1045,6 +1854,8 @@ class League(matchcommon):
         if self.__leaguematches and self.LeagueName is None:
             self.LeagueName = self.__getLeagueName(self.__leagueid)
 
+        self.__updatetime = timer() - start
+
     @property
     def LeagueMatches(self):
         return self.__leaguematches
@@ -1057,6 +1868,13 @@ class League(matchcommon):
     def LeagueID(self):
         return self.__leagueid
 
+    @property
+    def UpdateTime(self):
+        """Returns the time in seconds taken by the last Update (or None)
+
+        """
+        return self.__updatetime
+
     @property
     def Goal(self):
         return any((m.Goal for m in self.__leaguematches))
@@ -1078,6 +1896,166 @@ class League(matchcommon):
         return any((m.HasStarted for m in self.__leaguematches))
 
 
+# Selectors for the league tables page
+LEAGUE_TABLE = {"class": "league-table full-table-wide"}
+TABLE_HEADER = {"class": "table-header"}
+TABLE_TEAM_ROW = {"id": re.compile(r'team')}
+TABLE_MOVEMENT = re.compile(r"no-movement|moving-up|moving-down")
+TABLE_MOVEMENT_TEXT = {"No movement": "same",
+                       "Moving up": "up",
+                       "Moving down": "down"}
+
+# Class of each numeric cell in a league table row and the name of the
+# LeagueTableTeam attribute it holds
+TABLE_CELLS = {"played": "played",
+               "won": "won",
+               "drawn": "drawn",
+               "lost": "lost",
+               "for": "goalsfor",
+               "against": "goalsagainst",
+               "goal-difference": "goaldifference",
+               "points": "points"}
+
+
+def parseTableRow(team):
+    '''Returns dict of LeagueTableTeam attributes from a team's row ("tr"
+    tag) in a league table.
+
+    The cells of the row are read in a single pass.'''
+    row = {}
+
+    for cell in team.findAll(["td", "span"]):
+        cls = cell.get("class")
+        if not cls:
+            continue
+
+        field = TABLE_CELLS.get(cls)
+        if field is not None:
+            row[field] = int(cell.text)
+        elif cls == "team-name":
+            row["name"] = cell.text
+        elif cls == "position-number":
+            row["position"] = int(cell.text)
+        elif cls == "last-10-games":
+            row["lasttengames"] = [{"result": game.get("class"),
+                                    "score": game.get("data-result"),
+                                    "opponent": game.get("data-against"),
+                                    "date": game.get("data-date"),
+                                    "summary": game.get("title")}
+                                   for game in cell.findAll("li")]
+        elif cell.name == "span" and TABLE_MOVEMENT.search(cls):
+            row["movement"] = TABLE_MOVEMENT_TEXT.get(cell.text)
+
+    return row
+
+
+class LeagueTableTeam(object):
+    '''Team in a league table.'''
+
+    __slots__ = ("name", "movement", "position", "played", "won", "drawn",
+                 "lost", "goalsfor", "goalsagainst", "goaldifference",
+                 "points", "lasttengames")
+
+    def __init__(self, name=None, movement=None, position=None, played=None,
+                 won=None, drawn=None, lost=None, goalsfor=None,
+                 goalsagainst=None, goaldifference=None, points=None,
+                 lasttengames=None):
+        self.name = name
+        self.movement = movement
+        self.position = position
+        self.played = played
+        self.won = won
+        self.drawn = drawn
+        self.lost = lost
+        self.goalsfor = goalsfor
+        self.goalsagainst = goalsagainst
+        self.goaldifference = goaldifference
+        self.points = points
+        self.lasttengames = lasttengames if lasttengames is not None else []
+
+    def __repr__(self):
+        return "<LeagueTableTeam object - %s>" % self.name
+
+    def __str__(self):
+        return "%d %s %d" % (self.position,
+                             self.name,
+                             self.points)
+
+
+class LeagueTableColumns(object):
+    '''League table with the team data held in columns.
+
+    Numeric columns (position, played, won, drawn, lost, goalsfor,
+    goalsagainst, goaldifference, points) are arrays so a table takes much
+    less memory than a list of team objects and a whole column can be read
+    at once e.g. table.column("points").
+
+    Behaves as a sequence of LeagueTableTeam objects, which are created
+    when accessed.'''
+
+    numeric = ("position", "played", "won", "drawn", "lost", "goalsfor",
+               "goalsagainst", "goaldifference", "points")
+
+    def __init__(self, rows=()):
+        '''rows - iterable of dicts of LeagueTableTeam attributes (as
+        returned by parseTableRow)'''
+        self.names = []
+        self.movements = []
+        self.lasttengames = []
+        self.columns = dict((f, array("i")) for f in self.numeric)
+        for row in rows:
+            self.append(row)
+
+    @classmethod
+    def fromTeams(cls, teams):
+        '''Creates the table from a list of team objects (e.g.
+        LeagueTableTeam) or dicts.'''
+        fields = LeagueTableTeam.__slots__
+        return cls(team if isinstance(team, dict) else
+                   dict((f, getattr(team, f, None)) for f in fields)
+                   for team in teams)
+
+    def append(self, row):
+        self.names.append(row.get("name"))
+        self.movements.append(row.get("movement"))
+        self.lasttengames.append(row.get("lasttengames") or [])
+        for field in self.numeric:
+            self.columns[field].append(row.get(field) or 0)
+
+    def column(self, field):
+        '''Returns the array (or list) of values for the field.'''
+        if field == "name":
+            return self.names
+        elif field == "movement":
+            return self.movements
+        elif field == "lasttengames":
+            return self.lasttengames
+        return self.columns[field]
+
+    def indexOf(self, name):
+        '''Returns the index of the team (or None).'''
+        try:
+            return self.names.index(name)
+        except ValueError:
+            return None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(len(self)))]
+        values = dict((f, self.columns[f][i]) for f in self.numeric)
+        return LeagueTableTeam(name=self.names[i],
+                               movement=self.movements[i],
+                               lasttengames=self.lasttengames[i],
+                               **values)
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+
 class LeagueTable(matchcommon):
     '''class to convert BBC league table format into python list/dict.'''
 
@@ -1091,6 +2069,10 @@ class LeagueTable(matchcommon):
     def getLeagues(self):
         '''method for getting list of available leagues'''
 
+        provider = self.externalProvider()
+        if provider is not None:
+            return provider.getTableLeagues()
+
         leaguelist = []
         raw = BeautifulSoup(self.getPage(self.leaguebase))
         form = raw.find("div", {"class": "drop-down-filter",
@@ -1105,72 +2087,35 @@ class LeagueTable(matchcommon):
                 leaguelist.append(l)
         return leaguelist
 
-    def getLeagueTable(self, leagueid):
-        '''method for creating league table of selected league.'''
+    def getLeagueTable(self, leagueid, compact=False):
+        '''method for creating league table of selected league.
 
-        result = []
+        compact - if True, each table is returned as a LeagueTableColumns
+        object (team data held in arrays) rather than a list of
+        LeagueTableTeam objects.'''
 
-        class LeagueTableTeam(object):
-
-            def __init__(self, team):
-
-                f = team.find
-                mov = re.compile(r"no-movement|moving-up|moving-down")
-                movmap = {"No movement": "same",
-                          "Moving up": "up",
-                          "Moving down": "down"}
-                self.name = f("td", {"class": "team-name"}).text
-                self.movement = movmap.get(f("span", {"class": mov}).text)
-                self.position = int(f("span",
-                                      {"class": "position-number"}).text)
-                self.played = int(f("td", {"class": "played"}).text)
-                self.won = int(f("td", {"class": "won"}).text)
-                self.drawn = int(f("td", {"class": "drawn"}).text)
-                self.lost = int(f("td", {"class": "lost"}).text)
-                self.goalsfor = int(f("td", {"class": "for"}).text)
-                self.goalsagainst = int(f("td", {"class": "against"}).text)
-                self.goaldifference = int(f("td",
-                                            {"class":
-                                             "goal-difference"}).text)
-                self.points = int(f("td", {"class": "points"}).text)
+        provider = self.externalProvider()
+        if provider is not None:
+            result = provider.getLeagueTable(leagueid)
+            if compact:
+                for lg in result:
+                    lg["table"] = LeagueTableColumns.fromTeams(lg["table"])
+            return result
 
-                try:
-                    lastgames = f("td", {"class": "last-10-games"})
-                    lg = []
-                    for game in lastgames.findAll("li"):
-                        g = {}
-                        g["result"] = game.get("class")
-                        g["score"] = game.get("data-result")
-                        g["opponent"] = game.get("data-against")
-                        g["date"] = game.get("data-date")
-                        g["summary"] = game.get("title")
-                        lg.append(g)
-                    self.lasttengames = lg
-
-                except:
-                    self.lasttengames = []
-
-                def __repr__(self):
-                    return "<LeagueTableTeam object - %s>" % self.name
-
-            def __str__(self):
-                return "%d %s %d" % (self.position,
-                                     self.name,
-                                     self.points)
+        result = []
 
         leaguepage = "%s?%s=%s" % (self.leaguebase,
                                    self.leaguemethod,
                                    leagueid)
 
-        raw = BeautifulSoup(self.getPage(leaguepage))
+        raw = self.timeParse("tables", BeautifulSoup,
+                             self.getPage(leaguepage))
 
-        for table in raw.findAll("div", {"class":
-                                         "league-table full-table-wide"}):
+        for table in raw.findAll("div", LEAGUE_TABLE):
 
             lg = {}
-            teamlist = []
 
-            leaguename = table.find("h2", {"class": "table-header"})
+            leaguename = table.find("h2", TABLE_HEADER)
 
             for tag in ["div", "script"]:
                 for nest in leaguename.findAll(tag):
@@ -1178,9 +2123,13 @@ class LeagueTable(matchcommon):
 
             lg["name"] = leaguename.text.strip()
 
-            for team in table.findAll("tr", {"id": re.compile(r'team')}):
-                t = LeagueTableTeam(team)
-                teamlist.append(t)
+            rows = (parseTableRow(team)
+                    for team in table.findAll("tr", TABLE_TEAM_ROW))
+
+            if compact:
+                teamlist = LeagueTableColumns(rows)
+            else:
+                teamlist = [LeagueTableTeam(**row) for row in rows]
 
             lg["table"] = teamlist
             result.append(lg)
@@ -1191,6 +2140,10 @@ class LeagueTable(matchcommon):
 class Teams(matchcommon):
 
     def getTeams(self):
+        provider = self.externalProvider()
+        if provider is not None:
+            return provider.getTeams()
+
         # Start with the default page so we can get list of active leagues
         rawpage = self.getPage(self.livescoreslink.format(comp=""))
         teamlist = []
@@ -1212,7 +2165,7 @@ class Teams(matchcommon):
                     scorelink = self.livescoreslink.format(comp=league)
 
                     # Prepare to process page
-                    scorepage = self.getPage(scorelink)
+                    scorepage = self.getFragment(scorelink, MATCHES_WRAPPER)
                     if scorepage:
                         optionhtml = BeautifulSoup(scorepage)
 
@@ -1236,6 +2189,46 @@ class Teams(matchcommon):
         return teamlist
 
 
+# Selectors for the results and fixtures pages
+MATCH_DAY_ROW = {"id": re.compile(r'^match-row')}
+MATCH_DAY_HOME = {"class": re.compile(r'^team-home')}
+MATCH_DAY_AWAY = {"class": re.compile(r'^team-away')}
+
+
+def parseMatchDay(html, key, scores):
+    '''Returns dict of the date and matches of a match day from its html
+    (the "table-header" heading and the table which follows it), or None if
+    the day has no table.
+
+    key    - key for the list of matches ("results" or "fixtures")
+    scores - if True, the score of each match is included'''
+    raw = BeautifulSoup(html)
+    header = raw.find("h2", TABLE_HEADER)
+    table = raw.find("table", {"class": "table-stats"})
+    if header is None or table is None:
+        return None
+
+    matches = []
+    for row in table.findAll("tr", MATCH_DAY_ROW):
+        match = {"hometeam": row.find("span", MATCH_DAY_HOME).text.strip(),
+                 "awayteam": row.find("span", MATCH_DAY_AWAY).text.strip()}
+        if scores:
+            match["score"] = row.find("span", {"class":
+                                               "score"}).text.strip()
+        matches.append(match)
+
+    return {"date": header.text.strip(),
+            key: matches}
+
+
+def parseResultDay(html):
+    return parseMatchDay(html, "results", True)
+
+
+def parseFixtureDay(html):
+    return parseMatchDay(html, "fixtures", False)
+
+
 class Results(matchcommon):
 
     '''class to convert BBC league table format into python list/dict.'''
@@ -1249,6 +2242,10 @@ class Results(matchcommon):
     def getCompetitions(self):
         '''method for getting list of available results pages'''
 
+        provider = self.externalProvider()
+        if provider is not None:
+            return provider.getResultCompetitions()
+
         complist = []
         raw = BeautifulSoup(self.getPage(self.resultbase))
         form = raw.find("div", {"class": "drop-down-filter",
@@ -1263,50 +2260,34 @@ class Results(matchcommon):
                 complist.append(l)
         return complist
 
-    def getResults(self, compid):
-        '''method for creating league table of selected league.'''
+    def iterResults(self, compid, parseday=parseResultDay):
+        '''Generator which yields the results of each match day of the
+        selected league as the page is read.
 
-        result = []
+        parseday - function called with the html of each match day. Days
+        for which it returns None are skipped (ignored when the data comes
+        from an external provider).
+
+        Raises PageError if the page can't be read completely.'''
+
+        provider = self.externalProvider()
+        if provider is not None:
+            for resultday in provider.getResults(compid):
+                yield resultday
+            return
 
         leaguepage = "%s?%s=%s" % (self.resultbase,
                                    self.resultmethod,
                                    compid)
 
-        raw = BeautifulSoup(self.getPage(leaguepage))
-
-        raw = raw.find("div", {"class": re.compile(r"\bfixtures-table\b")})
-
-        while raw.find("h2", {"class": "table-header"}) is not None:
-
-            resultdate = raw.find("h2", {"class": "table-header"})
-            matchdate = resultdate.text.strip()
-            resultdate.extract()
+        for resultday in self.iterMatchDays(leaguepage, "results",
+                                            parseday):
+            yield resultday
 
-            results = raw.find("table", {"class": "table-stats"})
-
-            matches = []
-
-            hclass = {"class": re.compile(r'^team-home')}
-            aclass = {"class": re.compile(r'^team-away')}
-            for matchresult in results.findAll("tr",
-                                               {"id":
-                                                re.compile(r'^match-row')}):
-                hometeam = matchresult.find("span", hclass).text.strip()
-                awayteam = matchresult.find("span", aclass).text.strip()
-                score = matchresult.find("span", {"class":
-                                                  "score"}).text.strip()
-                matches.append({"hometeam": hometeam,
-                                "awayteam": awayteam,
-                                "score": score})
-
-            resultday = {"date": matchdate,
-                         "results": matches}
-
-            result.append(resultday)
-
-            results.extract()
+    def getResults(self, compid):
+        '''method for creating list of results of selected league.'''
 
-        return result
+        return list(self.iterResults(compid))
 
 
 class Fixtures(matchcommon):
@@ -1322,6 +2303,10 @@ class Fixtures(matchcommon):
     def getCompetitions(self):
         '''method for getting list of available results pages'''
 
+        provider = self.externalProvider()
+        if provider is not None:
+            return provider.getFixtureCompetitions()
+
         complist = []
         raw = BeautifulSoup(self.getPage(self.fixturebase))
         form = raw.find("div", {"class": "drop-down-filter",
@@ -1336,48 +2321,34 @@ class Fixtures(matchcommon):
                 complist.append(l)
         return complist
 
-    def getFixtures(self, compid):
-        '''method for creating league table of selected league.'''
+    def iterFixtures(self, compid, parseday=parseFixtureDay):
+        '''Generator which yields the fixtures of each match day of the
+        selected league as the page is read.
 
-        result = []
+        parseday - function called with the html of each match day. Days
+        for which it returns None are skipped (ignored when the data comes
+        from an external provider).
+
+        Raises PageError if the page can't be read completely.'''
+
+        provider = self.externalProvider()
+        if provider is not None:
+            for fixtureday in provider.getFixtures(compid):
+                yield fixtureday
+            return
 
         leaguepage = "%s?%s=%s" % (self.fixturebase,
                                    self.fixturemethod,
                                    compid)
 
-        raw = BeautifulSoup(self.getPage(leaguepage))
-
-        raw = raw.find("div", {"class": re.compile(r"\bfixtures-table\b")})
-
-        while raw.find("h2", {"class": "table-header"}) is not None:
-
-            fixturedate = raw.find("h2", {"class": "table-header"})
-            matchdate = fixturedate.text.strip()
-            fixturedate.extract()
-
-            results = raw.find("table", {"class": "table-stats"})
+        for fixtureday in self.iterMatchDays(leaguepage, "fixtures",
+                                             parseday):
+            yield fixtureday
 
-            matches = []
-
-            hclass = {"class": re.compile(r'^team-home')}
-            aclass = {"class": re.compile(r'^team-away')}
-
-            for matchresult in results.findAll("tr",
-                                               {"id":
-                                                re.compile(r'^match-row')}):
-                hometeam = matchresult.find("span", hclass).text.strip()
-                awayteam = matchresult.find("span", aclass).text.strip()
-                matches.append({"hometeam": hometeam,
-                                "awayteam": awayteam})
-
-            resultday = {"date": matchdate,
-                         "fixtures": matches}
-
-            result.append(resultday)
-
-            results.extract()
+    def getFixtures(self, compid):
+        '''method for creating list of fixtures of selected league.'''
 
-        return result
+        return list(self.iterFixtures(compid))
 
 
 def getAllLeagues():
@@ -0,0 +1,226 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides ProjectedTable, an "as it stands" league table which
+combines a league table (fetched once) with the current scores of the
+league's matches.
+
+The table must be fetched before the first kick off of the day's matches so
+that none of the day's results are already included in it. If it could have
+been fetched later (e.g. the service was restarted mid-matchday), pass
+finishedincluded=True and matches which have already finished when they are
+first seen are left out, as their results are assumed to be in the table.
+
+Points are taken from the fetched table (so deductions are kept) and only
+adjusted by the day's results. Teams which are level on points, goal
+difference and goals scored keep their order from the fetched table.
+
+The table is updated incrementally. When a score changes only the two teams
+in that match are adjusted and moved to their new positions in an ordered
+list, so the table never has to be rebuilt or fully re-sorted.
+
+  from service.footballscores import League, LeagueTable
+  from service.livetable import ProjectedTable
+
+  table = LeagueTable().getLeagueTable("118996114")[0]["table"]
+  projected = ProjectedTable(table)
+
+  league = League("premier-league")
+  projected.updateLeague(league)
+
+  # later, after league.Update(), or for each goal event on an EventBus
+  projected.updateLeague(league)
+  bus.subscribe(projected.handleEvent, types=[CONST.EVENT_GOAL,
+                                              CONST.EVENT_SCORE_CORRECTION])
+"""
+from bisect import bisect_left, insort
+import threading
+
+# Index of each value in a team's record
+PLAYED, WON, DRAWN, LOST, FOR, AGAINST, POINTS = range(7)
+
+# Statuses of matches which count towards the projected table
+COUNTED = ("L", "HT", "FT")
+
+
+class ProjectedTeam(object):
+    """Team in the projected table. Has the same attributes as the teams
+    returned by LeagueTable.getLeagueTable.
+    """
+
+    __slots__ = ("name", "movement", "position", "played", "won", "drawn",
+                 "lost", "goalsfor", "goalsagainst", "goaldifference",
+                 "points", "lasttengames")
+
+    def __init__(self, name, record, position, startposition):
+        self.name = name
+        self.position = position
+        self.played = record[PLAYED]
+        self.won = record[WON]
+        self.drawn = record[DRAWN]
+        self.lost = record[LOST]
+        self.goalsfor = record[FOR]
+        self.goalsagainst = record[AGAINST]
+        self.goaldifference = record[FOR] - record[AGAINST]
+        self.points = record[POINTS]
+        self.lasttengames = []
+        if startposition is None or position == startposition:
+            self.movement = "same"
+        else:
+            self.movement = "up" if position < startposition else "down"
+
+    def __repr__(self):
+        return "<ProjectedTeam object - %s>" % self.name
+
+    def __str__(self):
+        return "%d %s %d" % (self.position, self.name, self.points)
+
+
+class ProjectedTable(object):
+    """Class object maintaining a projected league table."""
+
+    def __init__(self, table, finishedincluded=False):
+        """Method to create an instance of the table.
+
+        table:            list of teams (as returned by
+                          LeagueTable.getLeagueTable) giving the table before
+                          today's matches
+        finishedincluded: True if the table may already include some of
+                          today's results. Matches which have finished when
+                          they are first seen are then not counted.
+        """
+        self.__lock = threading.Lock()
+        self.__records = {}
+        self.__start = {}
+        self.__results = {}
+        self.__order = []
+        self.__finishedincluded = finishedincluded
+        self.__seen = set()
+        self.__ignored = set()
+
+        for i, team in enumerate(table):
+            points = team.points
+            if points is None:
+                points = 3 * team.won + team.drawn
+            record = [team.played, team.won, team.drawn, team.lost,
+                      team.goalsfor, team.goalsagainst, points]
+            self.__records[team.name] = record
+            self.__start[team.name] = (team.position if team.position
+                                       is not None else i + 1)
+            self.__order.append(self.__key(team.name, record))
+
+        self.__order.sort()
+
+    def __key(self, name, record):
+        """Returns the sort key of the team (points, goal difference, goals
+        scored, then position in the fetched table).
+        """
+        return (-record[POINTS], record[AGAINST] - record[FOR], -record[FOR],
+                self.__start[name], name)
+
+    def __apply(self, name, scored, conceded, sign):
+        """Adds (sign=1) or removes (sign=-1) a result for the team."""
+        record = self.__records[name]
+        record[PLAYED] += sign
+        record[FOR] += sign * scored
+        record[AGAINST] += sign * conceded
+        if scored > conceded:
+            record[WON] += sign
+            record[POINTS] += 3 * sign
+        elif scored == conceded:
+            record[DRAWN] += sign
+            record[POINTS] += sign
+        else:
+            record[LOST] += sign
+
+    def __move(self, name, oldkey):
+        """Moves the team from its old position to its new one."""
+        order = self.__order
+        i = bisect_left(order, oldkey)
+        del order[i]
+        insort(order, self.__key(name, self.__records[name]))
+
+    def update(self, matchid, hometeam, awayteam, homescore, awayscore,
+               counted=True):
+        """Updates the table with the current score of a match. Only the two
+        teams in the match are changed.
+
+        counted: False if the match shouldn't count (e.g. it hasn't started)
+
+        Returns True if the table changed.
+        """
+        if hometeam not in self.__records or awayteam not in self.__records:
+            return False
+
+        result = (homescore, awayscore) if counted else None
+
+        with self.__lock:
+            old = self.__results.get(matchid)
+            if old == result:
+                return False
+
+            oldkeys = [(team, self.__key(team, self.__records[team]))
+                       for team in (hometeam, awayteam)]
+
+            if old is not None:
+                self.__apply(hometeam, old[0], old[1], -1)
+                self.__apply(awayteam, old[1], old[0], -1)
+
+            if result is not None:
+                self.__apply(hometeam, homescore, awayscore, 1)
+                self.__apply(awayteam, awayscore, homescore, 1)
+                self.__results[matchid] = result
+            else:
+                self.__results.pop(matchid, None)
+
+            for team, oldkey in oldkeys:
+                self.__move(team, oldkey)
+
+        return True
+
+    def updateMatch(self, match):
+        """Updates the table from a FootballMatch (or MatchSnapshot)."""
+        with self.__lock:
+            if match.matchid in self.__ignored:
+                return False
+            if match.matchid not in self.__seen:
+                self.__seen.add(match.matchid)
+                if self.__finishedincluded and match.status == "FT":
+                    # Result assumed to be in the fetched table already
+                    self.__ignored.add(match.matchid)
+                    return False
+
+        return self.update(match.matchid, match.hometeam, match.awayteam,
+                           match.homescore or 0, match.awayscore or 0,
+                           counted=match.status in COUNTED)
+
+    def updateLeague(self, league):
+        """Updates the table from all the matches in a League. Returns True
+        if the table changed.
+        """
+        changed = False
+        for match in league.LeagueMatches:
+            changed = self.updateMatch(match) or changed
+        return changed
+
+    def handleEvent(self, event):
+        """Event bus callback. Updates the table from the event's match."""
+        if event.match is not None:
+            self.updateMatch(event.match)
+
+    def positionOf(self, name):
+        """Returns the current position of the team (or None)."""
+        with self.__lock:
+            record = self.__records.get(name)
+            if record is None:
+                return None
+            return bisect_left(self.__order, self.__key(name, record)) + 1
+
+    @property
+    def Table(self):
+        """Returns list of ProjectedTeam objects in table order."""
+        with self.__lock:
+            return [ProjectedTeam(key[-1], self.__records[key[-1]], i + 1,
+                                  self.__start[key[-1]])
+                    for i, key in enumerate(self.__order)]
@@ -0,0 +1,187 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides MatchStateTable, a columnar store of the state of many
+matches (e.g. every live match in every competition). Each poll's state is
+compared with the previous state in a single vectorised pass, producing
+arrays of goal and status change events.
+
+Requires numpy.
+"""
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Integer codes used for match status in the table.
+STATUS_CODES = {"Fixture": 0, "L": 1, "HT": 2, "FT": 3}
+STATUS_NAMES = {v: k for k, v in STATUS_CODES.items()}
+STATUS_UNKNOWN = -1
+
+_minute = re.compile(r"(\d+)(?:\s*\+\s*(\d+))?")
+
+
+def parseMinute(matchtime):
+    """Returns the minute of the match as an int (e.g. "45+2'" is 47).
+
+    Returns -1 if the match time isn't a number of minutes.
+    """
+    if matchtime:
+        m = _minute.match(matchtime)
+        if m:
+            return int(m.group(1)) + int(m.group(2) or 0)
+    return -1
+
+
+class MatchChanges(object):
+    """Class object holding the changes found by MatchStateTable.update.
+
+    All attributes are numpy arrays:
+
+    newmatches: ids of matches which weren't in the previous state
+    removed:    ids of matches which are no longer present
+    goalids:    ids of matches where the score changed
+    homegoals:  change in home score for each of goalids (negative values
+                indicate a goal was disallowed/corrected)
+    awaygoals:  change in away score for each of goalids
+    statusids:  ids of matches where the status changed
+    oldstatus:  previous status code for each of statusids
+    newstatus:  new status code for each of statusids
+    """
+
+    __slots__ = ("newmatches", "removed", "goalids", "homegoals",
+                 "awaygoals", "statusids", "oldstatus", "newstatus")
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs[name])
+
+    def __len__(self):
+        """Returns the total number of changes."""
+        return (len(self.newmatches) + len(self.removed) +
+                len(self.goalids) + len(self.statusids))
+
+    def __nonzero__(self):
+        return len(self) > 0
+
+    def __repr__(self):
+        return ("<MatchChanges: %d new, %d removed, %d score, "
+                "%d status>" % (len(self.newmatches),
+                                len(self.removed),
+                                len(self.goalids),
+                                len(self.statusids)))
+
+
+class MatchStateTable(object):
+    """Class object holding the current state of many matches as columns.
+
+    Rows are kept sorted by match id so that the rows of a new poll can be
+    matched with the previous rows using a vectorised binary search.
+
+    e.g. table = MatchStateTable()
+         changes = table.update(snapshots)
+         for matchid, h, a in zip(changes.goalids, changes.homegoals,
+                                  changes.awaygoals):
+             ...
+    """
+
+    def __init__(self):
+        if np is None:
+            raise ImportError("MatchStateTable requires numpy.")
+
+        self.matchids = np.array([], dtype=object)
+        self.homescore = np.array([], dtype=np.int16)
+        self.awayscore = np.array([], dtype=np.int16)
+        self.status = np.array([], dtype=np.int8)
+        self.minute = np.array([], dtype=np.int16)
+
+    def update(self, snapshots):
+        """Replaces the state with the given MatchSnapshots and returns a
+        MatchChanges object describing the differences.
+        """
+        snapshots = list(snapshots)
+        return self.updateArrays(
+                    [s.matchid for s in snapshots],
+                    [s.homescore or 0 for s in snapshots],
+                    [s.awayscore or 0 for s in snapshots],
+                    [STATUS_CODES.get(s.status, STATUS_UNKNOWN)
+                     for s in snapshots],
+                    [parseMinute(s.matchtime) for s in snapshots])
+
+    def updateArrays(self, matchids, homescore, awayscore, status, minute):
+        """Replaces the state with the given columns and returns a
+        MatchChanges object describing the differences.
+
+        All parameters are sequences of equal length. status should contain
+        codes from STATUS_CODES.
+        """
+        ids = np.asarray(matchids, dtype=object)
+        order = np.argsort(ids, kind="mergesort")
+        ids = ids[order]
+        home = np.asarray(homescore, dtype=np.int16)[order]
+        away = np.asarray(awayscore, dtype=np.int16)[order]
+        stat = np.asarray(status, dtype=np.int8)[order]
+        mins = np.asarray(minute, dtype=np.int16)[order]
+
+        oldids = self.matchids
+
+        # Find the row of each new match in the old state
+        if len(oldids):
+            pos = np.searchsorted(oldids, ids)
+            pos = np.minimum(pos, len(oldids) - 1)
+            found = oldids[pos] == ids
+        else:
+            pos = np.zeros(len(ids), dtype=np.intp)
+            found = np.zeros(len(ids), dtype=bool)
+
+        # And which old matches are still present
+        if len(ids):
+            rpos = np.minimum(np.searchsorted(ids, oldids), len(ids) - 1)
+            kept = ids[rpos] == oldids
+        else:
+            kept = np.zeros(len(oldids), dtype=bool)
+
+        fpos = pos[found]
+        dhome = home[found] - self.homescore[fpos]
+        daway = away[found] - self.awayscore[fpos]
+        scored = (dhome != 0) | (daway != 0)
+
+        oldstat = self.status[fpos]
+        newstat = stat[found]
+        changed = oldstat != newstat
+
+        foundids = ids[found]
+
+        changes = MatchChanges(newmatches=ids[~found],
+                               removed=oldids[~kept],
+                               goalids=foundids[scored],
+                               homegoals=dhome[scored],
+                               awaygoals=daway[scored],
+                               statusids=foundids[changed],
+                               oldstatus=oldstat[changed],
+                               newstatus=newstat[changed])
+
+        self.matchids = ids
+        self.homescore = home
+        self.awayscore = away
+        self.status = stat
+        self.minute = mins
+
+        return changes
+
+    def __len__(self):
+        return len(self.matchids)
+
+    def row(self, matchid):
+        """Returns dict of the current state of the match (or None)."""
+        i = np.searchsorted(self.matchids, matchid)
+        if i < len(self.matchids) and self.matchids[i] == matchid:
+            return {"matchid": matchid,
+                    "homescore": int(self.homescore[i]),
+                    "awayscore": int(self.awayscore[i]),
+                    "status": STATUS_NAMES.get(int(self.status[i])),
+                    "minute": int(self.minute[i])}
+        return None
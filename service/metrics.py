@@ -0,0 +1,278 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides optional metrics for the service. Metrics are only
+collected once a Metrics object has been set on matchcommon (the service does
+this if one is passed to it):
+
+  from service.footballscores import matchcommon
+  from service.metrics import Metrics
+
+  matchcommon.metrics = Metrics()
+
+The metrics can be read by Prometheus (or a browser) from a small HTTP
+server:
+
+  server = MetricsServer(("", 9100), matchcommon.metrics)
+  server.start()
+
+and/or written to a log at regular intervals with MetricsDumper.
+
+The following metrics are collected (all names have the prefix
+"footballscores_"):
+
+  fetch_total          requests by url family and status
+  fetch_seconds        request time by url family
+  fetch_bytes_total    bytes read by url family
+  cache_total          caching proxy results (X-Cache header) by url family
+  parse_seconds        html parse time by page
+  findmatch_leagues    number of leagues scanned to find the team's match
+  events_total         match events detected by type
+  notify_seconds       time taken to send a notification by notifier
+  sleep_seconds        time the service sleeps between updates
+  goal_stage_seconds   time taken by each stage of a goal's path to the
+                       notifier (see service.tracing)
+"""
+import threading
+from urlparse import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from service.cacheproxy import pageFamily
+
+DESCRIPTIONS = {
+    "fetch_total": "Page requests by url family and status.",
+    "fetch_seconds": "Page request time in seconds.",
+    "fetch_bytes_total": "Bytes read by url family.",
+    "cache_total": "Caching proxy results by url family.",
+    "parse_seconds": "Page parse time in seconds.",
+    "findmatch_leagues": "Leagues scanned to find the team's match.",
+    "events_total": "Match events detected by type.",
+    "notify_seconds": "Time taken to send a notification in seconds.",
+    "sleep_seconds": "Time slept between updates in seconds.",
+    "goal_stage_seconds": "Time taken by each stage of a goal's path to "
+                          "the notifier in seconds."}
+
+
+def _labelKey(labels):
+    """Returns hashable (sorted) tuple of the labels."""
+    return tuple(sorted(labels.items()))
+
+
+def _formatLabels(key, extra=None):
+    items = list(key) + (extra or [])
+    if not items:
+        return ""
+    return "{{{}}}".format(",".join('{}="{}"'.format(
+        k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in items))
+
+
+class Metrics(object):
+    """Class object holding counters, gauges and summaries.
+
+    Each metric can have labels e.g.
+
+      metrics.inc("events_total", type="goal")
+      metrics.observe("fetch_seconds", 0.25, family="livescores")
+
+    Summaries record the count, sum and maximum of the observed values.
+    """
+
+    def __init__(self, prefix="footballscores"):
+        """Method to create an instance of the metrics.
+
+        prefix: prefix added to the name of every metric when rendered
+        """
+        self.prefix = prefix
+        self.__counters = {}
+        self.__gauges = {}
+        self.__summaries = {}
+        self.__lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """Adds value to the counter."""
+        key = (name, _labelKey(labels))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Sets the value of the gauge."""
+        with self.__lock:
+            self.__gauges[(name, _labelKey(labels))] = value
+
+    def observe(self, name, value, **labels):
+        """Adds an observation to the summary."""
+        key = (name, _labelKey(labels))
+        with self.__lock:
+            summary = self.__summaries.get(key)
+            if summary is None:
+                self.__summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                if value > summary[2]:
+                    summary[2] = value
+
+    def observeFetch(self, url, seconds, size, status, cache=None):
+        """Records a page request.
+
+        url:     url requested (before any proxy)
+        seconds: time taken
+        size:    number of bytes read
+        status:  http status code (or "timeout"/"error")
+        cache:   (optional) value of the X-Cache header from the proxy
+        """
+        family = pageFamily(urlparse(url).path) or "other"
+        self.inc("fetch_total", family=family, status=status)
+        self.observe("fetch_seconds", seconds, family=family)
+        if size:
+            self.inc("fetch_bytes_total", size, family=family)
+        if cache:
+            self.inc("cache_total", family=family, result=cache)
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        with self.__lock:
+            counters = sorted(self.__counters.items())
+            gauges = sorted(self.__gauges.items())
+            summaries = sorted((k, list(v))
+                               for k, v in self.__summaries.items())
+
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                full = "{}_{}".format(self.prefix, name)
+                if name in DESCRIPTIONS:
+                    lines.append("# HELP {} {}".format(full,
+                                                       DESCRIPTIONS[name]))
+                lines.append("# TYPE {} {}".format(full, kind))
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append("{}_{}{} {}".format(self.prefix, name,
+                                             _formatLabels(labels), value))
+
+        for (name, labels), value in gauges:
+            header(name, "gauge")
+            lines.append("{}_{}{} {}".format(self.prefix, name,
+                                             _formatLabels(labels), value))
+
+        for (name, labels), (count, total, peak) in summaries:
+            header(name, "summary")
+            full = "{}_{}".format(self.prefix, name)
+            lines.append("{}_count{} {}".format(full, _formatLabels(labels),
+                                                count))
+            lines.append("{}_sum{} {}".format(full, _formatLabels(labels),
+                                              total))
+
+        # The maximum isn't part of a Prometheus summary so is given as a
+        # separate gauge
+        for (name, labels), (count, total, peak) in summaries:
+            header(name + "_max", "gauge")
+            lines.append("{}_{}_max{} {}".format(self.prefix, name,
+                                                 _formatLabels(labels),
+                                                 peak))
+
+        return "\n".join(lines) + "\n"
+
+    @property
+    def Summary(self):
+        """Returns dict of the current values. Summaries are shown as
+        {"count": n, "mean": x, "max": y}.
+        """
+        def name(key):
+            metric, labels = key
+            return metric + _formatLabels(labels)
+
+        with self.__lock:
+            result = {name(k): v for k, v in self.__counters.items()}
+            result.update((name(k), v) for k, v in self.__gauges.items())
+            for k, (count, total, peak) in self.__summaries.items():
+                result[name(k)] = {"count": count,
+                                   "mean": total / float(count),
+                                   "max": peak}
+        return result
+
+    def reset(self):
+        with self.__lock:
+            self.__counters = {}
+            self.__gauges = {}
+            self.__summaries = {}
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Request handler for the metrics server."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.server.metrics.render()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(ThreadingMixIn, HTTPServer):
+    """HTTP server exposing the metrics at /metrics.
+
+    e.g. server = MetricsServer(("", 9100), metrics)
+         server.start()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, metrics):
+        """Method to create an instance of the server.
+
+        address: (host, port) tuple to listen on
+        metrics: Metrics object
+        """
+        HTTPServer.__init__(self, address, MetricsRequestHandler)
+        self.metrics = metrics
+
+    def start(self):
+        """Starts serving in a background thread."""
+        t = threading.Thread(target=self.serve_forever)
+        t.daemon = True
+        t.start()
+
+
+class MetricsDumper(threading.Thread):
+    """Thread which writes the metrics to a logger at regular intervals."""
+
+    def __init__(self, metrics, logger, interval=300):
+        """Method to create an instance of the dumper.
+
+        metrics:  Metrics object
+        logger:   logger object (metrics are logged at info level)
+        interval: number of seconds between dumps
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.metrics = metrics
+        self.logger = logger
+        self.interval = interval
+        self.__stop = threading.Event()
+
+    def run(self):
+        while not self.__stop.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        for name, value in sorted(self.metrics.Summary.items()):
+            self.logger.info("Metric {}: {}".format(name, value))
+
+    def stop(self):
+        self.__stop.set()
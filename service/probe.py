@@ -0,0 +1,105 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides ScoreProbe, a cheap check of whether a single match has
+changed.
+
+Rather than downloading and parsing the whole live scores page, the probe
+streams the page and searches the raw bytes for the row of the match. The
+download stops as soon as the end of the row has been read. The row's
+status, score and half time marker are returned as a signature which can be
+compared with the previous probe: the full (expensive) update is only needed
+when the signature changes.
+"""
+import re
+
+from service.footballscores import matchcommon
+
+# Patterns used to pick the interesting parts out of the raw match row
+ROW_END = "</tr>"
+ROW_CLASS = re.compile(r'<tr[^>]*\sclass="([^"]*)"')
+SCORE = re.compile(r'<span[^>]*class="score"[^>]*>(.*?)</span>', re.S)
+HALF_TIME = "Half Time"
+
+# Number of bytes before the match id kept to find the start of the row
+ROW_LOOKBACK = 512
+
+
+class ScoreProbe(matchcommon):
+    """Class object to probe the live scores page for a single match.
+
+    e.g. probe = ScoreProbe()
+         signature = probe.probe(match.scorelink, match.matchid)
+    """
+
+    def __init__(self, chunksize=4096, timeout=2):
+        """Method to create an instance of the probe.
+
+        chunksize: number of bytes read at a time
+        timeout:   timeout in seconds for the request
+        """
+        self.chunksize = chunksize
+        self.timeout = timeout
+        self.probes = 0
+        self.bytesread = 0
+
+    def findRow(self, chunks, matchid):
+        """Returns the raw bytes of the match row from an iterable of chunks
+        (or None if the row isn't found). Stops reading once the row has
+        been found.
+        """
+        marker = 'id="match-row-{}"'.format(matchid)
+        buf = ""
+        start = -1
+
+        for chunk in chunks:
+            self.bytesread += len(chunk)
+            buf += chunk
+
+            if start < 0:
+                start = buf.find(marker)
+                if start < 0:
+                    # Keep enough of the buffer to catch a marker split
+                    # across chunks (and the start of its row)
+                    buf = buf[-(len(marker) + ROW_LOOKBACK):]
+                    continue
+                # Include the opening tag of the row
+                start = buf.rfind("<tr", 0, start)
+                buf = buf[max(start, 0):]
+                start = 0
+
+            end = buf.find(ROW_END)
+            if end >= 0:
+                return buf[:end + len(ROW_END)]
+
+        return None
+
+    def probe(self, url, matchid):
+        """Returns a signature of (row class, score, half time) for the match
+        or None if the row couldn't be found.
+        """
+        self.probes += 1
+
+        chunks = self.streamPage(url, chunksize=self.chunksize, decode=False,
+                                 timeout=self.timeout)
+        try:
+            row = self.findRow(chunks, matchid)
+        finally:
+            chunks.close()
+
+        return self.signature(row) if row else None
+
+    @staticmethod
+    def signature(row):
+        """Returns (row class, score, half time) tuple for the raw row."""
+        rowclass = ROW_CLASS.search(row)
+        score = SCORE.search(row)
+        return (rowclass.group(1) if rowclass else None,
+                score.group(1).strip() if score else None,
+                HALF_TIME in row)
+
+    @property
+    def AverageBytes(self):
+        """Returns the average number of bytes read per probe."""
+        return self.bytesread / self.probes if self.probes else 0
@@ -0,0 +1,287 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides opt-in profiling of the service's polling loop.
+
+Profiling is off until it is requested, either at start up or while the
+service is running by sending a signal to the process:
+
+  kill -USR1 <pid>    profile the next N refresh cycles
+  kill -USR2 <pid>    take a memory snapshot at the end of the next cycle
+
+Two profilers are available:
+
+  "cprofile"  deterministic profile using cProfile. Saved as a .prof file
+              which can be read with pstats (or e.g. snakeviz).
+  "sampling"  a background thread records the stack of the service every
+              few milliseconds. Much lower overhead. Saved as "folded"
+              stacks (one line per stack with a count) for flame graphs.
+
+Memory snapshots use tracemalloc where it is available (it isn't part of
+Python 2 but a backport can be installed). Otherwise the number of live
+objects of each type is recorded. Each snapshot is compared with the
+previous one so that slow leaks show up as steadily growing entries.
+Snapshots can also be taken automatically every N cycles.
+
+Output files are written to a directory and only the most recent files of
+each kind are kept.
+"""
+import os
+import gc
+import sys
+import signal
+import thread
+import threading
+import cProfile
+from collections import Counter
+from datetime import datetime
+from time import sleep
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+MODES = ("cprofile", "sampling")
+
+
+class StackSampler(threading.Thread):
+    """Thread which samples the stack of another thread."""
+
+    def __init__(self, threadid, interval=0.005):
+        """Method to create an instance of the sampler.
+
+        threadid: id of the thread to be sampled
+        interval: seconds between samples
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.threadid = threadid
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.active = False
+        self.__stop = threading.Event()
+
+    def run(self):
+        while not self.__stop.is_set():
+            if self.active:
+                frame = sys._current_frames().get(self.threadid)
+                if frame is not None:
+                    self.stacks[self.stackKey(frame)] += 1
+                    self.samples += 1
+            sleep(self.interval)
+
+    @staticmethod
+    def stackKey(frame):
+        """Returns the stack as "file:function;file:function;..." (outermost
+        first).
+        """
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append("{}:{}".format(os.path.basename(code.co_filename),
+                                        code.co_name))
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def stop(self):
+        self.__stop.set()
+
+
+class CycleProfiler(object):
+    """Class object to profile a number of refresh cycles of the service.
+
+    e.g. profiler = CycleProfiler("/home/pi/profiles", mode="sampling")
+         profiler.installSignals()
+
+    The service calls "call" for each part of a cycle it wants profiled and
+    "endCycle" when the cycle is complete.
+    """
+
+    def __init__(self, directory, mode="cprofile", cycles=10, keep=5,
+                 interval=0.005, memoryevery=None, logger=None):
+        """Method to create an instance of the profiler.
+
+        directory:   directory for the output files (created if needed)
+        mode:        "cprofile" or "sampling"
+        cycles:      default number of cycles to profile when requested
+        keep:        number of files of each kind to keep
+        interval:    seconds between samples (sampling mode)
+        memoryevery: (optional) take a memory snapshot every N cycles
+        logger:      (optional) logger. Output files are logged at info level.
+        """
+        if mode not in MODES:
+            raise ValueError("mode must be one of {}".format(MODES))
+
+        self.directory = directory
+        self.mode = mode
+        self.cycles = cycles
+        self.keep = keep
+        self.interval = interval
+        self.memoryevery = memoryevery
+        self.logger = logger
+
+        self.__remaining = 0
+        self.__requested = 0
+        self.__snapshot = False
+        self.__cycle = 0
+        self.__profile = None
+        self.__sampler = None
+        self.__lastmemory = None
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def request(self, cycles=None):
+        """Requests profiling of the next "cycles" cycles. Safe to call from
+        a signal handler or another thread.
+        """
+        self.__requested = cycles or self.cycles
+
+    def requestSnapshot(self):
+        """Requests a memory snapshot at the end of the current cycle."""
+        self.__snapshot = True
+
+    def installSignals(self, profilesignal=signal.SIGUSR1,
+                       memorysignal=signal.SIGUSR2):
+        """Sets signal handlers to request profiling and snapshots. Must be
+        called from the main thread.
+        """
+        signal.signal(profilesignal, lambda signum, frame: self.request())
+        signal.signal(memorysignal,
+                      lambda signum, frame: self.requestSnapshot())
+
+    @property
+    def Active(self):
+        """Boolean. Returns True while cycles are being profiled."""
+        return self.__remaining > 0
+
+    def __start(self):
+        self.__remaining = self.__requested
+        self.__requested = 0
+        if self.mode == "cprofile":
+            self.__profile = cProfile.Profile()
+        else:
+            self.__sampler = StackSampler(thread.get_ident(), self.interval)
+            self.__sampler.start()
+        self.__log("Profiling {} cycles ({})".format(self.__remaining,
+                                                     self.mode))
+
+    def call(self, func, *args, **kwargs):
+        """Calls func, profiling it if profiling is active."""
+        if self.__requested and not self.__remaining:
+            self.__start()
+
+        if not self.__remaining:
+            return func(*args, **kwargs)
+
+        if self.__profile is not None:
+            return self.__profile.runcall(func, *args, **kwargs)
+
+        self.__sampler.active = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.__sampler.active = False
+
+    def endCycle(self):
+        """Marks the end of a cycle. Writes out the profile once the
+        requested number of cycles has been profiled, and any memory
+        snapshot which is due.
+        """
+        self.__cycle += 1
+
+        if self.__remaining:
+            self.__remaining -= 1
+            if not self.__remaining:
+                self.__finish()
+
+        if (self.memoryevery and
+                self.__cycle % self.memoryevery == 0):
+            self.__snapshot = True
+
+        if self.__snapshot:
+            self.__snapshot = False
+            self.__writeMemory()
+
+    def __finish(self):
+        if self.__profile is not None:
+            filename = self.__filename("profile", "prof")
+            self.__profile.dump_stats(filename)
+            self.__profile = None
+        else:
+            self.__sampler.stop()
+            filename = self.__filename("profile", "folded")
+            with open(filename, "w") as f:
+                for stack, count in self.__sampler.stacks.most_common():
+                    f.write("{} {}\n".format(stack, count))
+            self.__sampler = None
+
+        self.__rotate("profile")
+        self.__log("Profile written to {}".format(filename))
+
+    def __writeMemory(self):
+        if tracemalloc is not None:
+            lines = self.__tracemallocSnapshot()
+        else:
+            lines = self.__objectSnapshot()
+
+        filename = self.__filename("memory", "txt")
+        with open(filename, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+        self.__rotate("memory")
+        self.__log("Memory snapshot written to {}".format(filename))
+
+    def __tracemallocSnapshot(self, top=30):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+
+        snapshot = tracemalloc.take_snapshot()
+        previous, self.__lastmemory = self.__lastmemory, snapshot
+
+        if previous is None:
+            stats = snapshot.statistics("lineno")
+        else:
+            stats = snapshot.compare_to(previous, "lineno")
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines = ["Traced memory: {} bytes (peak {} bytes)".format(current,
+                                                                 peak)]
+        lines += [str(stat) for stat in stats[:top]]
+        return lines
+
+    def __objectSnapshot(self, top=30):
+        gc.collect()
+        counts = Counter(type(o).__name__ for o in gc.get_objects())
+        previous, self.__lastmemory = self.__lastmemory, counts
+
+        lines = ["Objects tracked by the garbage collector: {}".format(
+                 sum(counts.values()))]
+        for name, count in counts.most_common(top):
+            change = ""
+            if previous is not None:
+                change = " ({:+d})".format(count - previous.get(name, 0))
+            lines.append("{:<30} {:>10}{}".format(name, count, change))
+        return lines
+
+    def __filename(self, kind, extension):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return os.path.join(self.directory,
+                            "{}-{}.{}".format(kind, stamp, extension))
+
+    def __rotate(self, kind):
+        """Deletes all but the newest "keep" files of the kind."""
+        files = sorted(f for f in os.listdir(self.directory)
+                       if f.startswith(kind + "-"))
+        for f in files[:-self.keep]:
+            try:
+                os.remove(os.path.join(self.directory, f))
+            except OSError:
+                pass
+
+    def __log(self, message):
+        if self.logger is not None:
+            self.logger.info(message)
@@ -0,0 +1,272 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides data providers for service.footballscores.
+
+By default the match classes scrape the BBC html pages. A provider can be set
+on matchcommon to supply the same data from elsewhere:
+
+  from service.footballscores import matchcommon
+  from service.providers import JSONProvider
+
+  matchcommon.provider = JSONProvider("http://192.168.1.10:8000/feed")
+
+HTMLProvider wraps the built-in BBC scraper so that it can be used through
+the same interface (e.g. for comparison). JSONProvider reads a structured
+JSON feed from a web server or a local directory, which avoids html parsing
+altogether. The feed is laid out as follows (each file is JSON):
+
+  leagues.json              [{"id": ..., "name": ...}]  (leagues playing today)
+  matches/<leagueid>.json   [{"matchid", "hometeam", "awayteam", "homescore",
+                              "awayscore", "status", "matchtime",
+                              "competition", "incidents"}]
+  details/<matchid>.json    [[side, type, player, time], ...]
+  teams.json                ["Arsenal", "Chelsea", ...]
+  tableleagues.json         [{"id": ..., "name": ...}]
+  tables/<leagueid>.json    [{"name": ..., "table": [{"name", "movement",
+                              "position", "played", "won", "drawn", "lost",
+                              "goalsfor", "goalsagainst", "goaldifference",
+                              "points", "lasttengames"}]}]
+  resultcompetitions.json   [{"id": ..., "name": ...}]
+  results/<compid>.json     [{"date": ..., "results": [{"hometeam",
+                              "awayteam", "score"}]}]
+  fixturecompetitions.json  [{"id": ..., "name": ...}]
+  fixtures/<compid>.json    [{"date": ..., "fixtures": [{"hometeam",
+                              "awayteam"}]}]
+
+status is one of "Fixture", "L", "HT" or "FT" and incidents use the same
+(side, type, player, time) format as FootballMatch.rawincidents.
+"""
+import os
+import re
+import json
+import codecs
+
+from BeautifulSoup import BeautifulSoup
+
+from service.footballscores import (matchcommon, FootballMatch, League,
+                                    LeagueTable, LeagueTableTeam, Teams,
+                                    Results, Fixtures, MATCHES_WRAPPER,
+                                    parseMatchRow, parseIncident,
+                                    incidentRows)
+from service.snapshot import MatchSnapshot
+
+
+class DataProvider(matchcommon):
+    """Base class for data providers.
+
+    native: True if the provider is the built-in html scraper (i.e. the match
+            classes should scrape the pages themselves).
+    """
+
+    native = False
+
+    def getLeagues(self):
+        """Returns list of {"id": ..., "name": ...} of leagues playing today"""
+        raise NotImplementedError
+
+    def getMatches(self, leagueid):
+        """Returns list of MatchSnapshots for the league"""
+        raise NotImplementedError
+
+    def getDetails(self, matchid):
+        """Returns list of (side, type, player, time) incidents for the match
+        or None if the details aren't available.
+        """
+        raise NotImplementedError
+
+    def getTeams(self):
+        """Returns sorted list of teams playing today"""
+        raise NotImplementedError
+
+    def getTableLeagues(self):
+        """Returns list of {"id": ..., "name": ...} of league tables"""
+        raise NotImplementedError
+
+    def getLeagueTable(self, leagueid):
+        """Returns list of {"name": ..., "table": [team objects]}"""
+        raise NotImplementedError
+
+    def getResultCompetitions(self):
+        """Returns list of {"id": ..., "name": ...} of results pages"""
+        raise NotImplementedError
+
+    def getResults(self, compid):
+        """Returns list of {"date": ..., "results": [...]}"""
+        raise NotImplementedError
+
+    def getFixtureCompetitions(self):
+        """Returns list of {"id": ..., "name": ...} of fixtures pages"""
+        raise NotImplementedError
+
+    def getFixtures(self, compid):
+        """Returns list of {"date": ..., "fixtures": [...]}"""
+        raise NotImplementedError
+
+
+class HTMLProvider(DataProvider):
+    """Provider using the built-in BBC html scraper."""
+
+    native = True
+
+    def getLeagues(self):
+        return League.getLeagues()
+
+    def getMatches(self, leagueid):
+        page = self.getFragment(self.livescoreslink.format(comp=leagueid),
+                                MATCHES_WRAPPER)
+        return self.parseMatches(page, leagueid) if page else []
+
+    def parseMatches(self, page, leagueid=None):
+        """Returns list of MatchSnapshots from a live scores page."""
+        data = BeautifulSoup(page).find("div", {"id": "matches-wrapper"})
+        if not data:
+            return []
+
+        snapshots = []
+        for match in data.findAll("tr", {"id": re.compile(r'^match-row')}):
+            row = parseMatchRow(match)
+            snapshots.append(MatchSnapshot(row["matchid"],
+                                           row["hometeam"],
+                                           row["awayteam"],
+                                           homescore=row["homescore"],
+                                           awayscore=row["awayscore"],
+                                           status=row["status"],
+                                           matchtime=row["matchtime"],
+                                           leagueid=leagueid))
+        return snapshots
+
+    def getDetails(self, matchid):
+        page = self.getPage(FootballMatch.detailprefix.format(id=matchid))
+        return self.parseDetails(page) if page else None
+
+    def parseDetails(self, page):
+        """Returns list of incidents from a match detail page."""
+        rows = incidentRows(page)
+        if rows is None:
+            return None
+        return [i for i in (parseIncident(r) for r in rows) if i]
+
+    def getTeams(self):
+        return Teams().getTeams()
+
+    def getTableLeagues(self):
+        return LeagueTable().getLeagues()
+
+    def getLeagueTable(self, leagueid):
+        return LeagueTable().getLeagueTable(leagueid)
+
+    def getResultCompetitions(self):
+        return Results().getCompetitions()
+
+    def getResults(self, compid):
+        return Results().getResults(compid)
+
+    def getFixtureCompetitions(self):
+        return Fixtures().getCompetitions()
+
+    def getFixtures(self, compid):
+        return Fixtures().getFixtures(compid)
+
+
+# Teams in tables supplied by a provider have the same attributes as the
+# teams returned by LeagueTable.getLeagueTable
+TableRow = LeagueTableTeam
+
+
+class JSONProvider(DataProvider):
+    """Provider reading a structured JSON feed (see module docstring for the
+    layout of the feed).
+
+    e.g. JSONProvider("http://192.168.1.10:8000/feed")
+         JSONProvider("/home/pi/feed")
+    """
+
+    def __init__(self, base):
+        """Method to create an instance of the provider.
+
+        base: base url of the feed or path to a local directory
+        """
+        self.base = base.rstrip("/")
+        self.remote = base.startswith(("http://", "https://"))
+
+    def loadText(self, path):
+        """Returns the text of the feed file (without ".json") or None."""
+        if self.remote:
+            return self.getPage("{}/{}.json".format(self.base, path))
+
+        filename = os.path.join(self.base, *(path + ".json").split("/"))
+        try:
+            with codecs.open(filename, "r", "utf-8") as f:
+                return f.read()
+        except IOError:
+            return None
+
+    def load(self, path, default=None):
+        """Returns the decoded feed file (or default if unavailable)."""
+        text = self.loadText(path)
+        if not text:
+            return default
+        try:
+            return json.loads(text)
+        except ValueError:
+            return default
+
+    def getLeagues(self):
+        return self.load("leagues", [])
+
+    def getMatches(self, leagueid):
+        text = self.loadText("matches/{}".format(leagueid))
+        return self.parseMatches(text, leagueid) if text else []
+
+    def parseMatches(self, text, leagueid=None):
+        """Returns list of MatchSnapshots from the text of a matches file."""
+        try:
+            matches = json.loads(text)
+        except ValueError:
+            return []
+
+        return [MatchSnapshot(m["matchid"],
+                              m["hometeam"],
+                              m["awayteam"],
+                              homescore=m.get("homescore", 0),
+                              awayscore=m.get("awayscore", 0),
+                              status=m.get("status"),
+                              matchtime=m.get("matchtime"),
+                              incidents=m.get("incidents") or (),
+                              leagueid=leagueid,
+                              competition=m.get("competition"))
+                for m in matches]
+
+    def getDetails(self, matchid):
+        incidents = self.load("details/{}".format(matchid))
+        if incidents is None:
+            return None
+        return [tuple(i) for i in incidents]
+
+    def getTeams(self):
+        return sorted(self.load("teams", []))
+
+    def getTableLeagues(self):
+        return self.load("tableleagues", [])
+
+    def getLeagueTable(self, leagueid):
+        tables = self.load("tables/{}".format(leagueid), [])
+        fields = LeagueTableTeam.__slots__
+        return [{"name": t["name"],
+                 "table": [TableRow(**{f: row.get(f) for f in fields})
+                           for row in t["table"]]}
+                for t in tables]
+
+    def getResultCompetitions(self):
+        return self.load("resultcompetitions", [])
+
+    def getResults(self, compid):
+        return self.load("results/{}".format(compid), [])
+
+    def getFixtureCompetitions(self):
+        return self.load("fixturecompetitions", [])
+
+    def getFixtures(self, compid):
+        return self.load("fixtures/{}".format(compid), [])
@@ -0,0 +1,377 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides a local live scores server. A single scraper polls the
+BBC pages for every active competition and any number of local clients can
+receive the resulting change events (new match, goal, status change,
+incident) via Server-Sent Events.
+
+Clients connect to:
+
+  http://<host>:<port>/events?team=Chelsea&competition=premier-league
+
+The "team" and "competition" parameters are optional and can be repeated.
+A client with no filters receives every event. The current state of every
+match can be retrieved as JSON from:
+
+  http://<host>:<port>/matches
+"""
+import json
+import threading
+import socket
+import Queue
+from urlparse import urlparse, parse_qs
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from service.footballscores import League
+import service.constants as CONST
+
+
+class Subscriber(object):
+    """Class object representing one connected client.
+
+    Events are placed on a bounded queue. If a client is too slow to read its
+    events then new events are dropped rather than holding up the other
+    clients.
+    """
+
+    def __init__(self, teams=None, competitions=None, maxqueue=100):
+        """Method to create an instance of the subscriber.
+
+        teams:        (optional) list of team names to receive events for
+        competitions: (optional) list of competition ids or names
+        maxqueue:     maximum number of events waiting to be sent
+        """
+        self.teams = frozenset(teams or [])
+        self.competitions = frozenset(competitions or [])
+        self.queue = Queue.Queue(maxqueue)
+        self.dropped = 0
+
+    def wants(self, event):
+        """Boolean. Returns True if the event matches the client's filters."""
+        if self.teams and not (event["hometeam"] in self.teams or
+                               event["awayteam"] in self.teams):
+            return False
+
+        if self.competitions and not (
+                event["leagueid"] in self.competitions or
+                event["competition"] in self.competitions):
+            return False
+
+        return True
+
+    def put(self, message):
+        """Adds an already serialised message to the client's queue."""
+        try:
+            self.queue.put_nowait(message)
+        except Queue.Full:
+            self.dropped += 1
+
+
+class Broadcaster(object):
+    """Class object to fan out events to the connected subscribers.
+
+    Each event is serialised once, regardless of the number of clients.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__subscribers = []
+
+    def subscribe(self, subscriber):
+        with self.__lock:
+            self.__subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.__lock:
+            if subscriber in self.__subscribers:
+                self.__subscribers.remove(subscriber)
+
+    @staticmethod
+    def formatEvent(event):
+        """Returns the event formatted as a Server-Sent Events message."""
+        return "event: {}\ndata: {}\n\n".format(event["type"],
+                                               json.dumps(event))
+
+    def publish(self, event):
+        """Sends the event to all interested subscribers.
+
+        Returns the number of subscribers who received the event.
+        """
+        message = self.formatEvent(event)
+
+        with self.__lock:
+            subscribers = list(self.__subscribers)
+
+        count = 0
+        for subscriber in subscribers:
+            if subscriber.wants(event):
+                subscriber.put(message)
+                count += 1
+
+        return count
+
+    @property
+    def Subscribers(self):
+        with self.__lock:
+            return len(self.__subscribers)
+
+
+class ScoresScraper(threading.Thread):
+    """Thread which scrapes the live scores and publishes change events.
+
+    Every active competition is fetched once per poll, however many clients
+    are connected.
+    """
+
+    def __init__(self, broadcaster, interval=30, detailed=False,
+                 leagues=None, timeline=None, logger=None):
+        """Method to create an instance of the scraper.
+
+        broadcaster: Broadcaster object to receive the events
+        interval:    number of seconds between polls
+        detailed:    request incident details for each match
+        leagues:     (optional) list of league ids to scrape. If not set then
+                     all active leagues are scraped.
+        timeline:    (optional) service.timeline.TimelineArchive to which
+                     every change in the state of each match is added
+        logger:      (optional) logger object. Errors during a poll are
+                     logged and the scraper carries on at the next interval.
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self.detailed = detailed
+        self.__leagueids = leagues
+        self.__timeline = timeline
+        self.__logger = logger
+        self.__leagues = {}
+        self.__states = {}
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+
+    def run(self):
+        while not self.__stop.is_set():
+            # An error in one poll (e.g. a page which couldn't be read)
+            # mustn't stop the scraper, otherwise clients are left with
+            # stale scores.
+            try:
+                self.poll()
+            except Exception:
+                if self.__logger is not None:
+                    self.__logger.exception("Error polling live scores.")
+            self.__stop.wait(self.interval)
+
+    def stop(self):
+        self.__stop.set()
+
+    def poll(self):
+        """Refreshes every league and publishes any changes.
+
+        Returns the number of events published.
+        """
+        if self.__leagueids:
+            leagueids = self.__leagueids
+        else:
+            leagueids = [l["id"] for l in League.getLeagues()]
+
+        # Drop any leagues which are no longer active
+        for leagueid in self.__leagues.keys():
+            if leagueid not in leagueids:
+                del self.__leagues[leagueid]
+
+        events = 0
+        seen = set()
+
+        for leagueid in leagueids:
+            league = self.__leagues.get(leagueid)
+
+            if league is None:
+                league = League(leagueid, detailed=self.detailed)
+                self.__leagues[leagueid] = league
+            else:
+                league.Update()
+
+            for match in league.LeagueMatches:
+                if match.matchid:
+                    seen.add(match.matchid)
+                    events += self.__checkMatch(league, match)
+
+        # Forget about matches which have disappeared (e.g. new day)
+        with self.__lock:
+            for matchid in self.__states.keys():
+                if matchid not in seen:
+                    del self.__states[matchid]
+                    if self.__timeline is not None:
+                        self.__timeline.forget(matchid)
+
+        return events
+
+    def __checkMatch(self, league, match):
+        """Compares the match with its previous state and publishes events.
+
+        Returns the number of events published.
+        """
+        state = self.matchState(league, match)
+
+        if self.__timeline is not None:
+            self.__recordTimeline(match.snapshot().replace(
+                leagueid=state["leagueid"],
+                competition=state["competition"]))
+
+        with self.__lock:
+            old = self.__states.get(match.matchid)
+            self.__states[match.matchid] = state
+
+        events = []
+
+        if old is None:
+            events.append(dict(state, type=CONST.EVENT_NEW_MATCH))
+
+        else:
+            if (state["homescore"] != old["homescore"] or
+                    state["awayscore"] != old["awayscore"]):
+                events.append(dict(state, type=CONST.EVENT_GOAL))
+
+            if state["status"] != old["status"]:
+                events.append(dict(state, type=CONST.EVENT_STATUS))
+
+            for incident in state["incidents"][len(old["incidents"]):]:
+                events.append(dict(state, type=CONST.EVENT_INCIDENT,
+                                   incident=incident))
+
+        for event in events:
+            self.broadcaster.publish(event)
+
+        return len(events)
+
+    def __recordTimeline(self, snapshot):
+        """Method to add the state of the match to its timeline. Problems
+        with the archive (e.g. a full disk) are logged but mustn't stop
+        events being broadcast.
+        """
+        try:
+            self.__timeline.record(snapshot)
+        except Exception:
+            if self.__logger is not None:
+                self.__logger.exception("Unable to add match {} to "
+                                        "timeline.".format(snapshot.matchid))
+
+    @staticmethod
+    def matchState(league, match):
+        """Returns a JSON serialisable dict representing the match."""
+        return {"matchid": match.matchid,
+                "leagueid": league.LeagueID,
+                "competition": league.LeagueName,
+                "hometeam": match.hometeam,
+                "awayteam": match.awayteam,
+                "homescore": match.homescore,
+                "awayscore": match.awayscore,
+                "status": match.Status,
+                "matchtime": match.MatchTime,
+                "incidents": list(match.rawincidents)}
+
+    @property
+    def Matches(self):
+        """Returns list of the current state of all matches."""
+        with self.__lock:
+            return self.__states.values()
+
+
+class PushRequestHandler(BaseHTTPRequestHandler):
+    """Request handler for the push server."""
+
+    # Seconds between keep-alive comments sent to idle clients.
+    keepalive = 15
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/events":
+            self.__sendEvents(query.get("team"), query.get("competition"))
+
+        elif url.path == "/matches":
+            body = json.dumps(self.server.scraper.Matches)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        else:
+            self.send_error(404)
+
+    def __sendEvents(self, teams, competitions):
+        """Streams events to the client until it disconnects."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        broadcaster = self.server.broadcaster
+        subscriber = broadcaster.subscribe(Subscriber(teams, competitions))
+
+        try:
+            while True:
+                try:
+                    message = subscriber.queue.get(timeout=self.keepalive)
+                except Queue.Empty:
+                    message = ": keep-alive\n\n"
+                self.wfile.write(message)
+                self.wfile.flush()
+
+        except socket.error:
+            pass
+
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    def log_message(self, format, *args):
+        if self.server.logger is not None:
+            self.server.logger.debug(format % args)
+
+
+class PushServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server pushing live score events to local clients.
+
+    e.g. server = PushServer(("", 8080), interval=30)
+         server.serve_forever()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, interval=30, detailed=False, leagues=None,
+                 logger=None, timeline=None):
+        """Method to create an instance of the push server.
+
+        address:  (host, port) tuple to listen on
+        interval: number of seconds between polls of the live scores
+        detailed: request incident details for each match
+        leagues:  (optional) list of league ids to scrape (default: all)
+        logger:   (optional) logger object for debug logs
+        timeline: (optional) service.timeline.TimelineArchive to which the
+                  state changes of every match are added
+        """
+        HTTPServer.__init__(self, address, PushRequestHandler)
+        self.logger = logger
+        self.broadcaster = Broadcaster()
+        self.scraper = ScoresScraper(self.broadcaster,
+                                     interval=interval,
+                                     detailed=detailed,
+                                     leagues=leagues,
+                                     timeline=timeline,
+                                     logger=logger)
+
+    def serve_forever(self, *args, **kwargs):
+        if not self.scraper.is_alive():
+            self.scraper.start()
+        HTTPServer.serve_forever(self, *args, **kwargs)
+
+    def shutdown(self):
+        self.scraper.stop()
+        HTTPServer.shutdown(self)
@@ -0,0 +1,181 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides token bucket rate limiting for the service. A single
+RateLimiter can be shared by the scraper (one bucket per upstream host) and
+by the notification service (one bucket per notifier) so that neither the BBC
+nor the mail server sees more traffic than they are prepared to accept.
+"""
+import threading
+from time import time, sleep
+from urlparse import urlparse
+
+
+class TokenBucket(object):
+    """Simple token bucket.
+
+    Tokens are added at "rate" tokens per second up to a maximum of
+    "capacity". Requests that arrive when the bucket is empty reserve a token
+    in advance (the bucket goes negative) and are told how long to wait.
+    This means that callers are served in the order in which they arrive.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """Method to create an instance of the bucket.
+
+        rate:     number of tokens added per second
+        capacity: (optional) maximum number of tokens held (i.e. burst size).
+                  Defaults to one second's worth of tokens (minimum of 1).
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(1, rate))
+        self.__tokens = self.capacity
+        self.__last = time()
+        self.__lock = threading.Lock()
+
+    def __refill(self, now):
+        """Adds the tokens accrued since the last refill."""
+        elapsed = now - self.__last
+        self.__last = now
+        self.__tokens = min(self.capacity,
+                            self.__tokens + (elapsed * self.rate))
+
+    def reserve(self, tokens=1):
+        """Takes tokens from the bucket and returns the number of seconds the
+        caller needs to wait before using them. Does not block.
+        """
+        with self.__lock:
+            self.__refill(time())
+            self.__tokens -= tokens
+            if self.__tokens >= 0:
+                return 0.0
+            return -self.__tokens / self.rate
+
+    def consume(self, tokens=1):
+        """Takes tokens from the bucket, blocking until they are available.
+
+        Returns the number of seconds spent waiting.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            sleep(delay)
+        return delay
+
+    @property
+    def Tokens(self):
+        """Returns the number of tokens currently available."""
+        with self.__lock:
+            self.__refill(time())
+            return self.__tokens
+
+
+class RateLimiter(object):
+    """Class object to hold a set of named token buckets.
+
+    Buckets are identified by a key. By convention the service uses:
+
+      "host:<hostname>"       for upstream http requests
+      "notifier:<classname>"  for notifier dispatch
+
+    Keys without a configured limit use the default limit (if any). An
+    optional global budget (requests per minute) applies to every request
+    made through the limiter regardless of key.
+
+    The limiter keeps a record of the number of requests made and time spent
+    waiting for tokens for each key, available via the Report property.
+    """
+
+    def __init__(self, limits=None, default=None, budget=None):
+        """Method to create an instance of the rate limiter.
+
+        limits:  (optional) dict of key: (rate, capacity) where rate is in
+                 requests per second
+        default: (optional) (rate, capacity) tuple applied to unknown keys.
+                 If None, unknown keys are only subject to the budget.
+        budget:  (optional) maximum number of requests per minute across all
+                 keys
+        """
+        self.__lock = threading.Lock()
+        self.__buckets = {}
+        self.__stats = {}
+        self.__default = default
+
+        for key, limit in (limits or {}).items():
+            self.setLimit(key, *limit)
+
+        if budget:
+            self.__budget = TokenBucket(budget / 60.0, budget)
+        else:
+            self.__budget = None
+
+    def setLimit(self, key, rate, capacity=None):
+        """Sets (or replaces) the limit for the given key."""
+        with self.__lock:
+            self.__buckets[key] = TokenBucket(rate, capacity)
+
+    def __getBucket(self, key):
+        """Returns the bucket for the key, creating it from the default limit
+        if necessary. Returns None if the key is not limited.
+        """
+        with self.__lock:
+            bucket = self.__buckets.get(key)
+            if bucket is None and self.__default:
+                bucket = TokenBucket(*self.__default)
+                self.__buckets[key] = bucket
+            return bucket
+
+    def acquire(self, key):
+        """Blocks until a request for the given key is allowed.
+
+        Returns the number of seconds spent waiting.
+        """
+        delay = 0.0
+
+        bucket = self.__getBucket(key)
+        if bucket is not None:
+            delay = bucket.reserve()
+
+        if self.__budget is not None:
+            delay = max(delay, self.__budget.reserve())
+
+        if delay > 0:
+            sleep(delay)
+
+        with self.__lock:
+            stats = self.__stats.setdefault(key, {"requests": 0,
+                                                  "waited": 0.0})
+            stats["requests"] += 1
+            stats["waited"] += delay
+
+        return delay
+
+    def acquireURL(self, url):
+        """Blocks until a request to the host of the given url is allowed."""
+        return self.acquire(self.hostKey(url))
+
+    def acquireNotifier(self, notifier):
+        """Blocks until the given notifier is allowed to send a message."""
+        return self.acquire(self.notifierKey(notifier))
+
+    @staticmethod
+    def hostKey(url):
+        """Returns the bucket key used for the host of the given url."""
+        return "host:{}".format(urlparse(url).hostname)
+
+    @staticmethod
+    def notifierKey(notifier):
+        """Returns the bucket key used for the given notifier."""
+        return "notifier:{}".format(notifier.__class__.__name__)
+
+    @property
+    def Report(self):
+        """Returns dict of key: {"requests": n, "waited": seconds}"""
+        with self.__lock:
+            return {k: dict(v) for k, v in self.__stats.items()}
+
+    @property
+    def TotalWait(self):
+        """Returns the total number of seconds spent waiting for tokens."""
+        with self.__lock:
+            return sum(v["waited"] for v in self.__stats.values())
@@ -0,0 +1,170 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module allows the pages requested by service.footballscores to be
+recorded to an archive and replayed later without a network connection.
+
+Recording:
+
+  matchcommon.recorder = PageRecorder("/home/pi/matchday.jsonl.gz")
+
+Every page successfully retrieved by matchcommon.getPage (or read completely
+by matchcommon.streamPage) is appended to the archive with its url, time,
+status and headers.
+
+Replaying:
+
+  matchcommon.replayer = PageReplayer("/home/pi/matchday.jsonl.gz",
+                                      speed=100)
+
+Requests are answered from the archive. The replayer keeps its own clock,
+starting at the time of the first recording, which is moved on by calls to
+PageReplayer.sleep (ScoreNotifierService uses this instead of time.sleep
+while replaying). Each request is answered with the latest recording of the
+url at the current replay time (or as if it wasn't recorded if its first
+recording is later), so a whole match day can be replayed deterministically
+at any speed.
+"""
+import gzip
+import json
+import threading
+from bisect import bisect_right
+from time import time, sleep
+
+
+class PageRecorder(object):
+    """Class object to append responses to a compressed archive.
+
+    The archive is a gzip file containing one JSON record per line with
+    the keys: url, timestamp, status, headers and body.
+    """
+
+    def __init__(self, archive):
+        """Method to create an instance of the recorder.
+
+        archive: path of the archive. New recordings are appended.
+        """
+        self.archive = archive
+        self.__file = gzip.open(archive, "ab")
+        self.__lock = threading.Lock()
+        self.records = 0
+
+    def record(self, url, body, headers=None, status=200, timestamp=None):
+        """Adds a response to the archive.
+
+        body: page content (bytes are assumed to be utf-8)
+        """
+        if isinstance(body, str):
+            body = body.decode("utf-8", "replace")
+
+        line = json.dumps({"url": url,
+                           "timestamp": timestamp or time(),
+                           "status": status,
+                           "headers": dict(headers or {}),
+                           "body": body})
+
+        with self.__lock:
+            self.__file.write(line + "\n")
+            self.records += 1
+
+    def flush(self):
+        with self.__lock:
+            self.__file.flush()
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+class PageReplayer(object):
+    """Class object to serve pages from an archive created by PageRecorder.
+    """
+
+    def __init__(self, archive, speed=100, offset=0):
+        """Method to create an instance of the replayer.
+
+        archive: path of the archive
+        speed:   how much faster than real time to replay. Calls to sleep
+                 will sleep for seconds / speed. Set to None to not sleep at
+                 all (as fast as possible).
+        offset:  number of seconds into the recording at which to start
+        """
+        self.speed = speed
+        self.elapsed = offset
+        self.requests = 0
+        self.misses = 0
+        self.__pages = {}
+        self.__lock = threading.Lock()
+
+        records = []
+        f = gzip.open(archive, "rb")
+        try:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+        finally:
+            f.close()
+
+        records.sort(key=lambda r: r["timestamp"])
+
+        for record in records:
+            times, pages = self.__pages.setdefault(record["url"], ([], []))
+            times.append(record["timestamp"])
+            pages.append(record)
+
+        self.start = records[0]["timestamp"] if records else time()
+        self.end = records[-1]["timestamp"] if records else self.start
+
+    @property
+    def Now(self):
+        """Returns the current replay time (as a timestamp)."""
+        return self.start + self.elapsed
+
+    @property
+    def Finished(self):
+        """Boolean. Returns True once the replay time has passed the last
+        recording.
+        """
+        return self.Now > self.end
+
+    def sleep(self, seconds):
+        """Moves the replay clock on by the given number of seconds."""
+        with self.__lock:
+            self.elapsed += seconds
+        if self.speed:
+            sleep(seconds / float(self.speed))
+
+    def getRecord(self, url):
+        """Returns the latest record for the url at the current replay time.
+
+        Returns None (and counts a miss) if the url was never recorded or
+        wasn't recorded until after the current replay time, so pages from
+        the future are never served.
+        """
+        with self.__lock:
+            self.requests += 1
+            entry = self.__pages.get(url)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            times, pages = entry
+            i = bisect_right(times, self.Now)
+            if i == 0:
+                self.misses += 1
+                return None
+            return pages[i - 1]
+
+    def getPage(self, url):
+        """Returns the body of the page (or None) as for matchcommon.getPage.
+        """
+        record = self.getRecord(url)
+        if record is None or record["status"] != 200:
+            return None
+        return record["body"]
+
+    @property
+    def URLs(self):
+        """Returns list of urls in the archive."""
+        return self.__pages.keys()
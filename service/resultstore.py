@@ -0,0 +1,290 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides ResultStore, a local SQLite store of the results and
+fixtures of each competition.
+
+  from service.resultstore import ResultStore
+
+  store = ResultStore("/home/pi/results.db", maxage=3600)
+  store.getResults("118996114", team="Chelsea")
+  store.getFixtures("118996114", start="2016-10-01", end="2016-10-31")
+
+The store is refreshed from the results/fixtures pages (or the data provider
+set on matchcommon) when a competition is first requested and then whenever
+its data is more than "maxage" seconds old. Refreshes are incremental: the
+html of each match day is hashed as the page is read and only days which are
+new or have changed are parsed and written. Everything else is answered
+from the database.
+"""
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime, date
+from time import time
+
+from service.footballscores import (Results, Fixtures, PageError,
+                                    parseResultDay, parseFixtureDay)
+
+RESULTS = "results"
+FIXTURES = "fixtures"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS refreshes (
+    comp TEXT, kind TEXT, refreshed REAL,
+    PRIMARY KEY (comp, kind));
+CREATE TABLE IF NOT EXISTS days (
+    comp TEXT, kind TEXT, date TEXT, day TEXT, hash TEXT,
+    PRIMARY KEY (comp, kind, date));
+CREATE TABLE IF NOT EXISTS matches (
+    comp TEXT, kind TEXT, date TEXT, day TEXT, position INTEGER,
+    hometeam TEXT, awayteam TEXT, score TEXT);
+CREATE INDEX IF NOT EXISTS matches_comp ON matches (comp, kind, day);
+CREATE INDEX IF NOT EXISTS matches_date ON matches (comp, kind, date);
+CREATE INDEX IF NOT EXISTS matches_home ON matches (hometeam, day);
+CREATE INDEX IF NOT EXISTS matches_away ON matches (awayteam, day);
+"""
+
+# Date in a match day heading e.g. "Saturday 1st October 2016"
+DAY_DATE = re.compile(r"(\d{1,2})(?:st|nd|rd|th)?\s+([A-Za-z]+)\s+(\d{4})")
+
+
+def parseDayDate(text):
+    """Returns the date of a match day heading as "YYYY-MM-DD" (or None)."""
+    m = DAY_DATE.search(text)
+    if m is None:
+        return None
+    try:
+        return datetime.strptime(" ".join(m.groups()),
+                                 "%d %B %Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+def _digest(text):
+    if isinstance(text, unicode):
+        text = text.encode("utf-8")
+    return hashlib.sha1(text).hexdigest()
+
+
+def _isoDate(value):
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+class ResultStore(object):
+    """Class object holding results and fixtures in an SQLite database."""
+
+    def __init__(self, path=":memory:", maxage=3600):
+        """Method to create an instance of the store.
+
+        path:   path of the database file (created if needed)
+        maxage: number of seconds before a competition is refreshed when it
+                is queried (None to only refresh when "refresh" is called)
+        """
+        self.path = path
+        self.maxage = maxage
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.executescript(SCHEMA)
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
+
+    def refresh(self, compid, kind=RESULTS):
+        """Refreshes the competition's results (or fixtures) from the page.
+        Only match days which are new or have changed are parsed.
+
+        Nothing is written unless the whole page was read. All changes are
+        written in a single transaction, which is rolled back if there is
+        an error.
+
+        Returns the number of match days written. Raises PageError if the
+        page couldn't be read.
+        """
+        known = self.__knownDays(compid, kind)
+        seen = set()
+
+        if kind == RESULTS:
+            days, parse = Results().iterResults, parseResultDay
+        else:
+            days, parse = Fixtures().iterFixtures, parseFixtureDay
+
+        def parseday(html):
+            digest = _digest(html)
+            if digest in known:
+                seen.add(known[digest])
+                return None
+            day = parse(html)
+            if day is not None:
+                day["hash"] = digest
+            return day
+
+        # Only the changed days are kept until the page has been read
+        changed = []
+        for day in days(compid, parseday):
+            # Days from an external provider aren't hashed when read
+            digest = day.pop("hash", None)
+            if digest is None:
+                digest = _digest(json.dumps(day, sort_keys=True))
+                if known.get(digest) == day["date"]:
+                    seen.add(day["date"])
+                    continue
+
+            changed.append((day, digest))
+            seen.add(day["date"])
+
+        with self.__lock:
+            try:
+                for day, digest in changed:
+                    self.__writeDay(compid, kind, day, digest)
+                if kind == FIXTURES:
+                    self.__removeFixtures(compid, seen)
+                self.__db.execute("INSERT OR REPLACE INTO refreshes "
+                                  "VALUES (?, ?, ?)", (compid, kind, time()))
+                self.__db.commit()
+            except Exception:
+                self.__db.rollback()
+                raise
+
+        return len(changed)
+
+    def __knownDays(self, compid, kind):
+        """Returns dict of hash: date of the stored days."""
+        with self.__lock:
+            rows = self.__db.execute("SELECT hash, date FROM days "
+                                     "WHERE comp = ? AND kind = ?",
+                                     (compid, kind)).fetchall()
+        return dict(rows)
+
+    def __writeDay(self, compid, kind, day, digest):
+        """Replaces the stored matches of the day. Called with the lock
+        held and doesn't commit.
+        """
+        matchdate = day["date"]
+        isodate = parseDayDate(matchdate)
+        rows = [(compid, kind, matchdate, isodate, i, m["hometeam"],
+                 m["awayteam"], m.get("score"))
+                for i, m in enumerate(day[kind])]
+
+        self.__db.execute("DELETE FROM matches WHERE comp = ? AND "
+                          "kind = ? AND date = ?",
+                          (compid, kind, matchdate))
+        self.__db.executemany("INSERT INTO matches VALUES "
+                              "(?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.__db.execute("INSERT OR REPLACE INTO days VALUES "
+                          "(?, ?, ?, ?, ?)",
+                          (compid, kind, matchdate, isodate, digest))
+
+    def __removeFixtures(self, compid, seen):
+        """Removes fixture days which are no longer listed (e.g. postponed
+        or rescheduled). Only called after the whole page has been read, with
+        the lock held, and doesn't commit.
+        """
+        rows = self.__db.execute("SELECT date FROM days WHERE "
+                                 "comp = ? AND kind = ?",
+                                 (compid, FIXTURES)).fetchall()
+
+        for (matchdate,) in rows:
+            if matchdate not in seen:
+                for table in ("days", "matches"):
+                    self.__db.execute("DELETE FROM {} WHERE comp = ? AND "
+                                      "kind = ? AND date = ?".format(table),
+                                      (compid, FIXTURES, matchdate))
+
+    def __refreshIfDue(self, compid, kind):
+        with self.__lock:
+            row = self.__db.execute("SELECT refreshed FROM refreshes WHERE "
+                                    "comp = ? AND kind = ?",
+                                    (compid, kind)).fetchone()
+        if row is None or (self.maxage is not None and
+                           time() - row[0] > self.maxage):
+            try:
+                self.refresh(compid, kind)
+            except PageError:
+                # Stored data is better than nothing, but if there isn't
+                # any the caller needs to know
+                if row is None:
+                    raise
+
+    def query(self, kind=RESULTS, compid=None, team=None, start=None,
+              end=None):
+        """Returns list of matches (dicts) from the store. Nothing is
+        refreshed.
+
+        kind:   "results" or "fixtures"
+        compid: (optional) competition id
+        team:   (optional) only matches involving the team
+        start:  (optional) first date (date or "YYYY-MM-DD")
+        end:    (optional) last date (date or "YYYY-MM-DD")
+
+        Each match has the keys: competition, date (as shown on the page),
+        day ("YYYY-MM-DD" or None), hometeam, awayteam and (for results)
+        score.
+        """
+        sql = ["SELECT comp, date, day, hometeam, awayteam, score "
+               "FROM matches WHERE kind = ?"]
+        args = [kind]
+
+        if compid is not None:
+            sql.append("AND comp = ?")
+            args.append(compid)
+        if team is not None:
+            sql.append("AND (hometeam = ? OR awayteam = ?)")
+            args += [team, team]
+        if start is not None:
+            sql.append("AND day >= ?")
+            args.append(_isoDate(start))
+        if end is not None:
+            sql.append("AND day <= ?")
+            args.append(_isoDate(end))
+        sql.append("ORDER BY day, comp, date, position")
+
+        with self.__lock:
+            rows = self.__db.execute(" ".join(sql), args).fetchall()
+
+        matches = []
+        for comp, matchdate, isodate, home, away, score in rows:
+            match = {"competition": comp,
+                     "date": matchdate,
+                     "day": isodate,
+                     "hometeam": home,
+                     "awayteam": away}
+            if kind == RESULTS:
+                match["score"] = score
+            matches.append(match)
+        return matches
+
+    def __matchDays(self, compid, kind, team, start, end):
+        self.__refreshIfDue(compid, kind)
+
+        days = []
+        for match in self.query(kind, compid, team, start, end):
+            if not days or days[-1]["date"] != match["date"]:
+                days.append({"date": match["date"], kind: []})
+            del match["competition"], match["date"], match["day"]
+            days[-1][kind].append(match)
+        return days
+
+    def getResults(self, compid, team=None, start=None, end=None):
+        """Returns the competition's results in the same format as
+        Results.getResults, optionally filtered by team and/or date.
+
+        If a refresh fails the stored data is returned, unless there isn't
+        any, in which case PageError is raised.
+        """
+        return self.__matchDays(compid, RESULTS, team, start, end)
+
+    def getFixtures(self, compid, team=None, start=None, end=None):
+        """Returns the competition's fixtures in the same format as
+        Fixtures.getFixtures, optionally filtered by team and/or date.
+
+        If a refresh fails the stored data is returned, unless there isn't
+        any, in which case PageError is raised.
+        """
+        return self.__matchDays(compid, FIXTURES, team, start, end)
@@ -6,13 +6,24 @@ This module provides the main ScoreNotifierService class which handles the
 checking of scores and sending updates to the relevant notifier.
 """
 import sys
-from time import sleep
+from time import sleep, time
 import logging
 import socket
 
-from service.footballscores import FootballMatch
+from service.footballscores import FootballMatch, matchcommon
+from service.eventbus import EventBus
+from service.diff import diffSnapshots
+from service.probe import ScoreProbe
+from service.eventlog import LogMessage, writesAt
 import service.constants as CONST
 
+# Log messages for each event type
+EVENT_MESSAGES = {CONST.EVENT_NEW_MATCH: "Match found.",
+                  CONST.EVENT_GOAL: "Goal.",
+                  CONST.EVENT_SCORE_CORRECTION: "Score corrected.",
+                  CONST.EVENT_STATUS: "Status change.",
+                  CONST.EVENT_CARD: "Card."}
+
 
 class ScoreNotifierService(object):
     """Class object to check football scores and send updates via AutoRemote.
@@ -36,10 +47,12 @@ class ScoreNotifierService(object):
     """
 
     def __init__(self, team, notifier=None, detailed=False, logger=None,
-                 livetime=60, nonlivetime=3600):
+                 livetime=60, nonlivetime=3600, ratelimiter=None, bus=None,
+                 detailpolicy=None, probetime=None, metrics=None,
+                 tracer=None, profiler=None, timeline=None):
         """Method to create an instance of the notifier service object.
 
-        Currently take six (four are optional) parameters:
+        Currently take fourteen (twelve are optional) parameters:
 
           team:        name of the team for which updates are required
           notifier:    object capable of acting as a notifier
@@ -47,33 +60,107 @@ class ScoreNotifierService(object):
           logger:      logger object for debug logs
           livetime:    number of seconds before refresh when match in progress
           nonlivetime: number of seconds before refresh when no live match
+          ratelimiter: (optional) service.ratelimit.RateLimiter used to limit
+                       notifications (per notifier) and http requests (per
+                       host)
+          bus:         (optional) service.eventbus.EventBus on which match
+                       events are published. The notifier is subscribed to
+                       new match, goal, score correction and status events
+                       for the team.
+          detailpolicy: (optional) service.detailpolicy.DetailPolicy to
+                       decide when match details are fetched
+          probetime:   (optional) number of seconds between probes while a
+                       match is in progress. A probe only reads the row of
+                       the match from the live scores page and the match is
+                       only fully refreshed if the row has changed (or
+                       "livetime" seconds have passed since the last refresh).
+          metrics:     (optional) service.metrics.Metrics to record fetch,
+                       parse, event, notification and sleep metrics
+          tracer:      (optional) service.tracing.Tracer to record how long
+                       each goal took to reach the notifier
+          profiler:    (optional) service.profiling.CycleProfiler used to
+                       profile refresh cycles on request
+          timeline:    (optional) service.timeline.TimelineArchive to which
+                       every change in the state of the match is added
 
         NB initialising the object does not begin the service. The "run"
         method must be called separately.
         """
         self.__logger = logger
         self.__can_log = self.__logger is not None
-        self.__debug("Starting service with team: {}".format(team))
+        self.__debug("Starting service with team: {}", team)
         self.team = team
         self.detailed = detailed
         self.__notifier = notifier
         self.__livetime = livetime
         self.__nonlivetime = nonlivetime
-
-    def __debug(self, message):
+        self.__ratelimiter = ratelimiter
+        self.__detailpolicy = detailpolicy
+        self.__probetime = probetime
+        self.__probe = ScoreProbe() if probetime else None
+        self.__probesignature = None
+        self.__lastrefresh = 0
+
+        # The limiter is shared with the scraper so that all requests to
+        # the same host use the same bucket.
+        if ratelimiter is not None:
+            matchcommon.ratelimiter = ratelimiter
+
+        # Metrics are also shared with the scraper
+        if metrics is not None:
+            matchcommon.metrics = metrics
+        self.__metrics = metrics
+
+        # Goal latency tracing: start of the last refresh and the time taken
+        # by each stage of it
+        self.__tracer = tracer
+        self.__refreshstart = None
+        self.__refreshtimings = {}
+
+        self.__profiler = profiler
+        self.__timeline = timeline
+
+        # Events are routed to the notifier (and any other subscribers) via
+        # the event bus.
+        self.bus = bus if bus is not None else EventBus()
+        if notifier is not None:
+            self.bus.subscribe(self.__notify,
+                               teams=[team],
+                               types=[CONST.EVENT_NEW_MATCH,
+                                      CONST.EVENT_GOAL,
+                                      CONST.EVENT_SCORE_CORRECTION,
+                                      CONST.EVENT_STATUS])
+
+        # Last state of the match, used to work out what has changed
+        self.__snapshot = None
+
+    def __debug(self, message, *args, **fields):
         """Method for handling debugging messages."""
-        if self.__can_log:
-            self.__logger.debug(message)
+        self.__log(logging.DEBUG, message, args, fields)
 
-    def __info(self, message):
+    def __info(self, message, *args, **fields):
         """Method for handling info messages."""
-        if self.__can_log:
-            self.__logger.info(message)
+        self.__log(logging.INFO, message, args, fields)
+
+    def __error(self, message, *args, **fields):
+        """Method for handling error messages.
+
+        Messages are only formatted if the logger will write them out. The
+        args are used to format the message (str.format style) and fields
+        are added to the end of it as key=value pairs.
+        """
+        self.__log(logging.ERROR, message, args, fields)
 
-    def __error(self, message):
-        """Method for handling error messages."""
-        if self.__can_log:
-            self.__logger.error(message)
+    def __log(self, level, message, args, fields):
+        if self.__can_log and self.__logger.isEnabledFor(level):
+            self.__logger.log(level, LogMessage(message, args, fields))
+
+    def __debugging(self):
+        """Boolean. Returns True if debug messages will be written out (so
+        that expensive debug information is only gathered when needed).
+        Messages which are only kept in a ring buffer don't count.
+        """
+        return self.__can_log and writesAt(self.__logger, logging.DEBUG)
 
     def run(self):
         """Method to start the notification service.
@@ -84,7 +171,8 @@ class ScoreNotifierService(object):
         """
 
         # Create an instance of the Football Match
-        self.match = FootballMatch(self.team, detailed=self.detailed)
+        self.match = FootballMatch(self.team, detailed=self.detailed,
+                                   detailpolicy=self.__detailpolicy)
 
         # Service starts here...
         while True:
@@ -93,52 +181,155 @@ class ScoreNotifierService(object):
             # it to see if we need any notifications
             self.__debug("Checking status...")
             if self.match.MatchFound:
-                self.__checkStatus()
+                self.__profiled(self.__checkStatus)
             else:
                 self.__debug("No match found.")
 
+            if self.__profiler is not None:
+                self.__profiler.endCycle()
+
             # Once we've processed the football match we need to sleep for a
             # while.
             self.__debug("Calculating sleep time...")
             self.__sleep()
 
+            # When replaying recorded pages, stop at the end of the recording
+            if (matchcommon.replayer is not None and
+                    matchcommon.replayer.Finished):
+                self.__debug("Replay finished.")
+                break
+
             # After that it's time to refresh the data
             self.__debug("Refreshing data...")
-            self.__update()
+            self.__profiled(self.__update)
+
+    def __profiled(self, func):
+        """Method to call func, via the profiler if there is one."""
+        if self.__profiler is not None:
+            self.__profiler.call(func)
+        else:
+            func()
 
-    def __sendUpdate(self, code):
+    def __sendUpdate(self, code, match=None):
         """Method to send notifications via AutoRemote.
 
         Needs one parameter:
 
           code:    prefix used to identify event type
+
+        match is the FootballMatch to notify (defaults to the current match).
         """
-        self.__debug("Sending update: {}".format(code))
-        self.__notifier.Notify(code, self.match)
+        self.__debug("Sending update: {}", code)
+        if self.__ratelimiter is not None:
+            waited = self.__ratelimiter.acquireNotifier(self.__notifier)
+            if waited:
+                self.__debug("Waited {:.2f}s for notifier", waited)
+
+        if match is None:
+            match = self.match
+
+        start = time()
+        self.__notifier.Notify(code, match)
+        if self.__metrics is not None:
+            self.__metrics.observe("notify_seconds", time() - start,
+                                   notifier=type(self.__notifier).__name__)
+
+    def __notify(self, event):
+        """Event bus callback to pass events on to the notifier."""
+        start = time()
+        self.__sendUpdate(event.code, event.match)
+        if event.trace is not None:
+            event.trace.add("notify", time() - start)
 
     def __checkStatus(self):
-        """Method to process a football match and send notifications where
-        certain events are triggered.
+        """Method to process a football match and publish events on the
+        event bus where certain events are triggered.
+
+        The current state of the match is compared with the state at the
+        last check so every change is reported (e.g. two goals, or a goal
+        and full time) even if they happened between updates.
+        """
+        start = time()
+        snapshot = self.match.snapshot()
+        events = diffSnapshots(self.__snapshot, snapshot, self.team)
+
+        # Following a new match (e.g. the next day)
+        if (self.__snapshot is not None and
+                self.__snapshot.matchid != snapshot.matchid):
+            self.__forgetMatch(self.__snapshot.matchid)
+
+        self.__snapshot = snapshot
+
+        if self.__timeline is not None:
+            self.__recordTimeline(snapshot)
+
+        # Time taken to work out the events. Each event's dispatch time is
+        # this plus its own processing, but not the time spent notifying
+        # earlier events.
+        prepared = time() - start
+
+        for event in events:
+            eventstart = time()
+            self.__info(EVENT_MESSAGES.get(event.type, "Match event."))
+            event.match = self.__eventMatch(event, snapshot)
+            if self.__metrics is not None:
+                self.__metrics.inc("events_total", type=event.type)
+
+            if self.__tracer is not None and event.type == CONST.EVENT_GOAL:
+                event.trace = self.__tracer.start(event.matchid,
+                                                  self.__refreshtimings)
+                event.trace.add("dispatch",
+                                prepared + time() - eventstart)
+
+            self.bus.publish(event)
+
+            if event.trace is not None:
+                self.__tracer.finish(event.trace)
+
+    def __eventMatch(self, event, snapshot):
+        """Method to return the match to pass on with an event.
+
+        Goals and score corrections carry the running score at the time of
+        the event, so where several happened between updates each one is
+        notified with its own score rather than the current score.
+        """
+        data = event.data
+        if "homescore" not in data or "awayscore" not in data:
+            return self.match
+
+        if (data["homescore"] == snapshot.homescore and
+                data["awayscore"] == snapshot.awayscore):
+            return self.match
+
+        return FootballMatch.fromSnapshot(
+            snapshot.replace(homescore=data["homescore"],
+                             awayscore=data["awayscore"]),
+            team=self.team, detailed=self.detailed)
+
+    def __forgetMatch(self, matchid):
+        """Method to drop the information kept about a match which is no
+        longer being followed.
         """
+        if self.__detailpolicy is not None:
+            self.__detailpolicy.forget(matchid)
+        if self.__timeline is not None:
+            self.__timeline.forget(matchid)
+
+    def __recordTimeline(self, snapshot):
+        """Method to add the state of the match to its timeline. Problems
+        with the archive (e.g. a full disk) are logged but mustn't stop
+        notifications.
+        """
+        try:
+            recorded = self.__timeline.record(snapshot)
+        except Exception as e:
+            self.__error("Unable to add to match timeline: {}", e,
+                         matchid=snapshot.matchid)
+            return
 
-        # New football match found. Only triggers once per match so user gets
-        # a notification that there is a game today. Subsequent notifications
-        # will only be sent to the extent one of the conditions below matches.
-        if self.match.NewMatch:
-            self.__info("Match found.")
-            self.__sendUpdate(CONST.STATUS_MATCH_FOUND)
-
-        # Goooooooooooooooooaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaallll!
-        elif self.match.Goal:
-            self.__info("Goal.")
-            code = (CONST.GOAL_MYTEAM if self.match.MyTeamGoal
-                    else CONST.GOAL_OPPOSITION)
-            self.__sendUpdate(code)
-
-        # Status change e.g. start of match, half time, full time.
-        elif self.match.StatusChanged:
-            self.__info("Status change.")
-            self.__sendUpdate(self.match.Status)
+        # The timeline only needs the last state while the match is on
+        if recorded and snapshot.status == "FT":
+            self.__timeline.forget(snapshot.matchid)
 
     def __sleep(self):
         """Method to calculate required sleep time depending on status of
@@ -158,11 +349,16 @@ class ScoreNotifierService(object):
             # Get kickoff time and then calculate number of seconds required
             # until approximately 5 minutes before kickoff (at which point it
             # switches to regular updates)
-            kickoff = self.match.TimeToKickOff.total_seconds()
-            if kickoff < 300:
+            kickoff = self.match.TimeToKickOff
+            if kickoff is None:
+                # Kick off time unknown (or the time couldn't be checked)
+                # so try again soon
+                self.__debug("Unable to work out time to kick off.")
+                delay = self.__livetime
+            elif kickoff.total_seconds() < 300:
                 delay = self.__livetime
             else:
-                delay = kickoff - 240
+                delay = kickoff.total_seconds() - 240
 
         # Match is over so need for regular updates now.
         elif self.match.HasFinished:
@@ -172,7 +368,7 @@ class ScoreNotifierService(object):
         # Match is live so we need regular updates
         elif self.match.IsLive:
             self.__debug("Match is in progress")
-            delay = self.__livetime
+            delay = self.__probetime if self.__probe else self.__livetime
 
         # I can't think of any reason for this to be triggered, but better to
         # have this here just in case!
@@ -181,10 +377,73 @@ class ScoreNotifierService(object):
             delay = self.__nonlivetime
 
         # Time to sleep.
-        self.__debug("Sleeping for {} seconds".format(delay))
-        sleep(delay)
+        self.__debug("Sleeping for {} seconds", delay)
+        if self.__metrics is not None:
+            self.__metrics.observe("sleep_seconds", delay)
+        if matchcommon.replayer is not None:
+            # Replaying recorded pages so move the replay clock instead
+            matchcommon.replayer.sleep(delay)
+        else:
+            sleep(delay)
 
     def __update(self):
         """Method to refresh football match."""
 
-        self.match.Update()
+        start = time()
+
+        if self.__probeUnchanged():
+            self.__debug("Probe found no change.")
+        else:
+            self.match.Update()
+            self.__lastrefresh = time()
+
+            # A goal could have appeared at any time since the last refresh
+            self.__refreshtimings = self.match.Timings
+            if self.__refreshstart is not None:
+                self.__refreshtimings["sleep"] = start - self.__refreshstart
+            self.__refreshstart = start
+
+        # Make sure recorded pages are written out regularly
+        if matchcommon.recorder is not None:
+            matchcommon.recorder.flush()
+
+        # The reports are only worth gathering if they will be logged
+        if self.__debugging():
+            self.__debugReports()
+
+    def __debugReports(self):
+        """Method to log the statistics of the scraper, rate limiter, detail
+        policy and tracer.
+        """
+        self.__debug("Streamed reads", **matchcommon.StreamReport())
+
+        if self.__ratelimiter is not None:
+            self.__debug("Rate limiter waits: {}", self.__ratelimiter.Report)
+
+        if self.__detailpolicy is not None:
+            self.__debug("Detail requests: {}", self.__detailpolicy.Report)
+
+        if self.__tracer is not None:
+            self.__debug("Goal latency: {}", self.__tracer.Report)
+
+    def __probeUnchanged(self):
+        """Boolean. Returns True if probing the live match shows that it
+        hasn't changed and a full refresh isn't needed yet.
+        """
+        match = self.match
+
+        if (self.__probe is None or not match.MatchFound or
+                not match.IsLive or not match.scorelink):
+            self.__probesignature = None
+            return False
+
+        signature = self.__probe.probe(match.scorelink, match.matchid)
+        unchanged = (signature is not None and
+                     signature == self.__probesignature and
+                     time() - self.__lastrefresh < self.__livetime)
+        self.__probesignature = signature
+
+        self.__debug("Probe read {} bytes on average",
+                     self.__probe.AverageBytes)
+
+        return unchanged
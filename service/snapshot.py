@@ -0,0 +1,104 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides MatchSnapshot, a compact and immutable record of the
+state of a football match at a point in time.
+
+FootballMatch objects carry a lot of state (html links, badges, flags and
+incident lists) in their __dict__. A snapshot only holds what is needed to
+display and compare matches and uses __slots__, shared (interned) strings for
+team and competition names and tuples for incidents. This makes it suitable
+for holding every live match in every competition.
+"""
+
+# Team and competition names are repeated across many snapshots so we keep
+# a single copy of each. The builtin intern() doesn't accept unicode strings
+# in Python 2 so we keep our own table.
+_interned = {}
+
+
+def internString(value):
+    """Returns a shared copy of the string (or None)."""
+    if value is None:
+        return None
+    return _interned.setdefault(value, value)
+
+
+class MatchSnapshot(object):
+    """Immutable snapshot of a football match.
+
+    incidents is a tuple of (team, type, player, time) tuples where team is
+    "home" or "away" and type is "goal", "yellow" or "red" (i.e. the same
+    format as FootballMatch.rawincidents).
+    """
+
+    __slots__ = ("matchid", "leagueid", "competition", "hometeam",
+                 "awayteam", "homescore", "awayscore", "status", "matchtime",
+                 "incidents")
+
+    def __init__(self, matchid, hometeam, awayteam, homescore=0,
+                 awayscore=0, status=None, matchtime=None, incidents=(),
+                 leagueid=None, competition=None):
+        setter = object.__setattr__
+        setter(self, "matchid", matchid)
+        setter(self, "leagueid", internString(leagueid))
+        setter(self, "competition", internString(competition))
+        setter(self, "hometeam", internString(hometeam))
+        setter(self, "awayteam", internString(awayteam))
+        setter(self, "homescore", homescore)
+        setter(self, "awayscore", awayscore)
+        setter(self, "status", internString(status))
+        setter(self, "matchtime", matchtime)
+        setter(self, "incidents",
+               tuple((internString(i[0]), internString(i[1]),
+                      internString(i[2]), i[3]) for i in incidents))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MatchSnapshot objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("MatchSnapshot objects are immutable")
+
+    def asTuple(self):
+        """Returns the snapshot as a tuple (in __slots__ order)."""
+        return tuple(getattr(self, s) for s in self.__slots__)
+
+    @classmethod
+    def fromTuple(cls, values):
+        """Creates a snapshot from a tuple created by asTuple."""
+        d = dict(zip(cls.__slots__, values))
+        return cls(**d)
+
+    def replace(self, **kwargs):
+        """Returns a new snapshot with the given fields replaced."""
+        d = dict(zip(self.__slots__, self.asTuple()))
+        d.update(kwargs)
+        return self.__class__(**d)
+
+    def __getstate__(self):
+        return self.asTuple()
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+    def __eq__(self, other):
+        if isinstance(other, self.__class__):
+            return self.asTuple() == other.asTuple()
+        return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.asTuple())
+
+    def __repr__(self):
+        return "MatchSnapshot(\'%s\', %s %s-%s %s, status=%s)" % (
+                                                        self.matchid,
+                                                        self.hometeam,
+                                                        self.homescore,
+                                                        self.awayscore,
+                                                        self.awayteam,
+                                                        self.status)
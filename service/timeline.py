@@ -0,0 +1,353 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module provides TimelineArchive, an append-only archive of every change
+observed in the state of a match (score, status, match time and incidents).
+
+  from service.timeline import TimelineArchive
+
+  archive = TimelineArchive("/home/pi/timelines")
+  archive.record(match.snapshot())
+
+Each match has its own file (one JSON record per line). The first record
+holds the full state of the match and each later record only the fields
+which changed, with the time the change was seen:
+
+  {"t": 1476543210.5, "homescore": 1, "+incidents": [["home", "goal",
+   "Costa", "89'"]]}
+
+A separate index file has one line per match (id, date, teams and
+competition) and is loaded into memory, so matches can be looked up by
+team, competition and date without reading their timelines:
+
+  # All late goals by Chelsea this season
+  archive.incidents(team="Chelsea", type="goal", after=80,
+                    start="2016-08-01")
+
+Timelines can also be replayed through a notifier and/or an event bus:
+
+  archive.replay(matchid, notifier=notifier, team="Chelsea")
+"""
+import os
+import re
+import json
+import threading
+from datetime import date, datetime
+from time import time, sleep
+
+import service.constants as CONST
+from service.diff import diffSnapshots
+from service.footballscores import FootballMatch
+from service.matchtable import parseMinute
+from service.snapshot import MatchSnapshot
+
+INDEX_FILE = "index.jsonl"
+MATCHES_DIR = "matches"
+
+# Fields of the match stored in the index rather than the timeline
+INDEX_FIELDS = ("matchid", "leagueid", "competition", "hometeam",
+                "awayteam")
+
+# Fields which can change during a match
+STATE_FIELDS = ("homescore", "awayscore", "status", "matchtime")
+
+# Types of event sent to the notifier when replaying (the same events the
+# service notifies)
+NOTIFIED_EVENTS = (CONST.EVENT_NEW_MATCH, CONST.EVENT_GOAL,
+                   CONST.EVENT_SCORE_CORRECTION, CONST.EVENT_STATUS)
+
+_unsafe = re.compile(r"[^\w\-]")
+
+
+def _isoDate(value):
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+def _stateDelta(old, new):
+    """Returns dict of the fields of new snapshot which differ from old."""
+    delta = {}
+    for field in STATE_FIELDS:
+        value = getattr(new, field)
+        if old is None or getattr(old, field) != value:
+            delta[field] = value
+
+    if old is None:
+        delta["incidents"] = new.incidents
+    elif old.incidents != new.incidents:
+        n = len(old.incidents)
+        if new.incidents[:n] == old.incidents:
+            delta["+incidents"] = new.incidents[n:]
+        else:
+            # An incident has been removed or changed
+            delta["incidents"] = new.incidents
+
+    return delta
+
+
+def _applyDelta(snapshot, delta):
+    """Returns a new snapshot with the recorded changes applied."""
+    changes = {f: delta[f] for f in STATE_FIELDS if f in delta}
+    if "incidents" in delta:
+        changes["incidents"] = delta["incidents"]
+    elif "+incidents" in delta:
+        changes["incidents"] = (snapshot.incidents +
+                                tuple(tuple(i) for i in delta["+incidents"]))
+    return snapshot.replace(**changes)
+
+
+class TimelineArchive(object):
+    """Class object to record and query the timelines of matches."""
+
+    def __init__(self, directory):
+        """Method to create an instance of the archive.
+
+        directory: directory holding the archive (created if needed)
+        """
+        self.directory = directory
+        self.__matchdir = os.path.join(directory, MATCHES_DIR)
+        self.__indexfile = os.path.join(directory, INDEX_FILE)
+        self.__lock = threading.Lock()
+
+        # Index entries by match id and the match ids for each team,
+        # competition and date
+        self.__entries = {}
+        self.__byteam = {}
+        self.__bycompetition = {}
+        self.__bydate = {}
+
+        # Last recorded state of each match
+        self.__last = {}
+
+        if not os.path.isdir(self.__matchdir):
+            os.makedirs(self.__matchdir)
+
+        if os.path.exists(self.__indexfile):
+            with open(self.__indexfile) as f:
+                for line in f:
+                    if line.strip():
+                        self.__addEntry(json.loads(line))
+
+    def __addEntry(self, entry):
+        matchid = entry["matchid"]
+        self.__entries[matchid] = entry
+        for team in (entry["hometeam"], entry["awayteam"]):
+            self.__byteam.setdefault(team, set()).add(matchid)
+        for comp in (entry["competition"], entry["leagueid"]):
+            if comp:
+                self.__bycompetition.setdefault(comp, set()).add(matchid)
+        self.__bydate.setdefault(entry["date"], set()).add(matchid)
+
+    def __matchFile(self, matchid):
+        return os.path.join(self.__matchdir,
+                            "{}.jsonl".format(_unsafe.sub("_", matchid)))
+
+    def __readRecords(self, matchid):
+        path = self.__matchFile(matchid)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def record(self, snapshot, timestamp=None):
+        """Adds the state of the match (a MatchSnapshot) to its timeline if
+        it has changed since it was last recorded.
+
+        Returns True if a change was recorded.
+        """
+        if not snapshot.matchid:
+            return False
+
+        timestamp = time() if timestamp is None else timestamp
+        matchid = snapshot.matchid
+
+        with self.__lock:
+            if matchid not in self.__entries:
+                entry = {f: getattr(snapshot, f) for f in INDEX_FIELDS}
+                entry["date"] = datetime.fromtimestamp(
+                    timestamp).strftime("%Y-%m-%d")
+                with open(self.__indexfile, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+                self.__addEntry(entry)
+
+            if matchid not in self.__last:
+                # Carry on from the end of an existing timeline (e.g. after
+                # a restart)
+                self.__last[matchid] = self.__finalState(matchid)
+
+            delta = _stateDelta(self.__last[matchid], snapshot)
+            if not delta:
+                return False
+
+            delta["t"] = timestamp
+            with open(self.__matchFile(matchid), "a") as f:
+                f.write(json.dumps(delta) + "\n")
+            self.__last[matchid] = snapshot
+
+        return True
+
+    def forget(self, matchid):
+        """Drops the match's last state from memory (e.g. once it has
+        finished). Its timeline is unaffected.
+        """
+        with self.__lock:
+            self.__last.pop(matchid, None)
+
+    def __finalState(self, matchid):
+        states = self.__states(matchid)
+        return states[-1][1] if states else None
+
+    def __states(self, matchid):
+        entry = self.__entries.get(matchid)
+        if entry is None:
+            return []
+
+        states = []
+        snapshot = MatchSnapshot(**{f: entry[f] for f in INDEX_FIELDS})
+        for delta in self.__readRecords(matchid):
+            snapshot = _applyDelta(snapshot, delta)
+            states.append((delta["t"], snapshot))
+        return states
+
+    def timeline(self, matchid):
+        """Returns list of (timestamp, MatchSnapshot) tuples giving each
+        recorded state of the match in order.
+        """
+        with self.__lock:
+            return self.__states(matchid)
+
+    def matches(self, team=None, competition=None, start=None, end=None):
+        """Returns list of index entries (dicts with the keys matchid, date,
+        hometeam, awayteam, competition and leagueid) in date order.
+
+        team:        (optional) only matches involving the team
+        competition: (optional) competition name or league id
+        start:       (optional) first date (date or "YYYY-MM-DD")
+        end:         (optional) last date (date or "YYYY-MM-DD")
+        """
+        start, end = _isoDate(start), _isoDate(end)
+
+        with self.__lock:
+            candidates = None
+            if team is not None:
+                candidates = set(self.__byteam.get(team, ()))
+            if competition is not None:
+                comp = self.__bycompetition.get(competition, set())
+                candidates = (comp if candidates is None
+                              else candidates & comp)
+            if candidates is None:
+                candidates = self.__entries.keys()
+
+            entries = [self.__entries[m] for m in candidates]
+
+        entries = [e for e in entries
+                   if (start is None or e["date"] >= start) and
+                   (end is None or e["date"] <= end)]
+        return sorted(entries, key=lambda e: (e["date"], e["matchid"]))
+
+    def matchesOn(self, day):
+        """Returns list of index entries for matches on the date."""
+        with self.__lock:
+            return [self.__entries[m]
+                    for m in sorted(self.__bydate.get(_isoDate(day), ()))]
+
+    def incidents(self, team=None, competition=None, start=None, end=None,
+                  type=None, after=None, before=None):
+        """Returns list of incidents from the final state of each matching
+        match (so disallowed goals aren't included).
+
+        team:   (optional) only incidents of the team
+        type:   (optional) "goal", "yellow" or "red"
+        after:  (optional) only incidents after this minute
+        before: (optional) only incidents before this minute
+
+        Other parameters are the same as "matches". Each incident is a dict
+        with the keys: matchid, date, hometeam, awayteam, team, side, type,
+        player, time, minute and observed (the time the incident was first
+        seen).
+        """
+        results = []
+        for entry in self.matches(team, competition, start, end):
+            seen = {}
+            for timestamp, snapshot in self.timeline(entry["matchid"]):
+                for incident in snapshot.incidents:
+                    seen.setdefault(incident, timestamp)
+
+            if not seen:
+                continue
+
+            for incident in snapshot.incidents:
+                side, kind, player, matchtime = incident
+                name = entry[side + "team"]
+                minute = parseMinute(matchtime)
+                if ((team is not None and name != team) or
+                        (type is not None and kind != type) or
+                        (after is not None and minute <= after) or
+                        (before is not None and minute >= before)):
+                    continue
+                results.append({"matchid": entry["matchid"],
+                                "date": entry["date"],
+                                "hometeam": entry["hometeam"],
+                                "awayteam": entry["awayteam"],
+                                "team": name,
+                                "side": side,
+                                "type": kind,
+                                "player": player,
+                                "time": matchtime,
+                                "minute": minute,
+                                "observed": seen[incident]})
+        return results
+
+    def replay(self, matchid, notifier=None, bus=None, team=None,
+               speed=None):
+        """Replays the match's timeline, working out the events between
+        each recorded state as the service would.
+
+        notifier: (optional) notifier object. New match, goal, score
+                  correction and status events are passed to its Notify
+                  method with a FootballMatch of the state at the time.
+        bus:      (optional) service.eventbus.EventBus on which every event
+                  is published
+        team:     team treated as the followed team (defaults to the home
+                  team)
+        speed:    (optional) replay speed (e.g. 60 for one minute per
+                  second). If not set, there are no pauses.
+
+        Returns the list of events.
+        """
+        states = self.timeline(matchid)
+        if not states:
+            return []
+
+        team = team or states[0][1].hometeam
+        events = []
+        previous = None
+        lasttime = None
+
+        for timestamp, snapshot in states:
+            if speed and lasttime is not None:
+                sleep(max(0, timestamp - lasttime) / float(speed))
+            lasttime = timestamp
+
+            match = FootballMatch.fromSnapshot(snapshot, team=team,
+                                               detailed=True)
+
+            for event in diffSnapshots(previous, snapshot, team):
+                event.match = match
+                events.append(event)
+                if bus is not None:
+                    bus.publish(event)
+                if notifier is not None and event.type in NOTIFIED_EVENTS:
+                    notifier.Notify(event.code, match)
+
+            previous = snapshot
+
+        return events
+
+    @property
+    def Matches(self):
+        """Returns the number of matches in the archive."""
+        with self.__lock:
+            return len(self.__entries)
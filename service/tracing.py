@@ -0,0 +1,148 @@
+"""Live Football Scores Notification Service
+
+by elParaguayo
+
+This module traces how long it takes for a goal on the BBC live scores page to
+reach the user's notifier.
+
+Each goal event is given a Trace with a unique id which records the time
+spent in each stage of the path:
+
+  sleep     time since the previous refresh. The goal appeared at some point
+            in this period so it is the most that polling can have added.
+  fetch     requesting the live scores page
+  parse     reading the scores from the page (and detecting the goal)
+  details   fetching and reading the match details (scorers)
+  dispatch  working out the match events and publishing them
+  notify    sending the notification (including any rate limiter wait)
+
+The Tracer collects the stage times of completed traces in histograms so
+that it is possible to see which stage dominates.
+"""
+import threading
+from collections import deque
+from uuid import uuid4
+
+STAGES = ("sleep", "fetch", "parse", "details", "dispatch", "notify")
+
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300,
+           float("inf"))
+
+
+class Trace(object):
+    """Class object recording the stage times of a single event."""
+
+    __slots__ = ("traceid", "matchid", "stages")
+
+    def __init__(self, matchid=None, stages=None):
+        self.traceid = uuid4().hex[:12]
+        self.matchid = matchid
+        self.stages = dict(stages or {})
+
+    def add(self, stage, seconds):
+        """Adds time to the stage."""
+        self.stages[stage] = self.stages.get(stage, 0) + seconds
+
+    @property
+    def Total(self):
+        """Returns the total time of all stages."""
+        return sum(self.stages.values())
+
+    def __str__(self):
+        return "{} ({:.2f}s): {}".format(
+            self.traceid, self.Total,
+            ", ".join("{} {:.3f}s".format(s, self.stages[s])
+                      for s in STAGES if s in self.stages))
+
+
+class Histogram(object):
+    """Class object counting values in fixed buckets."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, pct):
+        """Returns the upper bound of the bucket containing the pct
+        percentile (or the maximum if that's lower).
+        """
+        if not self.count:
+            return None
+        target = self.count * pct / 100.0
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class Tracer(object):
+    """Class object collecting completed traces.
+
+    e.g. tracer = Tracer(metrics=metrics, logger=logger)
+         trace = tracer.start(matchid, stages)
+         ...
+         tracer.finish(trace)
+    """
+
+    def __init__(self, metrics=None, logger=None, keep=50):
+        """Method to create an instance of the tracer.
+
+        metrics: (optional) service.metrics.Metrics. Stage times are also
+                 recorded as "goal_stage_seconds" by stage.
+        logger:  (optional) logger. Each completed trace is logged at info
+                 level.
+        keep:    number of recent traces to keep
+        """
+        self.metrics = metrics
+        self.logger = logger
+        self.histograms = {stage: Histogram() for stage in STAGES + ("total",)}
+        self.recent = deque(maxlen=keep)
+        self.__lock = threading.Lock()
+
+    def start(self, matchid=None, stages=None):
+        """Returns a new Trace, optionally with the times of stages which
+        have already happened.
+        """
+        return Trace(matchid, stages)
+
+    def finish(self, trace):
+        """Records the stage times of the completed trace."""
+        with self.__lock:
+            for stage, seconds in trace.stages.items():
+                if stage in self.histograms:
+                    self.histograms[stage].add(seconds)
+            self.histograms["total"].add(trace.Total)
+            self.recent.append(trace)
+
+        if self.metrics is not None:
+            for stage, seconds in trace.stages.items():
+                self.metrics.observe("goal_stage_seconds", seconds,
+                                     stage=stage)
+
+        if self.logger is not None:
+            self.logger.info("Goal trace {}".format(trace))
+
+    @property
+    def Report(self):
+        """Returns dict of stage: {"count", "p50", "p95", "max"}"""
+        with self.__lock:
+            return {stage: {"count": h.count,
+                            "p50": h.percentile(50),
+                            "p95": h.percentile(95),
+                            "max": h.max}
+                    for stage, h in self.histograms.items() if h.count}